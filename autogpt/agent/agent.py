@@ -9,13 +9,14 @@ from datetime import datetime
 
 from colorama import Fore, Style
 
-from autogpt.app import execute_command, get_command, get_status
+from autogpt.app import execute_command, get_command, get_status, prefetch_command
 from autogpt.commands.command import CommandRegistry
 from autogpt.config import Config
 from autogpt.config.ai_config import AIConfig
+from autogpt.json_utils.stream_parser import CommandStreamParser
 from autogpt.json_utils.utilities import extract_json_from_response, validate_json
 from autogpt.llm.base import ChatSequence
-from autogpt.llm.chat import chat_with_ai, create_chat_completion
+from autogpt.llm.chat import acreate_chat_completion, chat_with_ai
 from autogpt.llm.providers.openai import OPEN_AI_CHAT_MODELS
 from autogpt.llm.utils import count_string_tokens
 from autogpt.log_cycle.log_cycle import (
@@ -26,10 +27,10 @@ from autogpt.log_cycle.log_cycle import (
     USER_INPUT_FILE_NAME,
     LogCycleHandler,
 )
-from autogpt.logs import logger, print_assistant_thoughts
+from autogpt.logs import StreamPrinter, logger, print_assistant_thoughts
 from autogpt.memory.message_history import MessageHistory
 from autogpt.memory.vector import VectorMemory
-from autogpt.organization.org_events import Event
+from autogpt.organization.org_events import CycleTick, Event
 from autogpt.speech import say_text
 from autogpt.spinner import Spinner
 from autogpt.utils import clean_input
@@ -101,6 +102,7 @@ class Agent:
         ).max_tokens
 
         self.terminated = ai_config.terminated
+        self.prefetch_task = None
         self.loop_count = ai_config.loop_count
         self.founder = ai_config.founder
 
@@ -123,27 +125,16 @@ class Agent:
             self.loop_count += 1
             await self.update_agent_config(loop_count=self.loop_count)
 
-            # Calculate the current agent operating costs
-            event_id = await self.send_event("calculate_operating_cost_of_agent", self.ai_id)
-            agent_operating_costs = await self.organization.get_event_result(event_id)
-            
-
-            # Update the running costs in the yaml
-            await self.send_event("update_agent_running_cost", self.ai_id, agent_operating_costs)
-
-            # Update the agent budget
-            await self.send_event("update_agent_budget", self.ai_id, agent_operating_costs)
-
-            inbox_prompt_event_id = await self.send_event("get_inbox", self.ai_id)
-            inbox_prompt = await self.organization.get_event_result(inbox_prompt_event_id)
+            # Pay for this cycle and get the inbox and status update in one event
+            tick = await self.cycle_tick()
+            if tick is None:
+                break
+            inbox_prompt = tick.inbox
+            agent_update = tick.status
             
             print("\033[92m##### START OF INBOX PROMPT OF AGENT {self.ai_name} #####\033[0m")
             print(f"\033[92mInbox prompt = \n {inbox_prompt} \n\033[0m")
             print("\033[92m##### END OF INBOX PROMPT #####\033[0m")
-            
-            # Build the status udpate of the agent to add to prompt
-            status_event_id = await self.send_event("build_status_update", self.ai_id)
-            agent_update = await self.organization.get_event_result(status_event_id)
     
             # Build an arbitrary status
             status = f"agent {self.ai_name} is in loop {self.loop_count} rolled {dice_result}"
@@ -163,8 +154,8 @@ class Agent:
                 my_budget = self.organization.agent_budgets.get(self.ai_id)
                 staff_budget = my_budget * random.uniform(0, 1)
 
-                event_id = await self.send_event("hire_staff", name, role, goals, staff_budget, self.ai_id)
-                result = await self.organization.get_event_result(event_id)
+                future = await self.send_event("hire_staff", name, role, goals, staff_budget, self.ai_id)
+                result = await self.organization.get_event_result(future)
                 
                 await asyncio.sleep(2)
 
@@ -186,8 +177,8 @@ class Agent:
 
                 random_staff_member = random.choice(staff_members)
                 test_message = f"test message from {self.ai_id}:{self.ai_name} to {random_staff_member.ai_id}:{random_staff_member.ai_name} in loop {self.loop_count}"
-                event_id = await self.send_event("message_agent", self.ai_id, random_staff_member.ai_id, test_message)
-                result = await self.organization.get_event_result(event_id)
+                future = await self.send_event("message_agent", self.ai_id, random_staff_member.ai_id, test_message)
+                result = await self.organization.get_event_result(future)
                 await asyncio.sleep(10)
 
             elif dice_result == 3:
@@ -206,8 +197,8 @@ class Agent:
                     #print(f"agent {self.ai_name} has no staff members to fire in loop {self.loop_count}")
                     continue
                 random_staff_member = random.choice(staff_members)
-                event_id = await self.send_event("fire_staff", random_staff_member.ai_id)
-                result = await self.organization.get_event_result(event_id)
+                future = await self.send_event("fire_staff", random_staff_member.ai_id)
+                result = await self.organization.get_event_result(future)
                 await asyncio.sleep(3)
 
             elif dice_result == 5:
@@ -228,8 +219,8 @@ class Agent:
                 random_message_id = random.choice(message_id_list)
                 response = f"sending response from agent {self.ai_id}:{self.ai_name} in loop {self.loop_count}"
                 # Respond to the message
-                event_id = await self.send_event("respond_to_message", str(random_message_id), response, self.ai_id)
-                result = await self.organization.get_event_result(event_id)
+                future = await self.send_event("respond_to_message", str(random_message_id), response, self.ai_id)
+                result = await self.organization.get_event_result(future)
                 await asyncio.sleep(2)
 
             elif dice_result == 6:
@@ -243,8 +234,8 @@ class Agent:
                 random_staff_member = random.choice(staff_members)
 
                 # Get the conversation history between you and the random staff member
-                event_id = await self.send_event("get_conversation_history", self.ai_id, random_staff_member.ai_id)
-                result = await self.organization.get_event_result(event_id)
+                future = await self.send_event("get_conversation_history", self.ai_id, random_staff_member.ai_id)
+                result = await self.organization.get_event_result(future)
                 print(f"converstation: {response}")
 
             if result is not None:
@@ -275,10 +266,30 @@ class Agent:
 
 
     async def send_event(self, event_type, *args):
+        """
+            Queues an organization action and returns a future that resolves
+            with its result. Pass it to `Organization.get_event_result` to await it.
+        """
         event_id = uuid.uuid4()
         event = Event(event_id, self, event_type, *args)
         await self.organization.event_queue.put(event)  # Put the event object into the queue
-        return event_id
+        return event.future
+
+
+    async def cycle_tick(self):
+        """
+            Pays for this cycle and returns the inbox and status update as a
+            `CycleTick`. Returns None and marks the agent as terminated when the
+            organization refused the tick, e.g. because the agent was fired or
+            the organization is shutting down.
+        """
+        tick_future = await self.send_event("cycle_tick", self.ai_id)
+        tick = await self.organization.get_event_result(tick_future)
+        if not isinstance(tick, CycleTick):
+            logger.warn(f"Agent {self.ai_name} stops, no cycle tick: {tick}")
+            self.terminated = True
+            return None
+        return tick
 
 
     async def start_interaction_loop(self, termination_event):
@@ -305,6 +316,8 @@ class Agent:
         await self.send_event("update_agent_status", self.ai_id, "starting interaction loop")
 
         while not self.terminated:
+            # The command prefetched in the previous cycle did not run
+            self._cancel_prefetch()
             # Discontinue if continuous limit is reached
             self.cycle_count += 1
             self.log_cycle_handler.log_count_within_cycle = 0
@@ -327,19 +340,12 @@ class Agent:
                 )
                 break
 
-            event_id = await self.send_event("calculate_operating_cost_of_agent", self.ai_id)
-            agent_operating_costs = await self.organization.get_event_result(event_id)
-            
-            await self.send_event("update_agent_running_cost", self.ai_id, agent_operating_costs)
-            await self.send_event("update_agent_budget", self.ai_id, agent_operating_costs)
-            
-            # Receive message and build status update
-            inbox_event_id = await self.send_event("get_inbox", self.ai_id)
-            inbox = await self.organization.get_event_result(inbox_event_id)
-
-            # Build the status udpate of the agent to add to prompt
-            status_event_id = await self.send_event("build_status_update", self.ai_id)
-            org_status = await self.organization.get_event_result(status_event_id)
+            # Pay for this cycle, receive messages and build the status update in one event
+            tick = await self.cycle_tick()
+            if tick is None:
+                break
+            inbox = tick.inbox
+            org_status = tick.status
 
             # Update the current system prompt
             self.system_prompt = self.ai_config.construct_full_prompt(organization=self.organization)
@@ -350,6 +356,9 @@ class Agent:
 
             # Send message to AI, get response
             # with Spinner("Thinking... ", plain_output=cfg.plain_output):
+            on_delta = stream_printer = None
+            if self.config.stream_llm_responses:
+                on_delta, stream_printer = self._make_stream_handler()
             assistant_reply = await chat_with_ai(
                 self.config,
                 self,
@@ -357,7 +366,10 @@ class Agent:
                 self.triggering_prompt,
                 self.fast_token_limit,
                 self.config.fast_llm_model,
+                on_delta=on_delta,
             )
+            if stream_printer is not None:
+                stream_printer.flush()
   
             try:
                 assistant_reply_json = extract_json_from_response(assistant_reply)
@@ -407,8 +419,8 @@ class Agent:
 
             # Update agent status in the organization
             try :
-                event_id = await self.send_event("update_agent_status", self.ai_id, status)
-                res = await self.organization.get_event_result(event_id)
+                future = await self.send_event("update_agent_status", self.ai_id, status)
+                res = await self.organization.get_event_result(future)
             except Exception as e:
                 logger.error("Error: \n", str(e))
             
@@ -440,7 +452,7 @@ class Agent:
                             "",
                         )
                         thoughts = assistant_reply_json.get("thoughts", {})
-                        self_feedback_resp = self.get_self_feedback(
+                        self_feedback_resp = await self.get_self_feedback(
                             thoughts, self.config.fast_llm_model
                         )
                         logger.typewriter_log(
@@ -515,6 +527,7 @@ class Agent:
                     command_name, arguments = plugin.pre_command(
                         command_name, arguments
                     )
+                await self._finish_prefetch()
                 command_result = await execute_command(
                     self.command_registry,
                     command_name,
@@ -553,11 +566,60 @@ class Agent:
             # add a little cooldown here.
             await asyncio.sleep(1)
         
+        self._cancel_prefetch()
         # Notify the org agent is terminated
         print(f"\033[31m\n ******************** Agent {self.ai_name} loop terminated ******************\033[0m")
         await self.organization.notify_termination(self)
 
 
+    def _make_stream_handler(self):
+        """
+            Returns the on_delta callback for a streamed reply and the printer
+            showing it live. The command is prefetched as soon as it has been
+            streamed, while the rest of the reply is still arriving.
+        """
+        printer = StreamPrinter(self.ai_name)
+
+        def on_command(command):
+            if isinstance(command, dict) and command.get("name"):
+                self._cancel_prefetch()
+                self.prefetch_task = asyncio.create_task(
+                    prefetch_command(
+                        self.command_registry,
+                        command["name"],
+                        dict(command.get("args") or {}),
+                        self,
+                    )
+                )
+
+        parser = CommandStreamParser(on_command=on_command)
+
+        def on_delta(delta):
+            printer.write(delta)
+            parser.feed(delta)
+
+        return on_delta, printer
+
+
+    def _cancel_prefetch(self):
+        """
+            Cancels the prefetch of a command that is not going to run
+        """
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+
+
+    async def _finish_prefetch(self):
+        """
+            Waits for the prefetch of the command that is about to run.
+            prefetch_command handles its own errors.
+        """
+        task, self.prefetch_task = self.prefetch_task, None
+        if task is not None:
+            await asyncio.wait([task])
+
+
     def _resolve_pathlike_command_args(self, command_args):
         if "directory" in command_args and command_args["directory"] in {"", "/"}:
             command_args["directory"] = str(self.workspace.root)
@@ -570,11 +632,11 @@ class Agent:
         return command_args
 
 
-    def get_self_feedback(self, thoughts: dict, llm_model: str) -> str:
+    async def get_self_feedback(self, thoughts: dict, llm_model: str) -> str:
         """Generates a feedback response based on the provided thoughts dictionary.
         This method takes in a dictionary of thoughts containing keys such as 'reasoning',
         'plan', 'thoughts', and 'criticism'. It combines these elements into a single
-        feedback message and uses the create_chat_completion() function to generate a
+        feedback message and uses the acreate_chat_completion() function to generate a
         response based on the input message.
         Args:
             thoughts (dict): A dictionary containing thought elements like reasoning,
@@ -601,7 +663,7 @@ class Agent:
             PROMPT_SUPERVISOR_FEEDBACK_FILE_NAME,
         )
 
-        feedback = create_chat_completion(prompt)
+        feedback = await acreate_chat_completion(prompt)
 
         self.log_cycle_handler.log_cycle(
             self.ai_config.ai_name,
@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from autogpt.config import Config
 from autogpt.llm.base import ChatSequence
-from autogpt.llm.chat import Message, create_chat_completion
+from autogpt.llm.chat import Message, acreate_chat_completion
 from autogpt.singleton import Singleton
 
 
@@ -18,9 +18,9 @@ class AgentManager(metaclass=Singleton):
         self.cfg = Config()
 
     # Create new GPT agent
-    # TODO: Centralise use of create_chat_completion() to globally enforce token limit
+    # TODO: Centralise use of acreate_chat_completion() to globally enforce token limit
 
-    def create_agent(
+    async def create_agent(
         self, task: str, creation_prompt: str, model: str
     ) -> tuple[int, str]:
         """Create a new agent and return its key
@@ -41,7 +41,7 @@ class AgentManager(metaclass=Singleton):
             if plugin_messages := plugin.pre_instruction(messages.raw()):
                 messages.extend([Message(**raw_msg) for raw_msg in plugin_messages])
         # Start GPT instance
-        agent_reply = create_chat_completion(prompt=messages)
+        agent_reply = await acreate_chat_completion(prompt=messages)
 
         messages.add("assistant", agent_reply)
 
@@ -69,7 +69,7 @@ class AgentManager(metaclass=Singleton):
 
         return key, agent_reply
 
-    def message_agent(self, key: str | int, message: str) -> str:
+    async def message_agent(self, key: str | int, message: str) -> str:
         """Send a message to an agent and return its response
 
         Args:
@@ -92,7 +92,7 @@ class AgentManager(metaclass=Singleton):
                 messages.extend([Message(**raw_msg) for raw_msg in plugin_messages])
 
         # Start GPT instance
-        agent_reply = create_chat_completion(prompt=messages)
+        agent_reply = await acreate_chat_completion(prompt=messages)
 
         messages.add("assistant", agent_reply)
 
@@ -1,11 +1,16 @@
 """ Command and Control """
 import asyncio
+import contextvars
+import functools
+import inspect
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Union
 
 from autogpt.agent.agent_manager import AgentManager
 from autogpt.commands.command import CommandRegistry, command
 from autogpt.commands.web_requests import scrape_links, scrape_text
+from autogpt.logs import logger
 from autogpt.processing.text import summarize_text
 from autogpt.speech import say_text
 from autogpt.url_utils.validators import validate_url
@@ -123,6 +128,89 @@ def map_command_synonyms(command_name: str):
 
 ASYNC_ORGANIZATIONS = {"hire_staff", "fire_staff", "message_agent", "get_conversation_history", "respond_to_message"}
 
+_command_executor: ThreadPoolExecutor | None = None
+
+
+def get_command_executor() -> ThreadPoolExecutor:
+    """Returns the thread pool that runs synchronous commands"""
+    global _command_executor
+    if _command_executor is None:
+        from autogpt.config import Config
+
+        _command_executor = ThreadPoolExecutor(
+            max_workers=max(1, Config().org_command_threads),
+            thread_name_prefix="command",
+        )
+    return _command_executor
+
+
+async def run_blocking(function, *args, **kwargs):
+    """Runs a synchronous function in the command thread pool, so that it
+    does not block the event loop all agents of the organization share.
+    Coroutines returned by the function are awaited on the event loop.
+
+    Args:
+        function (callable): The function to call
+        *args, **kwargs: The arguments for the function
+
+    Returns:
+        The result of the function
+    """
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context, so LLM calls are booked on the calling agent
+    context = contextvars.copy_context()
+    result = await loop.run_in_executor(
+        get_command_executor(),
+        functools.partial(context.run, function, *args, **kwargs),
+    )
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def _read_file(path: str) -> None:
+    with open(path, "rb") as f:
+        while f.read(1 << 20):
+            pass
+
+
+async def _prefetch_file(arguments: dict, agent) -> None:
+    # Pull the file into the OS page cache so reading it later is fast
+    await run_blocking(_read_file, str(agent.workspace.get_path(arguments["filename"])))
+
+
+COMMAND_PREFETCHERS = {
+    "read_file": _prefetch_file,
+}
+
+
+async def prefetch_command(
+    command_registry: CommandRegistry,
+    command_name: str,
+    arguments: dict,
+    agent,
+) -> None:
+    """Validates a command and starts preparing for it, while the rest of the
+    AI's response is still streaming in. Prefetching is best effort, errors
+    are left for execute_command to report.
+
+    Args:
+        command_name (str): The name of the command the AI chose
+        arguments (dict): The arguments for the command
+    """
+    if command_name not in command_registry.commands:
+        logger.warn(f"{agent.ai_name} chose the unknown command {command_name}")
+        return
+
+    prefetcher = COMMAND_PREFETCHERS.get(command_name)
+    if prefetcher is None:
+        return
+    try:
+        await prefetcher(arguments, agent)
+    except Exception as e:
+        logger.debug(f"Prefetching {command_name} failed: {e}")
+
+
 async def execute_command(
     command_registry: CommandRegistry,
     command_name: str,
@@ -143,10 +231,14 @@ async def execute_command(
 
         # If the command is found, call it with the provided arguments
         if cmd:
-            if command_name in ASYNC_ORGANIZATIONS:
-                return await cmd(**arguments, agent=agent)
+            if command_name in ASYNC_ORGANIZATIONS or inspect.iscoroutinefunction(cmd.method):
+                result = cmd(**arguments, agent=agent)
+                # Disabled commands return their reason instead of a coroutine
+                return await result if inspect.isawaitable(result) else result
             else:
-                return cmd(**arguments, agent=agent) # remove agent for commands not in ASYNC_ORGANIZATIONS
+                # Synchronous commands (browsing, file operations, code execution, ...) block,
+                # run them in a thread so the other agents keep going
+                return await run_blocking(cmd, **arguments, agent=agent) # remove agent for commands not in ASYNC_ORGANIZATIONS
 
 
 
@@ -161,7 +253,7 @@ async def execute_command(
                 command_name == command["label"].lower()
                 or command_name == command["name"].lower()
             ):
-                return command["function"](**arguments)
+                return await run_blocking(command["function"], **arguments)
         return (
             f"Unknown command '{command_name}'. Please refer to the 'COMMANDS'"
             " list for available commands and only respond in the specified JSON"
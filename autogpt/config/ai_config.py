@@ -6,6 +6,7 @@ from __future__ import annotations
 
 import os
 import platform
+from functools import lru_cache
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional
 
@@ -20,6 +21,17 @@ if TYPE_CHECKING:
 SAVE_FILE = str(Path(os.getcwd()) / "ai_settings.yaml")
 
 
+@lru_cache(maxsize=1)
+def get_os_info() -> str:
+    """Returns a description of the OS, looked up once per process"""
+    os_name = platform.system()
+    return (
+        platform.platform(terse=True)
+        if os_name != "Linux"
+        else distro.name(pretty=True)
+    )
+
+
 class AIConfig:
     """
     A class object that contains the configuration information for the AI
@@ -79,6 +91,11 @@ class AIConfig:
         self.founder = founder
         self.init_memory = init_memory
         self.file_path = file_path
+
+        # Cached system prompt, see construct_full_prompt
+        self._prompt_key = None
+        self._prompt = None
+        self._prompt_token_counts = {}
         
         #print("agent file path: ", self.file_path)
         self.agent_yaml_path = os.path.join(file_path, "agent.yaml")
@@ -134,23 +151,76 @@ class AIConfig:
         config.pop("agent_yaml_path", None)  # Exclude agent_yaml_path (we construct this during init)
         config.pop("command_registry", None)  # Exclude command_registry (we construct this during init)
         config.pop("prompt_generator", None)  # Exclude prompt_generator (we construct this during init)
+        for attr in [attr for attr in config if attr.startswith("_")]:
+            config.pop(attr)  # Exclude caches
         with open(self.agent_yaml_path, "w") as file:
             yaml.dump(config, file)
 
+    def _get_prompt_cache_key(self, cfg) -> tuple:
+        """
+        Returns everything the system prompt is built from. The prompt only has to
+        be rebuilt when this changes.
+        """
+        commands = ()
+        if self.command_registry is not None:
+            commands = tuple(
+                (name, bool(command.enabled))
+                for name, command in self.command_registry.commands.items()
+            )
+        return (
+            tuple(self.ai_goals),
+            self.ai_name,
+            self.ai_role,
+            self.founder,
+            self.organization_name,
+            self.organization_goal,
+            commands,
+            self._get_prompt_generator_key(cfg),
+            cfg.execute_local_commands,
+        )
+
+    @staticmethod
+    def _get_prompt_generator_key(cfg) -> tuple:
+        return (tuple(id(plugin) for plugin in cfg.plugins), cfg.prompt_settings_file)
+
     def construct_full_prompt(
         self, organization = None, prompt_generator: Optional[PromptGenerator] = None, 
     ) -> str:
         """
         Returns a prompt to the user with the class information in an organized fashion.
 
+        The prompt is cached and only rebuilt when one of its inputs (goals, role,
+        enabled commands, plugins or the organization) changes.
+
         Parameters:
-            None
+            organization: Unused, kept for compatibility
+            prompt_generator (PromptGenerator): Build the prompt from this generator
+                instead of the default one; the result is not cached
 
         Returns:
             full_prompt (str): A string containing the initial prompt for the user
               including the ai_name, ai_role, ai_goals, and api_budget.
         """
+        from autogpt.config import Config
+
+        cfg = Config()
+        if prompt_generator is None:
+            key = self._get_prompt_cache_key(cfg)
+            if key == self._prompt_key:
+                return self._prompt
+        else:
+            key = None
 
+        full_prompt = self._build_full_prompt(cfg, prompt_generator)
+        if full_prompt != self._prompt:
+            self._prompt_token_counts = {}
+        self._prompt_key = key
+        self._prompt = full_prompt
+        return full_prompt
+
+    def _build_full_prompt(
+        self, cfg, prompt_generator: Optional[PromptGenerator] = None
+    ) -> str:
         prompt_start = (
             "Your decisions must always be made independently without"
             " seeking user assistance. Play to your strengths as an LLM and pursue"
@@ -158,13 +228,11 @@ class AIConfig:
             ""
         )
 
-        from autogpt.config import Config
         from autogpt.prompts.prompt import build_default_prompt_generator
 
-        cfg = Config()
         if prompt_generator is None:
             prompt_generator = build_default_prompt_generator()
-            
+
         prompt_generator.goals = self.ai_goals
         prompt_generator.name = self.ai_name
         prompt_generator.role = self.ai_role
@@ -176,14 +244,7 @@ class AIConfig:
 
         if cfg.execute_local_commands:
             # add OS info to prompt
-            os_name = platform.system()
-            os_info = (
-                platform.platform(terse=True)
-                if os_name != "Linux"
-                else distro.name(pretty=True)
-            )
-
-            prompt_start += f"\nThe OS you are running on is: {os_info}"
+            prompt_start += f"\nThe OS you are running on is: {get_os_info()}"
 
         # Construct full prompt
         full_prompt = ""
@@ -202,3 +263,24 @@ class AIConfig:
         self.prompt_generator = prompt_generator
         full_prompt += f"\n\n{prompt_generator.generate_prompt_string()}"
         return full_prompt
+
+    @property
+    def cached_prompt(self) -> str | None:
+        """The last prompt returned by construct_full_prompt"""
+        return self._prompt
+
+    def get_prompt_token_count(self, model: str) -> int:
+        """
+        Returns the number of tokens of the cached prompt, counted once per prompt
+        and model.
+
+        Parameters:
+            model (str): The model to count the tokens for
+        """
+        from autogpt.llm.utils import count_string_tokens
+
+        if self._prompt is None:
+            self.construct_full_prompt()
+        if model not in self._prompt_token_counts:
+            self._prompt_token_counts[model] = count_string_tokens(self._prompt, model)
+        return self._prompt_token_counts[model]
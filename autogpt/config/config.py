@@ -62,6 +62,7 @@ class Config(metaclass=Singleton):
         self.fast_llm_model = os.getenv("FAST_LLM_MODEL", "gpt-3.5-turbo")
         self.smart_llm_model = os.getenv("SMART_LLM_MODEL", "gpt-3.5-turbo")
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+        self.embedding_batch_window = float(os.getenv("EMBEDDING_BATCH_WINDOW", "0.02"))
 
         self.browse_spacy_language_model = os.getenv(
             "BROWSE_SPACY_LANGUAGE_MODEL", "en_core_web_sm"
@@ -70,6 +71,20 @@ class Config(metaclass=Singleton):
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.openai_organization = os.getenv("OPENAI_ORGANIZATION")
         self.temperature = float(os.getenv("TEMPERATURE", "0"))
+        self.stream_llm_responses = os.getenv("STREAM_LLM_RESPONSES", "False") == "True"
+        self.llm_requests_per_minute = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+        self.llm_tokens_per_minute = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+        self.openai_max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+        self.openai_keepalive_timeout = float(
+            os.getenv("OPENAI_KEEPALIVE_TIMEOUT", "60")
+        )
+        self.llm_response_cache = os.getenv("LLM_RESPONSE_CACHE", "True") == "True"
+        self.llm_response_cache_path = os.getenv(
+            "LLM_RESPONSE_CACHE_PATH", "data/llm_response_cache.sqlite3"
+        )
+        self.llm_response_cache_max_entries = int(
+            os.getenv("LLM_RESPONSE_CACHE_MAX_ENTRIES", "100000")
+        )
         self.use_azure = os.getenv("USE_AZURE") == "True"
         self.execute_local_commands = (
             os.getenv("EXECUTE_LOCAL_COMMANDS", "False") == "True"
@@ -147,6 +162,13 @@ class Config(metaclass=Singleton):
 
         self.memory_backend = os.getenv("MEMORY_BACKEND", "json_file")
         self.memory_index = os.getenv("MEMORY_INDEX", "auto-gpt-memory")
+        self.memory_embedding_dtype = os.getenv("MEMORY_EMBEDDING_DTYPE", "float32")
+        self.memory_embedding_quantization = os.getenv(
+            "MEMORY_EMBEDDING_QUANTIZATION", "none"
+        )
+        self.memory_rerank_factor = int(os.getenv("MEMORY_RERANK_FACTOR", "4"))
+        self.memory_ivf_lists = int(os.getenv("MEMORY_IVF_LISTS", "0"))
+        self.memory_ivf_nprobe = int(os.getenv("MEMORY_IVF_NPROBE", "8"))
 
         self.redis_host = os.getenv("REDIS_HOST", "localhost")
         self.redis_port = int(os.getenv("REDIS_PORT", "6379"))
@@ -181,6 +203,23 @@ class Config(metaclass=Singleton):
 
         self.chat_messages_enabled = os.getenv("CHAT_MESSAGES_ENABLED") == "True"
 
+        # Number of threads running blocking (synchronous) commands of agents
+        self.org_command_threads = int(os.getenv("ORG_COMMAND_THREADS", "16"))
+        # Number of worker processes running the agents (0 runs them in this process)
+        self.org_agent_processes = int(os.getenv("ORG_AGENT_PROCESSES", "0"))
+        # Seconds an agent waits on an organization action (0 waits forever)
+        self.org_event_timeout = float(os.getenv("ORG_EVENT_TIMEOUT", "120")) or None
+        # Number of coroutines processing organization events concurrently
+        self.org_event_workers = int(os.getenv("ORG_EVENT_WORKERS", "8"))
+        # Organization state is written to disk at most every ORG_FLUSH_INTERVAL
+        # seconds, or once ORG_FLUSH_MAX_PENDING changes have piled up
+        self.org_flush_interval = float(os.getenv("ORG_FLUSH_INTERVAL", "1.0"))
+        self.org_flush_max_pending = int(os.getenv("ORG_FLUSH_MAX_PENDING", "100"))
+        # Messages are journaled and compacted into a snapshot every N records
+        self.org_message_log_compact_every = int(
+            os.getenv("ORG_MESSAGE_LOG_COMPACT_EVERY", "10000")
+        )
+
     def load_plugins_config(self) -> "autogpt.plugins.PluginsConfig":
         # Avoid circular import
         from autogpt.plugins.plugins_config import PluginsConfig
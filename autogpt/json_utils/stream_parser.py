@@ -0,0 +1,94 @@
+"""Incremental extraction of the command from a streamed LLM response."""
+
+from __future__ import annotations
+
+import ast
+import json
+from typing import Callable, Optional
+
+
+class CommandStreamParser:
+    """Finds the `command` object of a response while the response is streamed.
+
+    Deltas are scanned once, keeping track of strings and nesting, so the
+    command can be acted on as soon as its closing brace arrives instead of
+    after the whole response (including any text after it) is received.
+    """
+
+    def __init__(self, on_command: Optional[Callable[[dict], None]] = None):
+        """
+        Args:
+            on_command: Called with the command object once it is complete
+        """
+        self.on_command = on_command
+        self.text = ""
+        self.command: Optional[dict] = None
+
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+
+    def feed(self, delta: str) -> Optional[dict]:
+        """Adds the next part of the response.
+
+        Returns:
+            The command object if this delta completed it, otherwise None
+        """
+        self.text += delta
+        if self.command is not None:
+            return None
+
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start : i + 1]
+            elif self._depth == 0:
+                # Skip anything before the response object, e.g. a code fence
+                if c == "{":
+                    self._depth = 1
+            elif c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                if self._depth == 1 and self._key == "command":
+                    self._value_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    command = self._parse(text[self._value_start : i + 1])
+                    self._value_start = None
+                    if command is not None:
+                        self._pos = i + 1
+                        self.command = command
+                        if self.on_command is not None:
+                            self.on_command(command)
+                        return command
+            elif c == ":" and self._depth == 1 and self._last_string is not None:
+                self._key = self._parse(self._last_string)
+            elif c == "," and self._depth == 1:
+                self._key = None
+        self._pos = len(text)
+        return None
+
+    @staticmethod
+    def _parse(value: str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            try:
+                return ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                return None
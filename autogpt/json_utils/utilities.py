@@ -1,7 +1,9 @@
 """Utilities for the json_fixes package."""
 import ast
+import copy
 import json
 import os.path
+from functools import lru_cache
 from typing import Any
 
 from jsonschema import Draft7Validator
@@ -28,14 +30,20 @@ def extract_json_from_response(response_content: str) -> dict:
         return {}
 
 
-def llm_response_schema(
-    schema_name: str = LLM_DEFAULT_RESPONSE_FORMAT,
-) -> dict[str, Any]:
+@lru_cache(maxsize=None)
+def _load_response_schema(schema_name: str) -> dict[str, Any]:
     filename = os.path.join(os.path.dirname(__file__), f"{schema_name}.json")
     with open(filename, "r") as f:
         return json.load(f)
 
 
+def llm_response_schema(
+    schema_name: str = LLM_DEFAULT_RESPONSE_FORMAT,
+) -> dict[str, Any]:
+    # The schema files ship with the package, so they are only read once
+    return copy.deepcopy(_load_response_schema(schema_name))
+
+
 def validate_json(
     json_object: object, schema_name: str = LLM_DEFAULT_RESPONSE_FORMAT
 ) -> bool:
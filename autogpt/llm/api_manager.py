@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 
 import openai
 from openai import Model
@@ -9,6 +12,27 @@ from autogpt.llm.modelsinfo import COSTS
 from autogpt.logs import logger
 from autogpt.singleton import Singleton
 
+# The agent on whose behalf API calls are made. Every agent loop runs in its own
+# task, so calls made by the loop, and by the tasks and command threads it starts,
+# are attributed to that agent.
+current_agent_id: ContextVar[Optional[int]] = ContextVar(
+    "current_agent_id", default=None
+)
+
+
+@dataclass
+class Usage:
+    """Tokens used and their cost"""
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cost += cost
+
 
 class ApiManager(metaclass=Singleton):
     def __init__(self):
@@ -17,15 +41,22 @@ class ApiManager(metaclass=Singleton):
         self.total_cost = 0
         self.total_budget = 0
         self.models: Optional[list[Model]] = None
+        self.usage_by_agent: Dict[Optional[int], Usage] = {}
+        self.usage_by_model: Dict[str, Usage] = {}
+        # API calls are made from the event loop and from command threads
+        self._lock = threading.Lock()
 
     def reset(self):
-        self.total_prompt_tokens = 0
-        self.total_completion_tokens = 0
-        self.total_cost = 0
-        self.total_budget = 0.0
-        self.models = None
-
-    def update_cost(self, prompt_tokens, completion_tokens, model):
+        with self._lock:
+            self.total_prompt_tokens = 0
+            self.total_completion_tokens = 0
+            self.total_cost = 0
+            self.total_budget = 0.0
+            self.models = None
+            self.usage_by_agent = {}
+            self.usage_by_model = {}
+
+    def update_cost(self, prompt_tokens, completion_tokens, model, agent_id=None):
         """
         Update the total cost, prompt tokens, and completion tokens.
 
@@ -33,18 +64,80 @@ class ApiManager(metaclass=Singleton):
         prompt_tokens (int): The number of tokens used in the prompt.
         completion_tokens (int): The number of tokens used in the completion.
         model (str): The model used for the API call.
+        agent_id (int, optional): The agent that made the call. Defaults to current_agent_id.
         """
         # the .model property in API responses can contain version suffixes like -v2
         model = model[:-3] if model.endswith("-v2") else model
+        if agent_id is None:
+            agent_id = current_agent_id.get()
 
-        self.total_prompt_tokens += prompt_tokens
-        self.total_completion_tokens += completion_tokens
-        self.total_cost += (
+        cost = (
             prompt_tokens * COSTS[model]["prompt"]
             + completion_tokens * COSTS[model]["completion"]
         ) / 1000
+        with self._lock:
+            self.total_prompt_tokens += prompt_tokens
+            self.total_completion_tokens += completion_tokens
+            self.total_cost += cost
+            for usage_by, key in (
+                (self.usage_by_agent, agent_id),
+                (self.usage_by_model, model),
+            ):
+                usage = usage_by.get(key)
+                if usage is None:
+                    usage = usage_by[key] = Usage()
+                usage.add(prompt_tokens, completion_tokens, cost)
         logger.debug(f"Total running cost: ${self.total_cost:.3f}")
 
+    def set_agent_usage(self, agent_id: Optional[int], usage: Usage) -> None:
+        """
+        Records the usage of an agent whose API calls are made in another process.
+
+        Args:
+        agent_id (int): The agent that made the calls.
+        usage (Usage): The agent's total usage so far, the totals grow by the
+            difference with the usage recorded before.
+        """
+        with self._lock:
+            previous = self.usage_by_agent.get(agent_id) or Usage()
+            self.total_prompt_tokens += usage.prompt_tokens - previous.prompt_tokens
+            self.total_completion_tokens += (
+                usage.completion_tokens - previous.completion_tokens
+            )
+            self.total_cost += usage.cost - previous.cost
+            self.usage_by_agent[agent_id] = Usage(**vars(usage))
+
+    def get_agent_usage(self, agent_id: Optional[int]) -> Usage:
+        """
+        Get the tokens used and the cost of the API calls of an agent.
+
+        Returns:
+        Usage: A copy of the agent's usage, calls outside any agent are under None.
+        """
+        with self._lock:
+            usage = self.usage_by_agent.get(agent_id)
+            return Usage(**vars(usage)) if usage is not None else Usage()
+
+    def get_agent_cost(self, agent_id: Optional[int]) -> float:
+        """
+        Get the total cost of the API calls of an agent.
+
+        Returns:
+        float: The total cost of the agent's API calls.
+        """
+        return self.get_agent_usage(agent_id).cost
+
+    def get_model_usage(self, model: str) -> Usage:
+        """
+        Get the tokens used and the cost of the API calls to a model.
+
+        Returns:
+        Usage: A copy of the model's usage.
+        """
+        with self._lock:
+            usage = self.usage_by_model.get(model)
+            return Usage(**vars(usage)) if usage is not None else Usage()
+
     def set_total_budget(self, total_budget):
         """
         Sets the total user-defined budget for API calls.
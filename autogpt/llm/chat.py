@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import time
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 
 if TYPE_CHECKING:
     from autogpt.agent.agent import Agent
@@ -9,6 +9,7 @@ if TYPE_CHECKING:
 from autogpt.config import Config
 from autogpt.llm.api_manager import ApiManager
 from autogpt.llm.base import ChatSequence, Message
+from autogpt.llm.scheduler import RequestPriority
 from autogpt.llm.utils import (
     acreate_chat_completion,
     count_message_tokens,
@@ -18,6 +19,31 @@ from autogpt.log_cycle.log_cycle import CURRENT_CONTEXT_FILE_NAME
 from autogpt.logs import logger
 
 
+def get_request_priority(agent: Agent) -> RequestPriority:
+    """Founders go first, then agents with staff waiting on them, then leaf employees"""
+    if getattr(agent, "founder", False):
+        return RequestPriority.FOUNDER
+    organization = getattr(agent, "organization", None)
+    org_tree = getattr(organization, "org_tree", None)
+    if org_tree is not None and org_tree.get_staff_ids(agent.ai_id):
+        return RequestPriority.SUPERVISOR
+    return RequestPriority.EMPLOYEE
+
+
+def get_remaining_budget(agent: Agent) -> float | None:
+    """The agent's own budget in its organization, otherwise what is left of the
+    total API budget. None if there is no budget."""
+    organization = getattr(agent, "organization", None)
+    agent_budgets = getattr(organization, "agent_budgets", None)
+    if agent_budgets and agent.ai_id in agent_budgets:
+        return max(agent_budgets[agent.ai_id], 0)
+
+    api_manager = ApiManager()
+    if api_manager.get_total_budget() > 0.0:
+        return max(api_manager.get_total_budget() - api_manager.get_total_cost(), 0)
+    return None
+
+
 # TODO: Change debug from hardcode to argument
 async def chat_with_ai(
     config: Config,
@@ -26,6 +52,7 @@ async def chat_with_ai(
     user_input: str,
     token_limit: int,
     model: str | None = None,
+    on_delta: Callable[[str], None] | None = None,
 ):
     """
     Interact with the OpenAI API, sending the prompt, user input,
@@ -38,6 +65,8 @@ async def chat_with_ai(
         user_input (str): The input from the user.
         token_limit (int): The maximum number of tokens allowed in the API call.
         model (str, optional): The model to use. If None, the config.fast_llm_model will be used. Defaults to None.
+        on_delta (Callable[[str], None], optional): Streams the response, passing every part of it
+            to on_delta as it arrives. Defaults to None.
 
     Returns:
     str: The AI's response.
@@ -75,11 +104,18 @@ async def chat_with_ai(
         ],
     )
 
-    # Add messages from the full message history until we reach the token limit
-    next_message_to_add_index = len(agent.history) - 1
-    insertion_index = len(message_sequence)
     # Count the currently used tokens
-    current_tokens_used = message_sequence.token_length
+    static_prompt = agent.ai_config.cached_prompt
+    if isinstance(static_prompt, str) and static_prompt and system_prompt.startswith(static_prompt):
+        # The static part of the system prompt is only counted once by the AI config
+        current_tokens_used = agent.ai_config.get_prompt_token_count(
+            model
+        ) + count_message_tokens(
+            [Message("system", system_prompt[len(static_prompt) :]), message_sequence[1]],
+            model,
+        )
+    else:
+        current_tokens_used = message_sequence.token_length
 
     # while current_tokens_used > 2500:
     #     # remove memories until we are under 2500 tokens
@@ -99,27 +135,24 @@ async def chat_with_ai(
 
     current_tokens_used += 500  # Reserve space for new_summary_message
 
-    # Add Messages until the token limit is reached or there are no more messages to add.
-    for cycle in reversed(list(agent.history.per_cycle())):
-        messages_to_add = [msg for msg in cycle if msg is not None]
-        tokens_to_add = count_message_tokens(messages_to_add, model)
-        if current_tokens_used + tokens_to_add > send_token_limit:
-            break
-
-        # Add the most recent message to the start of the chain,
-        #  after the system prompts.
-        message_sequence.insert(insertion_index, *messages_to_add)
-        current_tokens_used += tokens_to_add
+    # Add the most recent cycles until the token limit is reached or there are no more
+    # cycles to add. Token lengths of cycles are cached by the history.
+    history_messages, tokens_to_add = agent.history.recent_cycles(
+        send_token_limit - current_tokens_used, model
+    )
+    current_tokens_used += tokens_to_add
 
     # Update & add summary of trimmed messages
     if len(agent.history) > 0:
         new_summary_message, trimmed_messages = agent.history.trim_messages(
-            current_message_chain=list(message_sequence),
+            current_message_chain=message_sequence.messages + history_messages,
         )
         tokens_to_add = count_message_tokens([new_summary_message], model)
-        message_sequence.insert(insertion_index, new_summary_message)
+        message_sequence.append(new_summary_message)
         current_tokens_used += tokens_to_add - 500
 
+    message_sequence.extend(history_messages)
+
         # FIXME: uncomment when memory is back in use
         # memory_store = get_memory(cfg)
         # for _, ai_msg, result_msg in agent.history.per_cycle(trimmed_messages):
@@ -127,12 +160,9 @@ async def chat_with_ai(
         #     logger.debug(f"Storing the following memory:\n{memory_to_add.dump()}")
         #     memory_store.add(memory_to_add)
 
-    api_manager = ApiManager()
     # inform the AI about its remaining budget (if it has one)
-    if api_manager.get_total_budget() > 0.0:
-        remaining_budget = api_manager.get_total_budget() - api_manager.get_total_cost()
-        if remaining_budget < 0:
-            remaining_budget = 0
+    remaining_budget = get_remaining_budget(agent)
+    if remaining_budget is not None:
         budget_message = f"Your remaining API budget is ${remaining_budget:.3f}" + (
             " BUDGET EXCEEDED! SHUT DOWN!\n\n"
             if remaining_budget == 0
@@ -197,6 +227,9 @@ async def chat_with_ai(
     assistant_reply = await acreate_chat_completion(
         prompt=message_sequence,
         max_tokens=tokens_remaining,
+        priority=get_request_priority(agent),
+        on_delta=on_delta,
+        prompt_tokens=current_tokens_used,
     )
 
 
@@ -1,11 +1,17 @@
+import asyncio
+import email.utils
 import functools
+import inspect
+import random
+import threading
 import time
-from typing import List
-from unittest.mock import patch
+from typing import AsyncIterator, List
 
+import aiohttp
 import openai
-import openai.api_resources.abstract.engine_api_resource as engine_api_resource
+import requests
 from colorama import Fore, Style
+from openai import api_requestor
 from openai.error import APIError, RateLimitError, Timeout
 from openai.openai_object import OpenAIObject
 
@@ -17,6 +23,7 @@ from autogpt.llm.base import (
     TextModelInfo,
     TText,
 )
+from autogpt.llm.scheduler import LLMScheduler
 from autogpt.logs import logger
 
 OPEN_AI_CHAT_MODELS = {
@@ -94,12 +101,16 @@ OPEN_AI_MODELS: dict[str, ChatModelInfo | EmbeddingModelInfo | TextModelInfo] =
 
 
 def meter_api(func):
-    """Adds ApiManager metering to functions which make OpenAI API calls"""
-    api_manager = ApiManager()
+    """Adds ApiManager metering to functions which make OpenAI API calls
 
-    openai_obj_processor = openai.util.convert_to_openai_object
+    The usage reported in the response is booked on the agent making the call,
+    see `current_agent_id`. Works for both regular and async functions.
+    """
+    api_manager = ApiManager()
 
     def update_usage_with_response(response: OpenAIObject):
+        if not (isinstance(response, OpenAIObject) and "usage" in response):
+            return
         try:
             usage = response.usage
             logger.debug(f"Reported usage from call to model {response.model}: {usage}")
@@ -111,34 +122,92 @@ def meter_api(func):
         except Exception as err:
             logger.warn(f"Failed to update API costs: {err.__class__.__name__}: {err}")
 
-    def metering_wrapper(*args, **kwargs):
-        openai_obj = openai_obj_processor(*args, **kwargs)
-        if isinstance(openai_obj, OpenAIObject) and "usage" in openai_obj:
-            update_usage_with_response(openai_obj)
-        return openai_obj
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def ametered_func(*args, **kwargs):
+            response = await func(*args, **kwargs)
+            update_usage_with_response(response)
+            return response
 
+        return ametered_func
+
+    @functools.wraps(func)
     def metered_func(*args, **kwargs):
-        with patch.object(
-            engine_api_resource.util,
-            "convert_to_openai_object",
-            side_effect=metering_wrapper,
-        ):
-            return func(*args, **kwargs)
+        response = func(*args, **kwargs)
+        update_usage_with_response(response)
+        return response
 
     return metered_func
 
 
+def get_retry_after(error: Exception) -> float | None:
+    """Returns the number of seconds the server asked us to wait before retrying,
+    from the `Retry-After` (or `retry-after-ms`) header of an OpenAI error.
+
+    Args:
+        error Exception: The error raised by the OpenAI API call
+
+    Returns:
+        float | None: Seconds to wait, or None if the server didn't say
+    """
+    headers = getattr(error, "headers", None) or {}
+    headers = {str(key).lower(): value for key, value in headers.items()}
+    try:
+        if "retry-after-ms" in headers:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        if "retry-after" in headers:
+            retry_after = headers["retry-after"]
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                # Retry-After may also be an HTTP date
+                retry_at = email.utils.parsedate_to_datetime(retry_after)
+                return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def compute_backoff(
+    attempt: int, error: Exception, backoff_base: float, max_backoff: float
+) -> float:
+    """Returns the seconds to wait before retrying a failed attempt.
+
+    Uses the server's `Retry-After` if it sent one, otherwise exponential backoff
+    capped at max_backoff, with jitter so agents that failed at the same time
+    don't retry at the same time.
+    """
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        return retry_after
+    backoff = min(backoff_base ** (attempt + 2), max_backoff)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
 def retry_api(
     num_retries: int = 10,
     backoff_base: float = 2.0,
     warn_user: bool = True,
+    max_backoff: float = 60.0,
+    deadline: float | None = None,
 ):
     """Retry an OpenAI API call.
 
+    Works for both regular and async functions. Async functions back off with
+    asyncio.sleep, so other coroutines keep running in the meantime.
+
+    Backoff is exponential with jitter, unless the server sends a `Retry-After`
+    header, which is honoured. A `retry_deadline` keyword argument (seconds)
+    passed to the wrapped function overrides `deadline` for that call.
+
     Args:
         num_retries int: Number of retries. Defaults to 10.
         backoff_base float: Base for exponential backoff. Defaults to 2.
         warn_user bool: Whether to warn the user. Defaults to True.
+        max_backoff float: Max seconds to wait between attempts. Defaults to 60.
+        deadline float: Max seconds to keep retrying, None retries until
+            num_retries is reached. Defaults to None.
     """
     retry_limit_msg = f"{Fore.RED}Error: " f"Reached rate limit, passing...{Fore.RESET}"
     api_key_error_msg = (
@@ -150,37 +219,187 @@ def retry_api(
         f"{Fore.RED}Error: API Bad gateway. Waiting {{backoff}} seconds...{Fore.RESET}"
     )
 
+    class _Attempts:
+        """Decides whether and how long to wait after a failed attempt"""
+
+        def __init__(self, request_deadline: float | None):
+            self.user_warned = not warn_user
+            self.num_attempts = num_retries + 1  # +1 for the first attempt
+            self.deadline = (
+                time.monotonic() + request_deadline
+                if request_deadline is not None
+                else None
+            )
+
+        def backoff(self, attempt: int, error: Exception) -> float:
+            """Returns the seconds to wait before the next attempt, or raises the error"""
+            if isinstance(error, RateLimitError):
+                if attempt == self.num_attempts:
+                    raise error
+
+                logger.debug(retry_limit_msg)
+                if not self.user_warned:
+                    logger.double_check(api_key_error_msg)
+                    self.user_warned = True
+
+            elif (error.http_status not in [502, 429]) or (
+                attempt == self.num_attempts
+            ):
+                raise error
+
+            backoff = compute_backoff(attempt, error, backoff_base, max_backoff)
+
+            if self.deadline is not None and time.monotonic() + backoff > self.deadline:
+                raise error
+
+            logger.debug(backoff_msg.format(backoff=backoff))
+            return backoff
+
     def _wrapper(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def _awrapped(*args, retry_deadline: float | None = deadline, **kwargs):
+                attempts = _Attempts(retry_deadline)
+                for attempt in range(1, attempts.num_attempts + 1):
+                    try:
+                        return await func(*args, **kwargs)
+                    except (RateLimitError, APIError, Timeout) as e:
+                        backoff = attempts.backoff(attempt, e)
+                        if isinstance(e, RateLimitError) and "model" in kwargs:
+                            # Hold back the other agents' requests to this model too
+                            LLMScheduler().pause(kwargs["model"], backoff)
+                    await asyncio.sleep(backoff)
+
+            return _awrapped
+
         @functools.wraps(func)
-        def _wrapped(*args, **kwargs):
-            user_warned = not warn_user
-            num_attempts = num_retries + 1  # +1 for the first attempt
-            for attempt in range(1, num_attempts + 1):
+        def _wrapped(*args, retry_deadline: float | None = deadline, **kwargs):
+            attempts = _Attempts(retry_deadline)
+            for attempt in range(1, attempts.num_attempts + 1):
                 try:
                     return func(*args, **kwargs)
+                except (RateLimitError, APIError, Timeout) as e:
+                    backoff = attempts.backoff(attempt, e)
+                time.sleep(backoff)
+
+        return _wrapped
 
-                except RateLimitError:
-                    if attempt == num_attempts:
-                        raise
+    return _wrapper
 
-                    logger.debug(retry_limit_msg)
-                    if not user_warned:
-                        logger.double_check(api_key_error_msg)
-                        user_warned = True
 
-                except (APIError, Timeout) as e:
-                    if (e.http_status not in [502, 429]) or (attempt == num_attempts):
-                        raise
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_async_session: aiohttp.ClientSession | None = None
+_async_session_loop: asyncio.AbstractEventLoop | None = None
 
-                backoff = backoff_base ** (attempt + 2)
-                logger.debug(backoff_msg.format(backoff=backoff))
-                time.sleep(backoff)
-        return _wrapped
-    return _wrapper
+
+def _get_pool_limits() -> tuple[int, float]:
+    from autogpt.config import Config
+
+    cfg = Config()
+    return cfg.openai_max_connections, cfg.openai_keepalive_timeout
+
+
+def get_session() -> requests.Session:
+    """Returns the HTTP session shared by all synchronous OpenAI API calls.
+
+    The openai library otherwise keeps a separate session per thread, so every
+    command thread sets up its own connections. The shared session holds at most
+    OPENAI_MAX_CONNECTIONS keep-alive connections; calls beyond that wait for
+    a free connection.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            max_connections, _ = _get_pool_limits()
+            session = requests.Session()
+            proxies = api_requestor._requests_proxies_arg(openai.proxy)
+            if proxies:
+                session.proxies = proxies
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=max_connections,
+                pool_maxsize=max_connections,
+                pool_block=True,
+                max_retries=api_requestor.MAX_CONNECTION_RETRIES,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """Returns the aiohttp session shared by all async OpenAI API calls.
+
+    Without it the openai library opens a new session, and so a new connection
+    with a new TLS handshake, for every async call. Must be called from within
+    the event loop the calls are made in.
+    """
+    global _async_session, _async_session_loop
+    loop = asyncio.get_running_loop()
+    if _async_session is None or _async_session.closed or _async_session_loop is not loop:
+        max_connections, keepalive_timeout = _get_pool_limits()
+        connector = aiohttp.TCPConnector(
+            limit=max_connections,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        _async_session = aiohttp.ClientSession(connector=connector)
+        _async_session_loop = loop
+    return _async_session
+
+
+async def close_sessions() -> None:
+    """Closes the shared HTTP sessions and their connections"""
+    global _session, _async_session, _async_session_loop
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+    if _async_session is not None:
+        if not _async_session.closed:
+            await _async_session.close()
+        _async_session = None
+        _async_session_loop = None
+
+
+def forget_sessions() -> None:
+    """Drops the shared sessions without closing them. A forked process must not
+    use the connections it inherited, they belong to its parent process."""
+    global _session, _session_lock, _async_session, _async_session_loop
+    _session_lock = threading.Lock()
+    _session = None
+    _async_session = None
+    _async_session_loop = None
+
+
+def use_session_pool(func):
+    """Makes the openai library send the requests of func through the shared sessions"""
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def _apooled(*args, **kwargs):
+            token = openai.aiosession.set(get_async_session())
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                openai.aiosession.reset(token)
+
+        return _apooled
+
+    @functools.wraps(func)
+    def _pooled(*args, **kwargs):
+        # The openai library looks up its session in a thread local
+        api_requestor._thread_context.session = get_session()
+        return func(*args, **kwargs)
+
+    return _pooled
 
 
 @meter_api
 @retry_api()
+@use_session_pool
 def create_chat_completion(
     messages: List[MessageDict],
     *_,
@@ -206,6 +425,7 @@ def create_chat_completion(
 
 @meter_api
 @retry_api()
+@use_session_pool
 async def acreate_chat_completion(
     messages: List[MessageDict],
     *_,
@@ -229,8 +449,35 @@ async def acreate_chat_completion(
     return completion
 
 
+@retry_api()
+@use_session_pool
+async def astream_chat_completion(
+    messages: List[MessageDict],
+    *_,
+    **kwargs,
+) -> AsyncIterator[OpenAIObject]:
+    """Create a streamed chat completion using the OpenAI API
+
+    Only starting the request is retried, the returned chunks are read by the
+    caller. Streamed responses don't report usage, so they aren't metered here.
+
+    Args:
+        messages: A list of messages to feed to the chatbot.
+        kwargs: Other arguments to pass to the OpenAI API chat completion call.
+    Returns:
+        AsyncIterator[OpenAIObject]: The ChatCompletion chunks from OpenAI
+
+    """
+    return await openai.ChatCompletion.acreate(
+        messages=messages,
+        stream=True,
+        **kwargs,
+    )
+
+
 @meter_api
 @retry_api()
+@use_session_pool
 def create_text_completion(
     prompt: str,
     *_,
@@ -253,6 +500,7 @@ def create_text_completion(
 
 @meter_api
 @retry_api()
+@use_session_pool
 def create_embedding(
     input: str | TText | List[str] | List[TText],
     *_,
@@ -0,0 +1,189 @@
+"""A content-addressed cache of deterministic LLM responses."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from autogpt.logs import logger
+from autogpt.singleton import Singleton
+
+# Number of recently used responses also kept in memory
+MEMORY_CACHE_SIZE = 1024
+
+
+class ResponseCache(metaclass=Singleton):
+    """Caches chat completions and embeddings by the exact request that produced them.
+
+    Summarizing the same webpage chunk, or embedding the same text, again gives
+    the same result at temperature 0, so the result is served from the cache
+    instead of calling the API. Entries are kept in a SQLite database, with
+    the most recently used ones also in memory. Once the database holds more
+    than `max_entries` entries, the least recently used ones are evicted.
+
+    `aget` and `aput` run the database access in the default executor, so async
+    callers don't block the event loop on SQLite.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int | None = None):
+        """
+        Args:
+            path (str): Path of the SQLite database. Defaults to the
+                LLM_RESPONSE_CACHE_PATH config, ":memory:" keeps it in memory.
+            max_entries (int): Max number of cached responses. Defaults to the
+                LLM_RESPONSE_CACHE_MAX_ENTRIES config.
+        """
+        if path is None or max_entries is None:
+            from autogpt.config import Config
+
+            cfg = Config()
+            path = cfg.llm_response_cache_path if path is None else path
+            if max_entries is None:
+                max_entries = cfg.llm_response_cache_max_entries
+        self.path = path
+        self.max_entries = max_entries
+
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        # Hits served from memory, their last use is written to the database on the next put
+        self._touched: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Number of rows in the database, counted once on connecting
+        self._count = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # A lost cache entry after a crash only costs an API call
+            self._db.execute("PRAGMA synchronous=OFF")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)"
+            )
+            (self._count,) = self._db.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+        return self._db
+
+    @staticmethod
+    def make_key(kind: str, **request: Any) -> str:
+        """Returns the cache key of a request, a hash of all its parameters"""
+        payload = json.dumps({"kind": kind, **request}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > MEMORY_CACHE_SIZE:
+            self._memory.popitem(last=False)
+
+    def _write_touched(self, db: sqlite3.Connection) -> None:
+        if self._touched:
+            db.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def get(self, key: str) -> Any | None:
+        """Returns the cached response for key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._touched[key] = time.time()
+                return self._memory[key]
+
+            try:
+                db = self._connect()
+                row = db.execute(
+                    "SELECT value FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                db.execute(
+                    "UPDATE responses SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warn(f"Failed to read LLM response cache: {e}")
+                return None
+
+            value = json.loads(row[0])
+            self._remember(key, value)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Stores a response, evicting the least recently used ones if the cache is full"""
+        try:
+            serialized = json.dumps(value)
+        except (TypeError, ValueError) as e:
+            logger.warn(f"Not caching LLM response that isn't JSON serializable: {e}")
+            return
+
+        with self._lock:
+            self._remember(key, value)
+            try:
+                db = self._connect()
+                now = time.time()
+                updated = db.execute(
+                    "UPDATE responses SET value = ?, last_used = ? WHERE key = ?",
+                    (serialized, now, key),
+                ).rowcount
+                if not updated:
+                    db.execute(
+                        "INSERT INTO responses (key, value, last_used) VALUES (?, ?, ?)",
+                        (key, serialized, now),
+                    )
+                    self._count += 1
+                self._write_touched(db)
+                if self._count > self.max_entries:
+                    # Evict a tenth at a time so the next puts don't have to
+                    evict = self._count - self.max_entries + self.max_entries // 10
+                    self._count -= db.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        " SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                        (evict,),
+                    ).rowcount
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warn(f"Failed to write LLM response cache: {e}")
+
+    async def aget(self, key: str) -> Any | None:
+        """Async version of get"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get, key)
+
+    async def aput(self, key: str, value: Any) -> None:
+        """Async version of put"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.put, key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._connect().execute("DELETE FROM responses")
+            self._db.commit()
+            self._count = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._write_touched(self._db)
+                self._db.commit()
+                self._db.close()
+                self._db = None
@@ -0,0 +1,198 @@
+"""Org-wide scheduling of LLM requests within the rate limits of each model."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional
+
+from autogpt.singleton import Singleton
+
+
+class RequestPriority(IntEnum):
+    """Priority of an LLM request, lower values are dispatched first"""
+
+    FOUNDER = 0
+    SUPERVISOR = 1
+    EMPLOYEE = 2
+    BACKGROUND = 3  # summarization and other work nobody is waiting on
+
+
+class TokenBucket:
+    """A token bucket that refills at `per_minute` tokens per minute.
+
+    The bucket holds at most one minute worth of tokens, so a burst can't use
+    more than the per minute limit.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Returns the seconds until `amount` tokens are available"""
+        self._refill()
+        # Requests larger than the bucket are let through once it is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass
+class ModelQueue:
+    """The pending requests and rate limit budgets of one model"""
+
+    requests: Optional[TokenBucket]
+    tokens: Optional[TokenBucket]
+    pending: List[tuple] = field(default_factory=list)
+    paused_until: float = 0.0
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+    dispatcher: Optional[asyncio.Task] = None
+
+    def time_until(self, num_tokens: int) -> float:
+        wait = self.paused_until - time.monotonic()
+        if self.requests is not None:
+            wait = max(wait, self.requests.time_until(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.time_until(num_tokens))
+        return max(wait, 0.0)
+
+    def consume(self, num_tokens: int) -> None:
+        if self.requests is not None:
+            self.requests.consume(1)
+        if self.tokens is not None:
+            self.tokens.consume(num_tokens)
+
+
+class LLMScheduler(metaclass=Singleton):
+    """Dispatches the LLM requests of all agents at the rate the API allows.
+
+    Every model has a requests-per-minute and a tokens-per-minute bucket.
+    Requests wait in a priority queue per model until both buckets have room,
+    so agents queue up instead of all hitting rate limits and backing off on
+    their own. When the API does return a rate limit error, `pause` holds back
+    every request for that model for the backoff period.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+    ):
+        """
+        Args:
+            requests_per_minute (int): Requests per minute per model, 0 for no limit.
+                Defaults to the LLM_REQUESTS_PER_MINUTE config.
+            tokens_per_minute (int): Tokens per minute per model, 0 for no limit.
+                Defaults to the LLM_TOKENS_PER_MINUTE config.
+        """
+        if requests_per_minute is None or tokens_per_minute is None:
+            from autogpt.config import Config
+
+            cfg = Config()
+            if requests_per_minute is None:
+                requests_per_minute = cfg.llm_requests_per_minute
+            if tokens_per_minute is None:
+                tokens_per_minute = cfg.llm_tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._queues: Dict[str, ModelQueue] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sequence = itertools.count()
+
+    def _get_queue(self, model: str) -> ModelQueue:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Queued futures and dispatchers belong to the loop they were created in
+            self._queues.clear()
+            self._loop = loop
+
+        if model not in self._queues:
+            self._queues[model] = ModelQueue(
+                requests=(
+                    TokenBucket(self.requests_per_minute)
+                    if self.requests_per_minute > 0
+                    else None
+                ),
+                tokens=(
+                    TokenBucket(self.tokens_per_minute)
+                    if self.tokens_per_minute > 0
+                    else None
+                ),
+            )
+        return self._queues[model]
+
+    async def acquire(
+        self,
+        model: str,
+        num_tokens: int,
+        priority: RequestPriority = RequestPriority.EMPLOYEE,
+    ) -> None:
+        """Waits until a request of `num_tokens` tokens may be sent to `model`.
+
+        Args:
+            model (str): The model the request is sent to
+            num_tokens (int): Prompt tokens plus the max tokens of the completion
+            priority (RequestPriority): Requests with a lower priority value go first
+        """
+        queue = self._get_queue(model)
+        if not queue.pending and queue.time_until(num_tokens) == 0:
+            queue.consume(num_tokens)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            queue.pending, (priority, next(self._sequence), num_tokens, future)
+        )
+        queue.wakeup.set()
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = asyncio.create_task(self._dispatch(queue))
+        await future
+
+    def pause(self, model: str, seconds: float) -> None:
+        """Holds back all requests to `model` for `seconds`, after a rate limit error"""
+        try:
+            queue = self._get_queue(model)
+        except RuntimeError:
+            # No running event loop, only async requests are scheduled
+            return
+        queue.paused_until = max(queue.paused_until, time.monotonic() + seconds)
+
+    async def _dispatch(self, queue: ModelQueue) -> None:
+        while queue.pending:
+            _, _, num_tokens, future = queue.pending[0]
+            if future.done():
+                # The waiting request was cancelled
+                heapq.heappop(queue.pending)
+                continue
+
+            wait = queue.time_until(num_tokens)
+            if wait <= 0:
+                heapq.heappop(queue.pending)
+                queue.consume(num_tokens)
+                future.set_result(None)
+                continue
+
+            # Wake up early if a request with a higher priority comes in
+            queue.wakeup.clear()
+            try:
+                await asyncio.wait_for(queue.wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
+from typing import Callable, List, Literal, Optional
 
 from colorama import Fore
 
@@ -10,6 +10,8 @@ from autogpt.logs import logger
 from ..api_manager import ApiManager
 from ..base import ChatSequence, Message
 from ..providers import openai as iopenai
+from ..response_cache import ResponseCache
+from ..scheduler import LLMScheduler, RequestPriority
 from .token_counter import *
 
 
@@ -84,20 +86,39 @@ def create_text_completion(
     return response.choices[0].text
 
 
+def _get_response_cache_key(
+    prompt: ChatSequence, chat_completion_kwargs: dict, use_cache: bool
+) -> Optional[str]:
+    """Returns the response cache key of a chat completion, None if it isn't cached"""
+    if not (use_cache and Config().llm_response_cache):
+        return None
+    # Only completions at temperature 0 are (close to) deterministic
+    if chat_completion_kwargs["temperature"] != 0:
+        return None
+    return ResponseCache.make_key(
+        "chat_completion", messages=prompt.raw(), **chat_completion_kwargs
+    )
+
+
 # Overly simple abstraction until we create something better
 def create_chat_completion(
     prompt: ChatSequence,
     model: Optional[str] = None,
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
+    use_cache: bool = True,
 ) -> str:
     """Create a chat completion using the OpenAI API
 
+    Completions at temperature 0 are served from the ResponseCache if the same
+    request was made before.
+
     Args:
         messages (List[Message]): The messages to send to the chat completion
         model (str, optional): The model to use. Defaults to None.
         temperature (float, optional): The temperature to use. Defaults to 0.9.
         max_tokens (int, optional): The max tokens to use. Defaults to None.
+        use_cache (bool, optional): Whether to use the response cache. Defaults to True.
 
     Returns:
         str: The response from the chat completion
@@ -129,24 +150,29 @@ def create_chat_completion(
             if message is not None:
                 return message
 
-    chat_completion_kwargs["api_key"] = cfg.openai_api_key
-    if cfg.use_azure:
-        chat_completion_kwargs["deployment_id"] = cfg.get_azure_deployment_id_for_model(
-            model
-        )
+    cache_key = _get_response_cache_key(prompt, chat_completion_kwargs, use_cache)
+    resp = ResponseCache().get(cache_key) if cache_key is not None else None
+    if resp is None:
+        chat_completion_kwargs["api_key"] = cfg.openai_api_key
+        if cfg.use_azure:
+            chat_completion_kwargs["deployment_id"] = cfg.get_azure_deployment_id_for_model(
+                model
+            )
 
-    response = iopenai.create_chat_completion(
-        messages=prompt.raw(),
-        **chat_completion_kwargs,
-    )
-    logger.debug(f"Response: {response}")
+        response = iopenai.create_chat_completion(
+            messages=prompt.raw(),
+            **chat_completion_kwargs,
+        )
+        logger.debug(f"Response: {response}")
 
-    resp = ""
-    if not hasattr(response, "error"):
-        resp = response.choices[0].message["content"]
-    else:
-        logger.error(response.error)
-        raise RuntimeError(response.error)
+        resp = ""
+        if not hasattr(response, "error"):
+            resp = response.choices[0].message["content"]
+        else:
+            logger.error(response.error)
+            raise RuntimeError(response.error)
+        if cache_key is not None:
+            ResponseCache().put(cache_key, resp)
 
     for plugin in cfg.plugins:
         if not plugin.can_handle_on_response():
@@ -181,14 +207,29 @@ async def acreate_chat_completion(
     model: Optional[str] = None,
     temperature: Optional[float] = None,
     max_tokens: Optional[int] = None,
+    priority: RequestPriority = RequestPriority.EMPLOYEE,
+    use_cache: bool = True,
+    on_delta: Optional[Callable[[str], None]] = None,
+    prompt_tokens: Optional[int] = None,
 ) -> str:
     """Create a chat completion using the OpenAI API
 
+    The request waits for its turn in the org-wide LLMScheduler, which keeps
+    all agents within the rate limits of the model. Completions at temperature 0
+    are served from the ResponseCache if the same request was made before.
+
     Args:
         messages (List[Message]): The messages to send to the chat completion
         model (str, optional): The model to use. Defaults to None.
         temperature (float, optional): The temperature to use. Defaults to 0.9.
         max_tokens (int, optional): The max tokens to use. Defaults to None.
+        priority (RequestPriority, optional): The scheduling priority of the request.
+            Defaults to RequestPriority.EMPLOYEE.
+        use_cache (bool, optional): Whether to use the response cache. Defaults to True.
+        on_delta (Callable[[str], None], optional): If given, the response is streamed
+            and every part of it is passed to on_delta as it arrives. Defaults to None.
+        prompt_tokens (int, optional): The token count of the prompt, if the caller
+            already counted it. Defaults to the token length of the prompt.
 
     Returns:
         str: The response from the chat completion
@@ -220,24 +261,40 @@ async def acreate_chat_completion(
             if message is not None:
                 return message
 
-    chat_completion_kwargs["api_key"] = cfg.openai_api_key
-    if cfg.use_azure:
-        chat_completion_kwargs["deployment_id"] = cfg.get_azure_deployment_id_for_model(
-            model
-        )
-
-    response = await iopenai.acreate_chat_completion(
-        messages=prompt.raw(),
-        **chat_completion_kwargs,
-    )
-    logger.debug(f"Response: {response}")
+    cache_key = _get_response_cache_key(prompt, chat_completion_kwargs, use_cache)
+    resp = await ResponseCache().aget(cache_key) if cache_key is not None else None
+    if resp is None:
+        chat_completion_kwargs["api_key"] = cfg.openai_api_key
+        if cfg.use_azure:
+            chat_completion_kwargs["deployment_id"] = cfg.get_azure_deployment_id_for_model(
+                model
+            )
 
-    resp = ""
-    if not hasattr(response, "error"):
-        resp = response.choices[0].message["content"]
-    else:
-        logger.error(response.error)
-        raise RuntimeError(response.error)
+        # Completion tokens count towards the tokens per minute limit too
+        if prompt_tokens is None:
+            prompt_tokens = prompt.token_length
+        await LLMScheduler().acquire(model, prompt_tokens + (max_tokens or 0), priority)
+        if on_delta is not None:
+            resp = await _astream_chat_completion(
+                prompt, chat_completion_kwargs, on_delta
+            )
+        else:
+            response = await iopenai.acreate_chat_completion(
+                messages=prompt.raw(),
+                **chat_completion_kwargs,
+            )
+            logger.debug(f"Response: {response}")
+
+            resp = ""
+            if not hasattr(response, "error"):
+                resp = response.choices[0].message["content"]
+            else:
+                logger.error(response.error)
+                raise RuntimeError(response.error)
+        if cache_key is not None:
+            await ResponseCache().aput(cache_key, resp)
+    elif on_delta is not None:
+        on_delta(resp)
 
     for plugin in cfg.plugins:
         if not plugin.can_handle_on_response():
@@ -245,3 +302,34 @@ async def acreate_chat_completion(
         resp = plugin.on_response(resp)
 
     return resp
+
+
+async def _astream_chat_completion(
+    prompt: ChatSequence,
+    chat_completion_kwargs: dict,
+    on_delta: Callable[[str], None],
+) -> str:
+    """Streams a chat completion, passing every part of the content to on_delta
+
+    Returns:
+        str: The full content of the response
+    """
+    chunks = await iopenai.astream_chat_completion(
+        messages=prompt.raw(),
+        **chat_completion_kwargs,
+    )
+    content = []
+    async for chunk in chunks:
+        delta = chunk.choices[0].delta.get("content") if chunk.choices else None
+        if delta:
+            content.append(delta)
+            on_delta(delta)
+    resp = "".join(content)
+    logger.debug(f"Response: {resp}")
+
+    # Streamed responses don't report their usage
+    model = chat_completion_kwargs["model"]
+    ApiManager().update_cost(
+        prompt.token_length, count_string_tokens(resp, model), model
+    )
+    return resp
@@ -1,13 +1,132 @@
 """Functions for counting the number of tokens in a message or string."""
 from __future__ import annotations
 
-from typing import List
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterable, List
 
 import tiktoken
 
 from autogpt.llm.base import Message
 from autogpt.logs import logger
 
+# Models whose token counting follows a pinned snapshot
+MODEL_ALIASES = {
+    # !Note: gpt-3.5-turbo may change over time.
+    "gpt-3.5-turbo": "gpt-3.5-turbo-0301",
+    # !Note: gpt-4 may change over time.
+    "gpt-4": "gpt-4-0314",
+}
+
+# model -> (tokens_per_message, tokens_per_name)
+MESSAGE_TOKEN_OVERHEAD = {
+    # every message follows <|start|>{role/name}\n{content}<|end|>\n,
+    # if there's a name, the role is omitted
+    "gpt-3.5-turbo-0301": (4, -1),
+    "gpt-4-0314": (3, 1),
+}
+
+TOKEN_COUNT_CACHE_SIZE = 8192
+
+
+class TokenCountCache:
+    """
+    A thread-safe LRU cache of (encoding name, content hash) -> token count.
+
+    Messages in the history, the system prompt and the summary are counted
+    again every cycle, so counts are cached instead of encoding the same text
+    over and over. Keys are hashes so large texts are not kept alive by the cache.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_COUNT_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._counts: OrderedDict[tuple[str, bytes], int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(encoding_name: str, text: str) -> tuple[str, bytes]:
+        digest = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16)
+        return encoding_name, digest.digest()
+
+    def get(self, encoding_name: str, text: str) -> int | None:
+        key = self._key(encoding_name, text)
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def put(self, encoding_name: str, text: str, count: int) -> None:
+        key = self._key(encoding_name, text)
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+token_count_cache = TokenCountCache()
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """
+    Returns the tiktoken encoding of a model. Encodings are loaded once per process.
+
+    Args:
+        model (str): The name of the model
+
+    Returns:
+        tiktoken.Encoding: The encoding, cl100k_base if the model is unknown
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        logger.warn("Warning: model not found. Using cl100k_base encoding.")
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens_batch(texts: Iterable[str], encoding: tiktoken.Encoding) -> List[int]:
+    """
+    Returns the number of tokens of each text. Texts that are not cached yet are
+    encoded together in a single call.
+
+    Args:
+        texts (Iterable[str]): The texts to count
+        encoding (tiktoken.Encoding): The encoding to count with
+
+    Returns:
+        List[int]: The token count of each text, in order
+    """
+    texts = list(texts)
+    counts: List[int | None] = [
+        token_count_cache.get(encoding.name, text) for text in texts
+    ]
+
+    missing = list({text for text, count in zip(texts, counts) if count is None})
+    if missing:
+        if len(missing) == 1:
+            tokens = [encoding.encode(missing[0])]
+        else:
+            tokens = encoding.encode_batch(missing)
+        new_counts = {
+            text: len(text_tokens) for text, text_tokens in zip(missing, tokens)
+        }
+        for text, count in new_counts.items():
+            token_count_cache.put(encoding.name, text, count)
+        counts = [
+            new_counts[text] if count is None else count
+            for text, count in zip(texts, counts)
+        ]
+
+    return counts
+
 
 def count_message_tokens(
     messages: List[Message], model: str = "gpt-3.5-turbo-0301"
@@ -24,39 +143,21 @@ def count_message_tokens(
     Returns:
         int: The number of tokens used by the list of messages.
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        logger.warn("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-    if model == "gpt-3.5-turbo":
-        # !Note: gpt-3.5-turbo may change over time.
-        # Returning num tokens assuming gpt-3.5-turbo-0301.")
-        return count_message_tokens(messages, model="gpt-3.5-turbo-0301")
-    elif model == "gpt-4":
-        # !Note: gpt-4 may change over time. Returning num tokens assuming gpt-4-0314.")
-        return count_message_tokens(messages, model="gpt-4-0314")
-    elif model == "gpt-3.5-turbo-0301":
-        tokens_per_message = (
-            4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
-        )
-        tokens_per_name = -1  # if there's a name, the role is omitted
-    elif model == "gpt-4-0314":
-        tokens_per_message = 3
-        tokens_per_name = 1
-    else:
+    model = MODEL_ALIASES.get(model, model)
+    if model not in MESSAGE_TOKEN_OVERHEAD:
         raise NotImplementedError(
             f"num_tokens_from_messages() is not implemented for model {model}.\n"
             " See https://github.com/openai/openai-python/blob/main/chatml.md for"
             " information on how messages are converted to tokens."
         )
-    num_tokens = 0
-    for message in messages:
-        num_tokens += tokens_per_message
-        for key, value in message.raw().items():
-            num_tokens += len(encoding.encode(value))
-            if key == "name":
-                num_tokens += tokens_per_name
+    tokens_per_message, tokens_per_name = MESSAGE_TOKEN_OVERHEAD[model]
+    encoding = get_encoding(model)
+
+    raw_messages = [message.raw() for message in messages]
+    values = [value for raw in raw_messages for value in raw.values()]
+    num_tokens = sum(count_tokens_batch(values, encoding))
+    num_tokens += tokens_per_message * len(raw_messages)
+    num_tokens += tokens_per_name * sum("name" in raw for raw in raw_messages)
     num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
     return num_tokens
 
@@ -72,5 +173,18 @@ def count_string_tokens(string: str, model_name: str) -> int:
     Returns:
         int: The number of tokens in the text string.
     """
-    encoding = tiktoken.encoding_for_model(model_name)
-    return len(encoding.encode(string))
+    return count_tokens_batch([string], get_encoding(model_name))[0]
+
+
+def count_string_tokens_batch(strings: Iterable[str], model_name: str) -> List[int]:
+    """
+    Returns the number of tokens in each of the text strings.
+
+    Args:
+        strings (Iterable[str]): The text strings.
+        model_name (str): The name of the encoding to use. (e.g., "gpt-3.5-turbo")
+
+    Returns:
+        List[int]: The number of tokens in each text string, in order.
+    """
+    return count_tokens_batch(strings, get_encoding(model_name))
@@ -292,3 +292,26 @@ def print_assistant_thoughts(
             say_text(assistant_thoughts_speak)
         else:
             logger.typewriter_log("SPEAK:", Fore.YELLOW, f"{assistant_thoughts_speak}")
+
+
+class StreamPrinter:
+    """Live console view of a streamed AI response.
+
+    Deltas are printed a line at a time, prefixed with the agent's name, so the
+    responses of agents streaming at the same time don't mix within a line.
+    """
+
+    def __init__(self, ai_name: str):
+        self.prefix = f"{Fore.LIGHTBLACK_EX}{ai_name} >{Style.RESET_ALL} "
+        self._line = ""
+
+    def write(self, delta: str) -> None:
+        lines = (self._line + delta).split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            print(self.prefix + line, flush=True)
+
+    def flush(self) -> None:
+        if self._line:
+            print(self.prefix + self._line, flush=True)
+            self._line = ""
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-import copy
+import asyncio
+import dataclasses
 import json
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
@@ -16,10 +17,45 @@ from autogpt.json_utils.utilities import (
 )
 from autogpt.llm.base import ChatSequence, Message, MessageRole, MessageType
 from autogpt.llm.providers.openai import OPEN_AI_CHAT_MODELS
-from autogpt.llm.utils import count_string_tokens, create_chat_completion
+from autogpt.llm.scheduler import RequestPriority
+from autogpt.llm.utils import (
+    acreate_chat_completion,
+    count_message_tokens,
+    count_string_tokens,
+    create_chat_completion,
+)
 from autogpt.log_cycle.log_cycle import PROMPT_SUMMARY_FILE_NAME, SUMMARY_FILE_NAME
 from autogpt.logs import logger
 
+# Attempts of the background summary task before it gives up until the next trim
+SUMMARY_ATTEMPTS = 3
+# Seconds to wait before retrying a failed summary, doubled after every failure
+SUMMARY_RETRY_DELAY = 5
+
+
+@dataclass
+class HistoryCycle:
+    """A validated cycle of the history: user input, AI response and action result"""
+
+    user_message: Message | None
+    ai_message: Message
+    result_message: Message
+    token_lengths: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def messages(self) -> list[Message]:
+        return [
+            msg
+            for msg in (self.user_message, self.ai_message, self.result_message)
+            if msg is not None
+        ]
+
+    def token_length(self, model: str) -> int:
+        """Token length of the cycle's messages, counted once per model"""
+        if model not in self.token_lengths:
+            self.token_lengths[model] = count_message_tokens(self.messages, model)
+        return self.token_lengths[model]
+
 
 @dataclass
 class MessageHistory:
@@ -30,6 +66,16 @@ class MessageHistory:
 
     last_trimmed_index: int = 0
 
+    # Cycles found so far and the index to continue looking for cycles at,
+    # so every AI response is only validated once
+    _cycles: list[HistoryCycle] = field(default_factory=list, repr=False)
+    _cycle_scan_index: int = field(default=0, repr=False)
+    _scanned_messages: list[Message] | None = field(default=None, repr=False)
+
+    # Trimmed messages waiting to be summarized by the background summary task
+    _pending_summary_events: list[Message] = field(default_factory=list, repr=False)
+    _summary_task: asyncio.Task | None = field(default=None, repr=False)
+
     def __getitem__(self, i: int):
         return self.messages[i]
 
@@ -58,6 +104,9 @@ class MessageHistory:
         Returns a list of trimmed messages: messages which are in the message history
         but not in current_message_chain.
 
+        When called from a running event loop the trimmed messages are summarized by a
+        background task, and the returned message holds the last completed summary.
+
         Args:
             current_message_chain (list[Message]): The messages currently in the context.
 
@@ -65,29 +114,81 @@ class MessageHistory:
             Message: A message with the new running summary after adding the trimmed messages.
             list[Message]: A list of messages that are in full_message_history with an index higher than last_trimmed_index and absent from current_message_chain.
         """
-        # Select messages in full_message_history with an index higher than last_trimmed_index
-        new_messages = [
-            msg for i, msg in enumerate(self) if i > self.last_trimmed_index
-        ]
+        chain = {(msg.role, msg.content, msg.type) for msg in current_message_chain}
 
-        # Remove messages that are already present in current_message_chain
-        new_messages_not_in_chain = [
-            msg for msg in new_messages if msg not in current_message_chain
-        ]
+        # Select messages in full_message_history with an index higher than last_trimmed_index
+        # that are not already present in current_message_chain
+        new_messages_not_in_chain = []
+        last_index = self.last_trimmed_index
+        for i in range(self.last_trimmed_index + 1, len(self.messages)):
+            msg = self.messages[i]
+            if (msg.role, msg.content, msg.type) not in chain:
+                new_messages_not_in_chain.append(msg)
+                last_index = i
 
         if not new_messages_not_in_chain:
             return self.summary_message(), []
 
-        new_summary_message = self.update_running_summary(
-            new_events=new_messages_not_in_chain
-        )
+        # Remember the index of the last message processed
+        self.last_trimmed_index = last_index
 
-        # Find the index of the last message processed
-        last_message = new_messages_not_in_chain[-1]
-        self.last_trimmed_index = self.messages.index(last_message)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            new_summary_message = self.update_running_summary(
+                new_events=new_messages_not_in_chain
+            )
+        else:
+            self.schedule_summary(new_messages_not_in_chain)
+            new_summary_message = self.summary_message()
 
         return new_summary_message, new_messages_not_in_chain
 
+    def schedule_summary(self, new_events: list[Message]) -> asyncio.Task:
+        """
+        Queues events to be added to the running summary by a background task, so the
+        agent does not wait for the LLM. Must be called from a running event loop.
+
+        Returns:
+            asyncio.Task: The task producing the summary
+        """
+        self._pending_summary_events.extend(new_events)
+        if self._summary_task is None or self._summary_task.done():
+            self._summary_task = asyncio.get_running_loop().create_task(
+                self._summarize_pending()
+            )
+        return self._summary_task
+
+    async def _summarize_pending(self) -> None:
+        cfg = Config()
+        failures = 0
+        while self._pending_summary_events:
+            new_events = self._pending_summary_events
+            self._pending_summary_events = []
+            events = self._summary_events(new_events, cfg)
+            try:
+                while events:
+                    batch = self._summary_batch(events, self.summary, cfg)
+                    await self.asummarize_batch(batch, cfg)
+                    events = events[len(batch) :]
+            except Exception as e:
+                # Keep the events that are not in the summary yet for the next attempt
+                self._pending_summary_events[:0] = new_events[events[0][0] :]
+                failures += 1
+                if failures >= SUMMARY_ATTEMPTS:
+                    logger.warn(
+                        f"Running summary is out of date, giving up on it until the "
+                        f"next trim: {e}"
+                    )
+                    return
+                delay = SUMMARY_RETRY_DELAY * 2 ** (failures - 1)
+                logger.warn(
+                    f"Failed to update the running summary, retrying in {delay}s: {e}"
+                )
+                await asyncio.sleep(delay)
+            else:
+                failures = 0
+
     def per_cycle(self, messages: list[Message] | None = None):
         """
         Yields:
@@ -95,8 +196,15 @@ class MessageHistory:
             Message: a message from the AI containing a proposed action
             Message: the message containing the result of the AI's proposed action
         """
-        messages = messages or self.messages
-        for i in range(0, len(messages) - 1):
+        if not messages:
+            for cycle in self.cycles():
+                yield cycle.user_message, cycle.ai_message, cycle.result_message
+            return
+
+        yield from self._scan_cycles(messages, 0)
+
+    def _scan_cycles(self, messages: list[Message], start: int):
+        for i in range(start, len(messages) - 1):
             ai_message = messages[i]
             if ai_message.type != "ai_response":
                 continue
@@ -116,6 +224,52 @@ class MessageHistory:
                     f"Invalid item in message history: {err}; Messages: {messages[i-1:i+2]}"
                 )
 
+    def cycles(self) -> list[HistoryCycle]:
+        """
+        Returns the valid cycles of the history. Only the messages appended since
+        the last call are scanned.
+        """
+        if self._scanned_messages is not self.messages or self._cycle_scan_index > len(
+            self.messages
+        ):
+            # The history was replaced, start over
+            self._cycles = []
+            self._cycle_scan_index = 0
+            self._scanned_messages = self.messages
+
+        for user_message, ai_message, result_message in self._scan_cycles(
+            self.messages, self._cycle_scan_index
+        ):
+            self._cycles.append(HistoryCycle(user_message, ai_message, result_message))
+        # The last message may be an AI response still waiting for its result
+        self._cycle_scan_index = max(self._cycle_scan_index, len(self.messages) - 1)
+
+        return self._cycles
+
+    def recent_cycles(self, token_budget: int, model: str) -> tuple[list[Message], int]:
+        """
+        Returns the messages of the most recent cycles that fit in a token budget.
+
+        Args:
+            token_budget (int): The max number of tokens the messages may use
+            model (str): The model to count tokens for
+
+        Returns:
+            list[Message]: The messages of the most recent cycles, oldest first
+            int: The number of tokens they use
+        """
+        cycles = self.cycles()
+        tokens_used = 0
+        first = len(cycles)
+        while first > 0:
+            tokens_to_add = cycles[first - 1].token_length(model)
+            if tokens_used + tokens_to_add > token_budget:
+                break
+            tokens_used += tokens_to_add
+            first -= 1
+
+        return [msg for cycle in cycles[first:] for msg in cycle.messages], tokens_used
+
     def summary_message(self) -> Message:
         return Message(
             "system",
@@ -140,17 +294,40 @@ class MessageHistory:
             # Returns: "This reminds you of these events from your past: \nI entered the kitchen and found a scrawled note saying 7."
         """
         cfg = Config()
+        events = self._summary_events(new_events, cfg)
+        while events:
+            batch = self._summary_batch(events, self.summary, cfg)
+            self.summarize_batch(batch, cfg)
+            events = events[len(batch) :]
+        return self.summary_message()
 
-        if not new_events:
-            return self.summary_message()
+    async def aupdate_running_summary(self, new_events: list[Message]) -> Message:
+        """
+        Async version of update_running_summary
+        """
+        cfg = Config()
+        events = self._summary_events(new_events, cfg)
+        while events:
+            batch = self._summary_batch(events, self.summary, cfg)
+            await self.asummarize_batch(batch, cfg)
+            events = events[len(batch) :]
+        return self.summary_message()
 
-        # Create a copy of the new_events list to prevent modifying the original list
-        new_events = copy.deepcopy(new_events)
+    def _summary_events(
+        self, new_events: list[Message], cfg: Config
+    ) -> list[tuple[int, Message]]:
+        """
+        Prepares the events for summarization
 
-        # Replace "assistant" with "you". This produces much better first person past tense results.
-        for event in new_events:
+        Returns:
+            list[tuple[int, Message]]: The position of each event in new_events
+                and the event as it is put in the summary prompt
+        """
+        events = []
+        for position, event in enumerate(new_events):
+            # Replace "assistant" with "you". This produces much better first person past tense results.
             if event.role.lower() == "assistant":
-                event.role = "you"
+                event = dataclasses.replace(event, role="you")
 
                 # Remove "thoughts" dictionary from "content"
                 try:
@@ -164,48 +341,50 @@ class MessageHistory:
                         logger.error(f"{event.content}")
 
             elif event.role.lower() == "system":
-                event.role = "your computer"
+                event = dataclasses.replace(event, role="your computer")
 
             # Delete all user messages
             elif event.role == "user":
-                new_events.remove(event)
+                continue
+
+            events.append((position, event))
 
-        # Summarize events and current summary in batch to a new running summary
+        return events
 
+    def _summary_batch(
+        self, events: list[tuple[int, Message]], summary: str, cfg: Config
+    ) -> list[Message]:
+        """
+        Returns the first of the prepared events that fit in the model together
+        with the given summary, at least one
+
+        Args:
+            events: The events prepared by _summary_events
+            summary: The running summary the batch is going to be added to
+        """
         # Assume an upper bound length for the summary prompt template, i.e. Your task is to create a concise running summary...., in summarize_batch func
         # TODO make this default dynamic
         prompt_template_length = 100
         max_tokens = OPEN_AI_CHAT_MODELS.get(cfg.fast_llm_model).max_tokens
-        summary_tlength = count_string_tokens(str(self.summary), cfg.fast_llm_model)
+        summary_tlength = count_string_tokens(str(summary), cfg.fast_llm_model)
         batch = []
         batch_tlength = 0
 
         # TODO Can put a cap on length of total new events and drop some previous events to save API cost, but need to think thru more how to do it without losing the context
-        for event in new_events:
+        for _, event in events:
             event_tlength = count_string_tokens(str(event), cfg.fast_llm_model)
-
             if (
-                batch_tlength + event_tlength
+                batch
+                and batch_tlength + event_tlength
                 > max_tokens - prompt_template_length - summary_tlength
             ):
-                # The batch is full. Summarize it and start a new one.
-                self.summarize_batch(batch, cfg)
-                summary_tlength = count_string_tokens(
-                    str(self.summary), cfg.fast_llm_model
-                )
-                batch = [event]
-                batch_tlength = event_tlength
-            else:
-                batch.append(event)
-                batch_tlength += event_tlength
-
-        if batch:
-            # There's an unprocessed batch. Summarize it.
-            self.summarize_batch(batch, cfg)
-
-        return self.summary_message()
+                # The batch is full, the rest goes in the next one
+                break
+            batch.append(event)
+            batch_tlength += event_tlength
+        return batch
 
-    def summarize_batch(self, new_events_batch, cfg):
+    def _summary_prompt(self, new_events_batch, cfg) -> ChatSequence:
         prompt = f'''Your task is to create a concise running summary of actions and information results in the provided text, focusing on key and potentially important information to remember.
 
 You will receive the current summary and your latest actions. Combine them, adding relevant key information from the latest development in 1st person past tense and keeping the summary concise.
@@ -229,8 +408,10 @@ Latest Development:
             prompt.raw(),
             PROMPT_SUMMARY_FILE_NAME,
         )
+        return prompt
 
-        self.summary = create_chat_completion(prompt)
+    def _set_summary(self, summary: str) -> None:
+        self.summary = summary
 
         self.agent.log_cycle_handler.log_cycle(
             self.agent.ai_name,
@@ -239,3 +420,13 @@ Latest Development:
             self.summary,
             SUMMARY_FILE_NAME,
         )
+
+    def summarize_batch(self, new_events_batch, cfg):
+        prompt = self._summary_prompt(new_events_batch, cfg)
+        self._set_summary(create_chat_completion(prompt))
+
+    async def asummarize_batch(self, new_events_batch, cfg):
+        prompt = self._summary_prompt(new_events_batch, cfg)
+        self._set_summary(
+            await acreate_chat_completion(prompt, priority=RequestPriority.BACKGROUND)
+        )
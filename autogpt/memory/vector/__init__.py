@@ -3,12 +3,13 @@ from autogpt.logs import logger
 
 from .memory_item import MemoryItem, MemoryItemRelevance
 from .providers.base import VectorMemoryProvider as VectorMemory
+from .providers.ivf_flat import IVFFlatMemory
 from .providers.json_file import JSONFileMemory
 from .providers.no_memory import NoMemory
 
 # List of supported memory backends
 # Add a backend to this list if the import attempt is successful
-supported_memory = ["json_file", "no_memory"]
+supported_memory = ["json_file", "ivf_flat", "no_memory"]
 
 # try:
 #     from .providers.redis import RedisMemory
@@ -45,6 +46,13 @@ def get_memory(cfg: Config, agent_mem_path=None, init=False) -> VectorMemory:
     match cfg.memory_backend:
         case "json_file":
             memory = JSONFileMemory(cfg, agent_mem_path)
+            if init:
+                memory.clear()
+
+        case "ivf_flat":
+            memory = IVFFlatMemory(cfg, agent_mem_path)
+            if init:
+                memory.clear()
 
         case "pinecone":
             raise NotImplementedError(
@@ -130,6 +138,7 @@ __all__ = [
     "MemoryItem",
     "MemoryItemRelevance",
     "JSONFileMemory",
+    "IVFFlatMemory",
     "NoMemory",
     "VectorMemory",
     # "RedisMemory",
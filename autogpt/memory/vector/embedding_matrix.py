@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+from .embedding_store import EmbeddingStore, QuantizedEmbeddingStore
+from .memory_item import MemoryItem, MemoryItemRelevance
+from .utils import Embedding
+
+# Number of rows the matrix starts with, it doubles whenever it is full
+INITIAL_CAPACITY = 256
+
+
+class EmbeddingMatrix:
+    """
+    Holds the summary and chunk embeddings of a set of memories in one contiguous
+    float32 matrix, so a query is scored against all of them with a single
+    matrix-vector product.
+
+    The rows of a memory are stored together: first its summary, then its chunks.
+    `row_memory` and `row_chunk` map every row to the position of its memory and
+    the index of its chunk (-1 for the summary).
+
+    If an EmbeddingStore is given, the rows are kept in its memory-mapped file
+    instead of in memory, and the embeddings of the memories are views of it.
+    They are moved to the store's new mapping whenever it maps the file anew.
+    With a QuantizedEmbeddingStore as well, searches scan the int8 codes of the
+    rows and re-rank the `rerank_factor * k` best memories with their full
+    precision rows, so only the pages of those rows are read from the store.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[MemoryItem] = (),
+        store: EmbeddingStore | None = None,
+        quantized: QuantizedEmbeddingStore | None = None,
+        rerank_factor: int = 4,
+    ):
+        if quantized is not None and store is None:
+            raise ValueError("Quantized embeddings need a store to re-rank from")
+        self.items: list[MemoryItem] = []
+        self.store = store
+        self.quantized = quantized
+        self.rerank_factor = rerank_factor
+        self.row_memory = np.empty(0, np.int32)
+        self.row_chunk = np.empty(0, np.int32)
+        self._rows: np.ndarray | None = None
+        self._n_rows = 0
+        # Generation of the store mapping the embeddings are views of
+        self._bound_generation = 0
+        # Position of the first row of every memory, for per-memory aggregation
+        self._starts: list[int] = []
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self) -> Iterator[MemoryItem]:
+        return iter(self.items)
+
+    @property
+    def n_rows(self) -> int:
+        return self._n_rows
+
+    @property
+    def rows(self) -> np.ndarray:
+        """The embedding matrix, one row per summary or chunk"""
+        if self.store is not None:
+            return self.store.rows
+        if self._rows is None:
+            return np.empty((0, 0), np.float32)
+        return self._rows[: self._n_rows]
+
+    def _reserve(self, n_rows: int, dimensions: int) -> None:
+        capacity = len(self.row_memory)
+        if n_rows > capacity:
+            capacity = max(capacity, INITIAL_CAPACITY)
+            while capacity < n_rows:
+                capacity *= 2
+            self.row_memory = np.resize(self.row_memory, capacity)
+            self.row_chunk = np.resize(self.row_chunk, capacity)
+        if self.store is not None:
+            return
+
+        if self._rows is None:
+            self._rows = np.empty((capacity, dimensions), np.float32)
+        elif dimensions != self._rows.shape[1]:
+            raise ValueError(
+                f"Embedding has {dimensions} dimensions, "
+                f"the matrix holds {self._rows.shape[1]}"
+            )
+        elif capacity > len(self._rows):
+            self._rows = np.resize(self._rows, (capacity, dimensions))
+
+    def _register(self, item: MemoryItem, n_rows: int) -> None:
+        start, end = self._n_rows, self._n_rows + n_rows
+        self.row_memory[start:end] = len(self.items)
+        self.row_chunk[start:end] = np.arange(-1, n_rows - 1)
+        self._n_rows = end
+        self._starts.append(start)
+        self.items.append(item)
+
+    def add(self, item: MemoryItem) -> None:
+        embeddings = np.vstack(
+            [np.asarray(item.e_summary, np.float32)]
+            + [np.asarray(e, np.float32) for e in item.e_chunks]
+        )
+        start, end = self._n_rows, self._n_rows + len(embeddings)
+        if self.store is not None:
+            self.store.append(embeddings)
+        if self.quantized is not None:
+            self.quantized.append(embeddings)
+        self._reserve(end, embeddings.shape[1])
+        if self.store is None:
+            self._rows[start:end] = embeddings
+        self._register(item, len(embeddings))
+        if self.store is not None:
+            self._bind(len(self.items) - 1)
+            if self.store.generation != self._bound_generation:
+                # The store grew into a new mapping, release the old one
+                self._bind_all()
+
+    def adopt(self, items: Sequence[MemoryItem], row_counts: Sequence[int]) -> None:
+        """
+        Adds memories whose rows are already in the store, in the same order.
+        Their embeddings are set to views of the store.
+        """
+        self._reserve(self._n_rows + sum(row_counts), 0)
+        for item, n_rows in zip(items, row_counts):
+            self._register(item, n_rows)
+        if self._n_rows != len(self.store):
+            raise ValueError(
+                f"Memories have {self._n_rows} embeddings, "
+                f"the store holds {len(self.store)}"
+            )
+        if self.quantized is not None:
+            if len(self.quantized) >= self._n_rows:
+                self.quantized.truncate(self._n_rows)
+            else:
+                # Codes are missing, e.g. quantization was just enabled
+                self.quantized.rewrite(self.store.rows)
+        self._bind_all()
+
+    def _bind(self, i: int) -> None:
+        rows = self.memory_rows(i)
+        self.items[i].e_summary = rows[0]
+        self.items[i].e_chunks = list(rows[1:])
+
+    def _bind_all(self) -> None:
+        for i in range(len(self.items)):
+            self._bind(i)
+        if self.store is not None:
+            self._bound_generation = self.store.generation
+
+    def row_range(self, i: int) -> tuple[int, int]:
+        """Returns the first and last+1 row of the i-th memory"""
+        start = self._starts[i]
+        end = self._starts[i + 1] if i + 1 < len(self._starts) else self._n_rows
+        return start, end
+
+    def memory_rows(self, i: int) -> np.ndarray:
+        """Returns the rows of the i-th memory: its summary, then its chunks"""
+        start, end = self.row_range(i)
+        return self.rows[start:end]
+
+    def index(self, item: MemoryItem) -> int:
+        """Returns the position of the memory, compared by identity"""
+        for i, m in enumerate(self.items):
+            if m is item:
+                return i
+        raise ValueError("Memory is not in the matrix")
+
+    def remove(self, item: MemoryItem) -> None:
+        i = self.index(item)
+        start, end = self.row_range(i)
+        n_removed = end - start
+
+        # Shift the rows of the later memories down over the removed rows
+        n = self._n_rows
+        if self.store is not None:
+            self.store.delete(start, end)
+            if self.quantized is not None:
+                self.quantized.delete(start, end)
+        else:
+            self._rows[start : n - n_removed] = self._rows[end:n]
+        self.row_chunk[start : n - n_removed] = self.row_chunk[end:n]
+        self.row_memory[start : n - n_removed] = self.row_memory[end:n] - 1
+        self._n_rows -= n_removed
+
+        del self.items[i]
+        del self._starts[i]
+        for j in range(i, len(self._starts)):
+            self._starts[j] -= n_removed
+        if self.store is not None:
+            # The old file is replaced, point the embeddings to the new one
+            self._bind_all()
+
+    def clear(self) -> None:
+        self.items.clear()
+        self._starts.clear()
+        self._n_rows = 0
+        if self.store is not None:
+            self.store.clear()
+        if self.quantized is not None:
+            self.quantized.clear()
+
+    def scores(self, e_query: Embedding) -> np.ndarray:
+        """Returns the similarity of every row to the query"""
+        return self.rows @ np.asarray(e_query, np.float32)
+
+    def _relevance(self, i: int, query: str, scores: np.ndarray) -> MemoryItemRelevance:
+        start, end = self.row_range(i)
+        return MemoryItemRelevance(
+            memory_item=self.items[i],
+            for_query=query,
+            summary_relevance_score=float(scores[start]),
+            chunk_relevance_scores=scores[start + 1 : end].tolist(),
+        )
+
+    def score_all(self, query: str, e_query: Embedding) -> list[MemoryItemRelevance]:
+        """Returns the relevance of every memory to the query"""
+        scores = self.scores(e_query)
+        return [self._relevance(i, query, scores) for i in range(len(self.items))]
+
+    def top_k(
+        self, query: str, e_query: Embedding, k: int
+    ) -> list[MemoryItemRelevance]:
+        """Returns the k memories most relevant to the query, most relevant first"""
+        if not self.items or k < 1:
+            return []
+
+        if self.quantized is not None:
+            return self._top_k_reranked(query, e_query, k)
+
+        scores = self.scores(e_query)
+        # The score of a memory is the best score of its summary and chunks
+        memory_scores = np.maximum.reduceat(scores, self._starts)
+        k = min(k, len(memory_scores))
+        top = np.argpartition(-memory_scores, k - 1)[:k]
+        top = top[np.argsort(-memory_scores[top], kind="stable")]
+        return [self._relevance(int(i), query, scores) for i in top]
+
+    def _top_k_reranked(
+        self, query: str, e_query: Embedding, k: int
+    ) -> list[MemoryItemRelevance]:
+        query_vector = np.asarray(e_query, np.float32)
+        memory_scores = np.maximum.reduceat(
+            self.quantized.scores(query_vector), self._starts
+        )
+        n_candidates = min(k * self.rerank_factor, len(memory_scores))
+        candidates = np.argpartition(-memory_scores, n_candidates - 1)[:n_candidates]
+
+        relevances = []
+        for i in candidates:
+            scores = self.memory_rows(int(i)) @ query_vector
+            relevances.append(
+                MemoryItemRelevance(
+                    memory_item=self.items[i],
+                    for_query=query,
+                    summary_relevance_score=float(scores[0]),
+                    chunk_relevance_scores=scores[1:].tolist(),
+                )
+            )
+        relevances.sort(key=lambda r: r.score, reverse=True)
+        return relevances[:k]
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+# File suffix of the full precision embedding stores of each supported dtype
+DTYPE_SUFFIXES = {"float32": ".f32", "float16": ".f16"}
+STORE_DTYPES = ("float32", "float16", "int8")
+# Number of quantized rows converted to float32 at once while scoring
+SCORE_BLOCK_ROWS = 4096
+# Number of rows a file is first grown to, it doubles whenever it is full
+INITIAL_CAPACITY = 256
+
+
+class EmbeddingStore:
+    """
+    Fixed-width embedding rows in a binary file, read through `np.memmap`.
+
+    Opening a store maps the file instead of reading it, so loading a large memory
+    is near-instant and processes that read the same file share its pages.
+    Removing rows writes a new file that replaces the old one, so rows that are still
+    mapped from the old file stay valid.
+
+    Appended rows are written after the last row. The file grows ahead of them,
+    doubling whenever it is full, and is mapped as a whole. So appends land in the
+    current mapping, and the file is only mapped anew when it grows. `generation`
+    counts the mappings, so views of the rows can be moved to the new one. The
+    number of rows is not stored: a reopened store counts the unused capacity as
+    rows until its owner `truncate`s it to the rows it knows of.
+    """
+
+    def __init__(
+        self, path: Path, dtype: str = "float32", dimensions: int | None = None
+    ):
+        """
+        Args:
+            path: Path of the file, it is created on the first append
+            dtype: Type the embeddings are stored as, float32, float16 or int8
+            dimensions: Length of the embeddings, taken from the first append
+                if not given
+        """
+        if dtype not in STORE_DTYPES:
+            raise ValueError(
+                f"Unsupported embedding dtype '{dtype}', "
+                f"use one of {', '.join(STORE_DTYPES)}"
+            )
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.dimensions = dimensions
+        # Mapping of the whole file, including the capacity beyond the rows
+        self._map: np.ndarray | None = None
+        self._n_rows: int | None = None
+        # Incremented whenever the file is mapped anew
+        self.generation = 0
+
+    @property
+    def _row_size(self) -> int:
+        return self.dimensions * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        if not self.dimensions:
+            return 0
+        if self._n_rows is None:
+            self._n_rows = (
+                self.path.stat().st_size // self._row_size if self.path.exists() else 0
+            )
+        return self._n_rows
+
+    @property
+    def rows(self) -> np.ndarray:
+        """All rows, mapped read-only from the file"""
+        n_rows = len(self)
+        if n_rows == 0:
+            return np.empty((0, self.dimensions or 0), self.dtype)
+        if self._map is None:
+            capacity = self.path.stat().st_size // self._row_size
+            self._map = np.memmap(
+                self.path, self.dtype, mode="r", shape=(capacity, self.dimensions)
+            )
+            self.generation += 1
+        return self._map[:n_rows]
+
+    def _check_dimensions(self, rows: np.ndarray) -> None:
+        if self.dimensions is None:
+            self.dimensions = rows.shape[1]
+        elif rows.shape[1] != self.dimensions:
+            raise ValueError(
+                f"Embedding has {rows.shape[1]} dimensions, "
+                f"the store holds {self.dimensions}"
+            )
+
+    def append(self, rows: np.ndarray) -> int:
+        """Appends rows to the file
+
+        Returns:
+            int: The index of the first appended row
+        """
+        self._check_dimensions(rows)
+        start = len(self)
+        end = start + len(rows)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("r+b" if self.path.exists() else "wb") as f:
+            capacity = os.fstat(f.fileno()).st_size // self._row_size
+            if end > capacity:
+                capacity = max(capacity, INITIAL_CAPACITY)
+                while capacity < end:
+                    capacity *= 2
+                f.truncate(capacity * self._row_size)
+                self._map = None
+            f.seek(start * self._row_size)
+            rows.astype(self.dtype, copy=False).tofile(f)
+        self._n_rows = end
+        return start
+
+    def rewrite(self, rows: np.ndarray) -> None:
+        """Replaces all rows of the store"""
+        if len(rows):
+            self._check_dimensions(rows)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_path = self.path.with_name(self.path.name + ".new")
+        with new_path.open("wb") as f:
+            rows.astype(self.dtype, copy=False).tofile(f)
+        os.replace(new_path, self.path)
+        self._map = None
+        self._n_rows = len(rows)
+
+    def truncate(self, n_rows: int) -> None:
+        """Drops the rows from n_rows on, and the unused capacity of the file"""
+        if self.path.exists():
+            os.truncate(self.path, n_rows * self._row_size if n_rows else 0)
+        self._map = None
+        self._n_rows = n_rows
+
+    def delete(self, start: int, end: int) -> None:
+        """Removes rows start to end-1"""
+        self.rewrite(np.delete(self.rows, np.s_[start:end], axis=0))
+
+    def clear(self) -> None:
+        self.rewrite(np.empty((0, self.dimensions or 0), self.dtype))
+
+
+class QuantizedEmbeddingStore:
+    """
+    int8 codes of embeddings with a float32 scale per row, in memory-mapped files.
+
+    Every row is scaled so its largest component maps to 127. The dot product of
+    a row with a query is approximated by scale * (codes . query), which scans a
+    quarter of the bytes of the float32 rows.
+    """
+
+    def __init__(self, path: Path, dimensions: int | None = None):
+        """
+        Args:
+            path: Path of the codes file, the scales are stored next to it
+            dimensions: Length of the embeddings, taken from the first append
+                if not given
+        """
+        self.codes = EmbeddingStore(path, "int8", dimensions)
+        self.scales = EmbeddingStore(
+            Path(path).with_name(Path(path).name + ".scales"), "float32", 1
+        )
+
+    def __len__(self) -> int:
+        return min(len(self.codes), len(self.scales))
+
+    @staticmethod
+    def quantize(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the int8 codes and the scale of every row"""
+        rows = np.asarray(rows, np.float32)
+        max_abs = np.abs(rows).max(axis=1, initial=0)
+        scales = np.where(max_abs > 0, max_abs / 127, 1).astype(np.float32)
+        codes = np.clip(np.rint(rows / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def append(self, rows: np.ndarray) -> None:
+        codes, scales = self.quantize(rows)
+        self.codes.append(codes)
+        self.scales.append(scales[:, None])
+
+    def rewrite(self, rows: np.ndarray) -> None:
+        """Replaces all rows, quantizing them a block at a time"""
+        self.clear()
+        for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+            self.append(rows[start : start + SCORE_BLOCK_ROWS])
+
+    def truncate(self, n_rows: int) -> None:
+        """Drops the rows from n_rows on, and the unused capacity of the files"""
+        self.codes.truncate(n_rows)
+        self.scales.truncate(n_rows)
+
+    def delete(self, start: int, end: int) -> None:
+        """Removes rows start to end-1"""
+        self.codes.delete(start, end)
+        self.scales.delete(start, end)
+
+    def clear(self) -> None:
+        self.codes.clear()
+        self.scales.clear()
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Returns the approximate dot product of every row with the query"""
+        query = np.asarray(query, np.float32)
+        codes = self.codes.rows
+        n_rows = len(self)
+        scores = np.empty(n_rows, np.float32)
+        for start in range(0, n_rows, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, n_rows)
+            scores[start:end] = codes[start:end].astype(np.float32) @ query
+        scores *= self.scales.rows[:n_rows, 0]
+        return scores
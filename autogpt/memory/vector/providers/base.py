@@ -2,17 +2,22 @@ import abc
 import functools
 from typing import MutableSet, Sequence
 
-import numpy as np
-
 from autogpt.config.config import Config
 from autogpt.logs import logger
 from autogpt.singleton import AbstractSingleton
 
 from .. import MemoryItem, MemoryItemRelevance
+from ..embedding_matrix import EmbeddingMatrix
 from ..utils import Embedding, get_embedding
 
 
 class VectorMemoryProvider(MutableSet[MemoryItem]):
+    embedding_matrix: EmbeddingMatrix | None = None
+    """
+    The embeddings of all memories, kept up to date by providers that hold their
+    memories locally. Without it, one is built from the memories for every search.
+    """
+
     @abc.abstractmethod
     def __init__(self, config: Config):
         pass
@@ -48,13 +53,10 @@ class VectorMemoryProvider(MutableSet[MemoryItem]):
             f"{len(self)} memories in index"
         )
 
-        relevances = self.score_memories_for_relevance(query)
-        logger.debug(f"Memory relevance scores: {[str(r) for r in relevances]}")
-
-        # take last k items and reverse
-        top_k_indices = np.argsort([r.score for r in relevances])[-k:][::-1]
-
-        return [relevances[i] for i in top_k_indices]
+        e_query: Embedding = get_embedding(query)
+        relevances = self._get_embedding_matrix().top_k(query, e_query, k)
+        logger.debug(f"Top memory relevance scores: {[str(r) for r in relevances]}")
+        return relevances
 
     def score_memories_for_relevance(
         self, for_query: str
@@ -64,11 +66,19 @@ class VectorMemoryProvider(MutableSet[MemoryItem]):
         Implementations may override this function for performance purposes.
         """
         e_query: Embedding = get_embedding(for_query)
-        return [m.relevance_for(for_query, e_query) for m in self]
+        return self._get_embedding_matrix().score_all(for_query, e_query)
+
+    def _get_embedding_matrix(self) -> EmbeddingMatrix:
+        if self.embedding_matrix is not None:
+            return self.embedding_matrix
+        return EmbeddingMatrix(self)
 
     def get_stats(self) -> tuple[int, int]:
         """
         Returns:
             tuple (n_memories: int, n_chunks: int): the stats of the memory index
         """
+        if self.embedding_matrix is not None:
+            # Every memory has one summary row besides its chunk rows
+            return len(self), self.embedding_matrix.n_rows - len(self)
         return len(self), functools.reduce(lambda t, m: t + len(m.e_chunks), self, 0)
@@ -0,0 +1,606 @@
+"""Memory backend with an approximate nearest neighbour (IVF-flat) index"""
+
+from __future__ import annotations
+
+import math
+import os
+import shutil
+import zipfile
+from pathlib import Path
+from typing import Iterator, Sequence
+
+import numpy as np
+import orjson
+
+from autogpt.config import Config
+from autogpt.logs import logger
+
+from ..memory_item import MemoryItem, MemoryItemRelevance
+from ..utils import Embedding, get_embedding
+from .base import VectorMemoryProvider
+
+# Below this many rows, scoring all of them is as fast as probing an index
+MIN_TRAIN_ROWS = 1024
+KMEANS_ITERATIONS = 10
+# Number of rows per inverted list k-means is trained on
+KMEANS_SAMPLES_PER_LIST = 64
+# Number of rows assigned to their nearest centroid at once
+ASSIGN_BATCH_SIZE = 8192
+
+MEMORY_FIELDS = ("raw_content", "summary", "chunks", "chunk_summaries", "metadata")
+# Fields of the records of rows added since the .npz was saved: row, memory, list
+ROW_RECORD_FIELDS = 3
+
+
+class IVFFlatMemory(VectorMemoryProvider):
+    """
+    Memory backend that searches an inverted file (IVF-flat) index.
+
+    The summary and chunk embeddings of all memories are clustered with k-means,
+    and every embedding is kept in the inverted list of its nearest centroid.
+    A search only scores the embeddings in the `nprobe` lists closest to the query,
+    so it takes time sub-linear in the size of the memory. Probing more lists
+    gives better recall at the cost of latency.
+
+    New memories are added to the lists of their nearest centroids, and the index
+    is retrained once it has doubled in size since the last training. Removed
+    memories are tombstoned, and compacted away once they make up half of the index.
+
+    New memories are appended to a JSON lines file and their embeddings to a raw
+    float32 file. The rest of the index is saved in a .npz file when the index is
+    trained, compacted or cleared, or by `save_index`. In between, the rows of new
+    memories are appended to a .rows file and removed memories to a .dead file.
+    Every memory records where its embeddings are, so the index can be rebuilt
+    from the memories if the .npz file is lost or doesn't match them.
+    """
+
+    SAVE_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+    file_path: Path
+    vectors_path: Path
+    index_path: Path
+    rows_path: Path
+    dead_path: Path
+    memories: list[MemoryItem | None]
+
+    def __init__(self, cfg: Config, agent_mem_path=None) -> None:
+        """Initialize a class instance, loading the saved index if there is one
+
+        Args:
+            cfg: Config object
+            agent_mem_path: Path of the memory file. Defaults to agent_mem.json
+                in the workspace.
+
+        Returns:
+            None
+        """
+        if agent_mem_path is None:
+            agent_mem_path = Path(cfg.workspace_path) / "agent_mem.json"
+        self.file_path = Path(agent_mem_path).with_suffix(".ivf.jsonl")
+        self.vectors_path = Path(agent_mem_path).with_suffix(".ivf.f32")
+        self.index_path = Path(agent_mem_path).with_suffix(".ivf.npz")
+        self.rows_path = Path(agent_mem_path).with_suffix(".ivf.rows")
+        self.dead_path = Path(agent_mem_path).with_suffix(".ivf.dead")
+        self.nprobe = cfg.memory_ivf_nprobe
+        self.n_lists = cfg.memory_ivf_lists
+
+        self._reset()
+        if any(
+            p.exists() for p in (self.file_path, self.vectors_path, self.index_path)
+        ):
+            if not self._load():
+                # New memories must not be appended to damaged files,
+                # which are kept for whatever could not be recovered
+                self._back_up()
+                self.save_index()
+        logger.debug(
+            f"Initialized {__name__} with index path {self.index_path}, "
+            f"{len(self)} memories"
+        )
+
+    def _reset(self) -> None:
+        self.memories = []
+        # First and last+1 row of every memory
+        self.memory_rows: list[tuple[int, int]] = []
+        self.vectors: np.ndarray | None = None
+        self.row_memory = np.empty(0, np.int32)
+        self.row_list = np.empty(0, np.int32)
+        self.row_alive = np.empty(0, bool)
+        self.n_rows = 0
+        self.n_dead_rows = 0
+        self.centroids: np.ndarray | None = None
+        self.lists: list[np.ndarray] = []
+        self.trained_rows = 0
+
+    def __iter__(self) -> Iterator[MemoryItem]:
+        return (m for m in self.memories if m is not None)
+
+    def __contains__(self, x: MemoryItem) -> bool:
+        return any(m is x for m in self.memories)
+
+    def __len__(self) -> int:
+        return len(self.memories) - self.memories.count(None)
+
+    def add(self, item: MemoryItem):
+        if item in self:
+            return len(self)
+
+        embeddings = np.vstack(
+            [np.asarray(item.e_summary, np.float32)]
+            + [np.asarray(e, np.float32) for e in item.e_chunks]
+        )
+        start = self._append_rows(embeddings, len(self.memories))
+        self.memories.append(item)
+        self.memory_rows.append((start, self.n_rows))
+
+        if self.centroids is not None:
+            self._assign(np.arange(start, self.n_rows))
+        self._append_memory(item, start)
+        # The first rows set the dimensions of the index
+        if self._maintain() or start == 0:
+            self._save_state()
+        return len(self)
+
+    def discard(self, item: MemoryItem):
+        for i, m in enumerate(self.memories):
+            if m is item:
+                break
+        else:
+            return
+
+        # Leave a tombstone, the rows are dropped when the index is compacted
+        start, end = self.memory_rows[i]
+        self.memories[i] = None
+        self.row_alive[start:end] = False
+        self.n_dead_rows += end - start
+        with self.dead_path.open("ab") as f:
+            np.array([i], np.int32).tofile(f)
+        if self._maintain():
+            self._save_state()
+
+    def clear(self):
+        """Clears the data in memory."""
+        self._reset()
+        self.save_index()
+
+    def get_relevant(self, query: str, k: int) -> Sequence[MemoryItemRelevance]:
+        """
+        Returns the top-k most relevant memories for the given query,
+        probing the `nprobe` inverted lists closest to the query
+
+        Args:
+            query: the query to compare stored memories to
+            k: the number of relevant memories to fetch
+
+        Returns:
+            list[MemoryItemRelevance] containing the top [k] relevant memories
+        """
+        if len(self) < 1 or k < 1:
+            return []
+
+        logger.debug(
+            f"Searching for {k} relevant memories for query '{query}'; "
+            f"{len(self)} memories in index"
+        )
+        e_query: Embedding = get_embedding(query)
+        query_vector = np.asarray(e_query, np.float32)
+
+        if self.centroids is None:
+            candidates = np.arange(self.n_rows)
+        else:
+            centroid_scores = self._centroid_scores(query_vector[None, :])[0]
+            nprobe = min(self.nprobe, len(self.centroids))
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            candidates = np.concatenate([self.lists[i] for i in probe])
+        candidates = candidates[self.row_alive[candidates]]
+
+        # The score of a memory is the best score of its summary and chunks
+        scores = self.vectors[candidates] @ query_vector
+        best = np.full(len(self.memories), -np.inf, np.float32)
+        np.maximum.at(best, self.row_memory[candidates], scores)
+        found = np.flatnonzero(best > -np.inf)
+
+        k = min(k, len(found))
+        if k == 0:
+            return []
+        top = found[np.argpartition(-best[found], k - 1)[:k]]
+        top = top[np.argsort(-best[top], kind="stable")]
+        return [self._relevance(int(i), query, query_vector) for i in top]
+
+    def _relevance(
+        self, i: int, query: str, query_vector: np.ndarray
+    ) -> MemoryItemRelevance:
+        start, end = self.memory_rows[i]
+        scores = self.vectors[start:end] @ query_vector
+        return MemoryItemRelevance(
+            memory_item=self.memories[i],
+            for_query=query,
+            summary_relevance_score=float(scores[0]),
+            chunk_relevance_scores=scores[1:].tolist(),
+        )
+
+    def get_stats(self) -> tuple[int, int]:
+        """
+        Returns:
+            tuple (n_memories: int, n_chunks: int): the stats of the memory index
+        """
+        n_memories = len(self)
+        return n_memories, self.n_rows - self.n_dead_rows - n_memories
+
+    def _append_rows(self, embeddings: np.ndarray, memory: int) -> int:
+        start, end = self.n_rows, self.n_rows + len(embeddings)
+        if self.vectors is None:
+            self.vectors = np.empty((max(256, end), embeddings.shape[1]), np.float32)
+        elif embeddings.shape[1] != self.vectors.shape[1]:
+            raise ValueError(
+                f"Embedding has {embeddings.shape[1]} dimensions, "
+                f"the index holds {self.vectors.shape[1]}"
+            )
+        elif end > len(self.vectors):
+            capacity = max(end, 2 * len(self.vectors))
+            self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+        if end > len(self.row_memory):
+            capacity = len(self.vectors)
+            self.row_memory = np.resize(self.row_memory, capacity)
+            self.row_list = np.resize(self.row_list, capacity)
+            self.row_alive = np.resize(self.row_alive, capacity)
+
+        self.vectors[start:end] = embeddings
+        self.row_memory[start:end] = memory
+        self.row_list[start:end] = -1
+        self.row_alive[start:end] = True
+        self.n_rows = end
+        return start
+
+    def _maintain(self) -> bool:
+        """
+        Compacts away tombstones and (re)trains the index when it is due
+
+        Returns:
+            bool: Whether the index changed and its state has to be saved
+        """
+        changed = False
+        n_alive = self.n_rows - self.n_dead_rows
+        if self.n_dead_rows > n_alive:
+            self._compact()
+            n_alive = self.n_rows
+            changed = True
+
+        if n_alive < MIN_TRAIN_ROWS:
+            if self.centroids is not None:
+                # Too small to be worth probing, search all rows
+                self.centroids = None
+                self.lists = []
+                changed = True
+            return changed
+        if self.centroids is None or n_alive >= 2 * self.trained_rows:
+            self.train()
+            changed = True
+        return changed
+
+    def _compact(self) -> None:
+        logger.debug(f"Compacting memory index {self.index_path}")
+        memories = self.memories
+        vectors = self.vectors
+        memory_rows = self.memory_rows
+        self._reset()
+        for memory, (start, end) in zip(memories, memory_rows):
+            if memory is not None:
+                new_start = self._append_rows(vectors[start:end], len(self.memories))
+                self.memories.append(memory)
+                self.memory_rows.append((new_start, self.n_rows))
+        self._write_memories()
+
+    def train(self) -> None:
+        """Clusters the embeddings with k-means and rebuilds the inverted lists"""
+        rows = np.flatnonzero(self.row_alive[: self.n_rows])
+        n_lists = self.n_lists or int(math.sqrt(len(rows)))
+        n_lists = max(1, min(n_lists, len(rows)))
+        logger.debug(f"Training memory index on {len(rows)} rows, {n_lists} lists")
+
+        rng = np.random.default_rng(0)
+        n_samples = min(len(rows), n_lists * KMEANS_SAMPLES_PER_LIST)
+        samples = self.vectors[rng.choice(rows, n_samples, replace=False)]
+        centroids = samples[rng.choice(n_samples, n_lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            self.centroids = centroids
+            assignment = self._nearest_centroids(samples)
+            order = np.argsort(assignment, kind="stable")
+            counts = np.bincount(assignment, minlength=n_lists)
+            # Empty lists keep their centroid
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+            sums = np.add.reduceat(samples[order], starts, axis=0)
+            centroids = centroids.copy()
+            centroids[filled] = sums / counts[filled, None]
+
+        self.centroids = centroids
+        self.lists = [np.empty(0, np.int64) for _ in range(n_lists)]
+        self._assign(rows)
+        self.trained_rows = len(rows)
+
+    def _centroid_scores(self, vectors: np.ndarray) -> np.ndarray:
+        # Higher is closer: -|x-c|^2 / 2 without the constant |x|^2 term
+        return vectors @ self.centroids.T - 0.5 * np.sum(self.centroids**2, axis=1)
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        return np.concatenate(
+            [
+                np.argmax(self._centroid_scores(vectors[i : i + ASSIGN_BATCH_SIZE]), 1)
+                for i in range(0, len(vectors), ASSIGN_BATCH_SIZE)
+            ]
+        )
+
+    def _assign(self, rows: np.ndarray) -> None:
+        """Adds rows to the inverted lists of their nearest centroids"""
+        if len(rows) == 0:
+            return
+        lists = self._nearest_centroids(self.vectors[rows])
+        self.row_list[rows] = lists
+        self._add_to_lists(rows, lists)
+
+    def _add_to_lists(self, rows: np.ndarray, lists: np.ndarray) -> None:
+        if len(rows) == 0:
+            return
+        order = np.argsort(lists, kind="stable")
+        rows, lists = rows[order], lists[order]
+        bounds = np.flatnonzero(np.diff(lists)) + 1
+        for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]):
+            i = lists[start]
+            self.lists[i] = np.concatenate([self.lists[i], rows[start:end]])
+
+    def save_index(self):
+        """Rewrites all index files"""
+        logger.debug(f"Saving memory index to file {self.index_path}")
+        self._write_memories()
+        self._save_state()
+
+    def _write_memories(self) -> None:
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.file_path.open("wb") as f:
+            for m, (start, end) in zip(self.memories, self.memory_rows):
+                f.write(self._serialize(m, start, end))
+        with self.vectors_path.open("wb") as f:
+            if self.vectors is not None:
+                self.vectors[: self.n_rows].tofile(f)
+
+    def _save_state(self) -> None:
+        """
+        Saves everything but the memories and their embeddings to the .npz file,
+        which makes the .rows and .dead files redundant
+        """
+        n = self.n_rows
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        new_path = self.index_path.with_name(self.index_path.name + ".new")
+        with new_path.open("wb") as f:
+            np.savez(
+                f,
+                dimensions=self.vectors.shape[1] if self.vectors is not None else 0,
+                memory_rows=np.array(self.memory_rows, np.int64).reshape(-1, 2),
+                row_memory=self.row_memory[:n],
+                row_list=self.row_list[:n],
+                row_alive=self.row_alive[:n],
+                centroids=self.centroids if self.centroids is not None else np.empty(0),
+                trained_rows=self.trained_rows,
+            )
+        os.replace(new_path, self.index_path)
+        for path in (self.rows_path, self.dead_path):
+            path.unlink(missing_ok=True)
+
+    def _append_memory(self, item: MemoryItem, start: int) -> None:
+        """
+        Appends a new memory, its embeddings and their rows to the index files.
+        The memory is written last, a memory in the file has all of its rows.
+        """
+        end = self.n_rows
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.vectors_path.open("ab") as f:
+            self.vectors[start:end].tofile(f)
+        with self.rows_path.open("ab") as f:
+            np.stack(
+                [
+                    np.arange(start, end),
+                    self.row_memory[start:end],
+                    self.row_list[start:end],
+                ],
+                axis=1,
+            ).astype(np.int32).tofile(f)
+        with self.file_path.open("ab") as f:
+            f.write(self._serialize(item, start, end))
+
+    def _serialize(self, item: MemoryItem | None, start: int, end: int) -> bytes:
+        # Removed memories stay in the file until the index is compacted
+        if item is None:
+            return b"null\n"
+        dimensions = self.vectors.shape[1]
+        record = {f: getattr(item, f) for f in MEMORY_FIELDS}
+        # Where its embeddings are in the .f32 file, to rebuild the index from
+        record["embeddings"] = [start * dimensions, end - start, dimensions]
+        return orjson.dumps(record, option=self.SAVE_OPTIONS) + b"\n"
+
+    def _load(self) -> bool:
+        """
+        Loads the index, with the rows and removals saved since the .npz file.
+        Memories that were not completely written are dropped. If the .npz file
+        is missing or doesn't match the memories, the index is rebuilt from the
+        memories and their embeddings.
+
+        Returns:
+            bool: Whether the index files were intact
+        """
+        records, intact = self._read_memories()
+        vectors = (
+            np.fromfile(self.vectors_path, np.float32)
+            if self.vectors_path.exists()
+            else np.empty(0, np.float32)
+        )
+        try:
+            return self._load_state(records, vectors) and intact
+        except (
+            OSError,
+            EOFError,
+            KeyError,
+            TypeError,
+            ValueError,
+            zipfile.BadZipFile,
+        ) as e:
+            logger.warn(f"Rebuilding memory index {self.index_path}: {e}")
+        self._reset()
+        self._rebuild(records, vectors)
+        return False
+
+    def _read_memories(self) -> tuple[list[dict | None], bool]:
+        """
+        Reads the memory file, dropping the last memory if it was not completely
+        written. Removed and unreadable memories are None.
+
+        Returns:
+            tuple (records: list, intact: bool): the memories and whether the
+            whole file could be read
+        """
+        data = self.file_path.read_bytes() if self.file_path.exists() else b""
+        lines = data.splitlines()
+        intact = not data or data.endswith(b"\n")
+        if not intact:
+            lines.pop()
+
+        records = []
+        for line in lines:
+            try:
+                record = orjson.loads(line)
+                if record is not None and not isinstance(record, dict):
+                    raise ValueError("not a memory")
+            except ValueError as e:
+                logger.warn(f"Skipping unreadable memory in {self.file_path}: {e}")
+                record, intact = None, False
+            records.append(record)
+        return records, intact
+
+    def _load_state(self, records: list[dict | None], vectors: np.ndarray) -> bool:
+        """
+        Loads the index saved in the .npz, .rows and .dead files
+
+        Returns:
+            bool: Whether the index files were intact
+        """
+        with np.load(self.index_path) as index:
+            dimensions = int(index["dimensions"])
+            memory_rows = [tuple(r) for r in index["memory_rows"].tolist()]
+            row_memory = index["row_memory"].astype(np.int32)
+            row_list = index["row_list"].astype(np.int32)
+            row_alive = index["row_alive"].astype(bool)
+            if index["centroids"].size:
+                self.centroids = index["centroids"].astype(np.float32)
+                self.trained_rows = int(index["trained_rows"])
+        n_saved_rows = len(row_memory)
+        if len(records) < len(memory_rows):
+            raise ValueError("Memory file and index don't match")
+
+        # Rows added since the .npz was saved, up to the last complete memory
+        row_records = self._read_records(self.rows_path, ROW_RECORD_FIELDS)
+        row_records = row_records[row_records[:, 0] >= n_saved_rows]
+        contiguous = row_records[:, 0] == n_saved_rows + np.arange(len(row_records))
+        n_records = len(row_records) if contiguous.all() else int(np.argmin(contiguous))
+        n_complete = int(np.searchsorted(row_records[:n_records, 1], len(records)))
+        intact = n_complete == len(row_records)
+        row_records = row_records[:n_complete]
+        row_memory = np.concatenate([row_memory, row_records[:, 1]])
+        row_list = np.concatenate([row_list, row_records[:, 2]])
+        row_alive = np.concatenate([row_alive, np.ones(len(row_records), bool)])
+        self.n_rows = len(row_memory)
+        for i in range(len(memory_rows), len(records)):
+            start, end = np.searchsorted(row_memory, [i, i + 1])
+            if start == end:
+                raise ValueError(f"Memory {i} has no embeddings")
+            memory_rows.append((int(start), int(end)))
+
+        if self.n_rows:
+            if not dimensions or vectors.size < self.n_rows * dimensions:
+                raise ValueError("Memory embeddings and index don't match")
+            self.vectors = vectors[: self.n_rows * dimensions].reshape(-1, dimensions)
+        intact = intact and vectors.size == self.n_rows * dimensions
+        self.row_memory, self.row_list, self.row_alive = row_memory, row_list, row_alive
+        self.memory_rows = memory_rows
+
+        for i in self._read_records(self.dead_path, 1)[:, 0]:
+            if i < len(memory_rows):
+                start, end = memory_rows[i]
+                self.row_alive[start:end] = False
+        self.n_dead_rows = int(self.n_rows - self.row_alive.sum())
+
+        for i, (record, (start, end)) in enumerate(zip(records, memory_rows)):
+            if not self.row_alive[start]:
+                self.memories.append(None)
+                continue
+            if record is None:
+                raise ValueError(f"Memory {i} is unreadable")
+            record = dict(record)
+            layout = record.pop("embeddings", None)
+            if layout is not None and layout != [
+                start * dimensions,
+                end - start,
+                dimensions,
+            ]:
+                raise ValueError("Memory file and index don't match")
+            self.memories.append(
+                MemoryItem(
+                    **record,
+                    e_summary=self.vectors[start],
+                    e_chunks=list(self.vectors[start + 1 : end]),
+                )
+            )
+
+        if self.centroids is not None:
+            self.lists = [np.empty(0, np.int64) for _ in range(len(self.centroids))]
+            rows = np.flatnonzero(self.row_list[: self.n_rows] >= 0)
+            self._add_to_lists(rows, self.row_list[rows])
+        return intact
+
+    def _rebuild(self, records: list[dict | None], vectors: np.ndarray) -> None:
+        """
+        Rebuilds the index from the memories and the embeddings they point to,
+        leaving out removed memories and the ones whose embeddings are missing
+        """
+        removed = set(self._read_records(self.dead_path, 1)[:, 0].tolist())
+        for i, record in enumerate(records):
+            if record is None or i in removed:
+                continue
+            try:
+                offset, n_rows, dimensions = record.pop("embeddings")
+                rows = vectors[offset : offset + n_rows * dimensions]
+                if n_rows < 1 or len(rows) < n_rows * dimensions:
+                    raise ValueError(f"embeddings missing from {self.vectors_path}")
+                rows = rows.reshape(n_rows, dimensions)
+                memory = MemoryItem(
+                    **record, e_summary=rows[0], e_chunks=list(rows[1:])
+                )
+                start = self._append_rows(rows, len(self.memories))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warn(f"Skipping memory {i} in {self.file_path}: {e}")
+                continue
+            self.memories.append(memory)
+            self.memory_rows.append((start, self.n_rows))
+        self._maintain()
+
+    def _back_up(self) -> None:
+        """Keeps a copy of the index files before they are rewritten"""
+        for path in (
+            self.file_path,
+            self.vectors_path,
+            self.index_path,
+            self.rows_path,
+            self.dead_path,
+        ):
+            if path.exists():
+                backup = path.with_name(path.name + ".bak")
+                logger.warn(f"Backing up {path} to {backup}")
+                shutil.copyfile(path, backup)
+
+    @staticmethod
+    def _read_records(path: Path, n_fields: int) -> np.ndarray:
+        """Reads the complete int32 records of an append-only file"""
+        if not path.exists():
+            return np.empty((0, n_fields), np.int32)
+        records = np.fromfile(path, np.int32)
+        n_records = len(records) // n_fields
+        return records[: n_records * n_fields].reshape(n_records, n_fields)
@@ -3,25 +3,38 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Iterator
 
+import numpy as np
 import orjson
 
 from autogpt.config import Config
 from autogpt.logs import logger
 
+from ..embedding_matrix import EmbeddingMatrix
+from ..embedding_store import DTYPE_SUFFIXES, EmbeddingStore, QuantizedEmbeddingStore
 from ..memory_item import MemoryItem
 from .base import VectorMemoryProvider
 
 
 class JSONFileMemory(VectorMemoryProvider):
-    """Memory backend that stores memories in a JSON file"""
+    """Memory backend that stores memories in a JSON file
+
+    Every memory is appended to the file as a line of JSON, without its embeddings.
+    Those are appended to an EmbeddingStore next to it, a binary file of fixed-width
+    rows that is memory-mapped when the memory is loaded, so the embeddings are
+    neither parsed nor copied. Adding a memory only writes that memory.
+    With int8 quantization, searches scan int8 codes of the embeddings and only
+    read the full precision rows of the best candidates.
+    """
 
     SAVE_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SERIALIZE_DATACLASS
+    MEMORY_FIELDS = ("raw_content", "summary", "chunks", "chunk_summaries", "metadata")
 
     file_path: Path
+    embeddings_path: Path
     memories: list[MemoryItem]
 
     def __init__(self, cfg: Config, agent_mem_path=None) -> None:
-        """Initialize a class instance
+        """Initialize a class instance, loading the memories saved in the file
 
         Args:
             cfg: Config object
@@ -42,8 +55,51 @@ class JSONFileMemory(VectorMemoryProvider):
         print("Initialized json file memory with index path", self.file_path)
         logger.debug(f"Initialized {__name__} with index path {self.file_path}")
 
-        self.memories = []
-        self.save_index()
+        self.store = self._get_embedding_store(cfg.memory_embedding_dtype)
+        self.embeddings_path = self.store.path
+        self.quantized = self._get_quantized_store(cfg.memory_embedding_quantization)
+        self.embedding_matrix = EmbeddingMatrix(
+            store=self.store,
+            quantized=self.quantized,
+            rerank_factor=cfg.memory_rerank_factor,
+        )
+        # The matrix keeps the memories in the order they were added
+        self.memories = self.embedding_matrix.items
+        self.load_index()
+
+    def _get_embedding_store(self, dtype: str) -> EmbeddingStore:
+        """Opens the embeddings file of the memory file, in the dtype it was saved in"""
+        for saved_dtype, suffix in DTYPE_SUFFIXES.items():
+            path = self.file_path.with_suffix(".embeddings" + suffix)
+            if path.exists() and path.stat().st_size > 0:
+                if saved_dtype != dtype:
+                    logger.warn(
+                        f"Embeddings in {path} are kept as {saved_dtype}, "
+                        f"clear the memory to store them as {dtype}"
+                    )
+                return EmbeddingStore(path, saved_dtype)
+        if dtype not in DTYPE_SUFFIXES:
+            raise ValueError(
+                f"Unsupported memory embedding dtype '{dtype}', "
+                f"use one of {', '.join(DTYPE_SUFFIXES)}"
+            )
+        path = self.file_path.with_suffix(".embeddings" + DTYPE_SUFFIXES[dtype])
+        return EmbeddingStore(path, dtype)
+
+    def _get_quantized_store(self, quantization: str) -> QuantizedEmbeddingStore | None:
+        """Opens the quantized embeddings searches scan first, if enabled"""
+        path = self.file_path.with_suffix(".embeddings.i8")
+        if quantization == "int8":
+            return QuantizedEmbeddingStore(path)
+        if quantization not in ("", "none"):
+            raise ValueError(
+                f"Unsupported memory embedding quantization '{quantization}', "
+                "use int8 or none"
+            )
+        if path.exists():
+            # Codes would be out of date by the time quantization is enabled again
+            QuantizedEmbeddingStore(path).clear()
+        return None
 
     def __iter__(self) -> Iterator[MemoryItem]:
         return iter(self.memories)
@@ -55,22 +111,121 @@ class JSONFileMemory(VectorMemoryProvider):
         return len(self.memories)
 
     def add(self, item: MemoryItem):
-        self.memories.append(item)
-        self.save_index()
+        # The embeddings are appended to the store, then the memory to the file
+        self.embedding_matrix.add(item)
+        with self.file_path.open("ab") as f:
+            f.write(self._record(len(self.memories) - 1))
         return len(self.memories)
 
     def discard(self, item: MemoryItem):
         try:
-            self.remove(item)
-        except:
-            pass
+            self.embedding_matrix.remove(item)
+        except ValueError:
+            return
+        self.save_index()
 
     def clear(self):
         """Clears the data in memory."""
-        self.memories.clear()
+        self.embedding_matrix.clear()
         self.save_index()
 
+    def _record(self, i: int) -> bytes:
+        start, end = self.embedding_matrix.row_range(i)
+        dimensions = self.store.dimensions
+        record = {f: getattr(self.memories[i], f) for f in self.MEMORY_FIELDS}
+        record["embeddings"] = [start * dimensions, end - start, dimensions]
+        return orjson.dumps(record, option=self.SAVE_OPTIONS) + b"\n"
+
     def save_index(self):
+        """Rewrites the memory file, the embeddings are kept up to date by the store"""
         logger.debug(f"Saving memory index to file {self.file_path}")
         with self.file_path.open("wb") as f:
-            return f.write(orjson.dumps(self.memories, option=self.SAVE_OPTIONS))
+            for i in range(len(self.memories)):
+                f.write(self._record(i))
+
+    def load_index(self):
+        """Loads the memories saved in the memory file, mapping their embeddings"""
+        content = self.file_path.read_bytes()
+        if content.lstrip().startswith(b"["):
+            return self._load_legacy_index(content)
+
+        lines = content.splitlines()
+        memories: list[MemoryItem] = []
+        layout: list[tuple[int, int, int]] = []
+        for line in lines:
+            try:
+                record = orjson.loads(line)
+                offset, n_rows, dimensions = record.pop("embeddings")
+                memories.append(MemoryItem(**record, e_summary=None, e_chunks=None))
+            except (
+                orjson.JSONDecodeError,
+                AttributeError,
+                KeyError,
+                TypeError,
+                ValueError,
+            ) as e:
+                logger.warn(f"Skipping unreadable memory in {self.file_path}: {e}")
+                continue
+            layout.append((offset, n_rows, dimensions))
+
+        if layout:
+            self.store.dimensions = layout[0][2]
+            if self.quantized is not None:
+                self.quantized.codes.dimensions = layout[0][2]
+        # An intact store holds the embeddings of all memories back to back
+        offsets = np.cumsum([0] + [n_rows * dims for _, n_rows, dims in layout])
+        store_size = (
+            self.store.path.stat().st_size // self.store.dtype.itemsize
+            if self.store.path.exists()
+            else 0
+        )
+        if (
+            len(memories) == len(lines)
+            and all(
+                offset == expected and dims == self.store.dimensions
+                for (offset, _, dims), expected in zip(layout, offsets)
+            )
+            and offsets[-1] <= store_size
+        ):
+            # Drop the capacity the store grew ahead of the memories
+            self.store.truncate(offsets[-1] // (self.store.dimensions or 1))
+            self.embedding_matrix.adopt(memories, [n_rows for _, n_rows, _ in layout])
+        else:
+            self._repair(memories, layout)
+        logger.debug(f"Loaded {len(self.memories)} memories from {self.file_path}")
+
+    def _repair(
+        self, memories: list[MemoryItem], layout: list[tuple[int, int, int]]
+    ) -> None:
+        """Keeps the memories whose embeddings were written completely"""
+        logger.warn(f"Repairing memory file {self.file_path}")
+        embeddings = (
+            np.fromfile(self.store.path, self.store.dtype)
+            if self.store.path.exists()
+            else np.empty(0, self.store.dtype)
+        )
+        self.embedding_matrix.clear()
+        for memory, (offset, n_rows, dimensions) in zip(memories, layout):
+            rows = embeddings[offset : offset + n_rows * dimensions]
+            if n_rows < 1 or len(rows) < n_rows * dimensions:
+                logger.warn(f"Embeddings of memory missing from {self.store.path}")
+                continue
+            rows = rows.reshape(n_rows, dimensions)
+            memory.e_summary, memory.e_chunks = rows[0], list(rows[1:])
+            try:
+                self.embedding_matrix.add(memory)
+            except ValueError as e:
+                logger.warn(f"Skipping memory in {self.file_path}: {e}")
+        self.save_index()
+
+    def _load_legacy_index(self, content: bytes) -> None:
+        """Loads a memory file that holds all memories in one JSON list"""
+        try:
+            memories = [MemoryItem(**m) for m in orjson.loads(content)]
+        except (orjson.JSONDecodeError, TypeError) as e:
+            logger.warn(f"Discarding unreadable memory file {self.file_path}: {e}")
+            memories = []
+        self.embedding_matrix.clear()
+        for memory in memories:
+            self.embedding_matrix.add(memory)
+        self.save_index()
@@ -1,11 +1,19 @@
-from typing import Any, overload
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Iterator, overload
 
 import numpy as np
 
 from autogpt.config import Config
 from autogpt.llm.base import TText
 from autogpt.llm.providers import openai as iopenai
+from autogpt.llm.response_cache import ResponseCache
+from autogpt.llm.utils import count_string_tokens
 from autogpt.logs import logger
+from autogpt.singleton import Singleton
 
 Embedding = list[np.float32] | np.ndarray[Any, np.dtype[np.float32]]
 """Embedding vector"""
@@ -23,17 +31,45 @@ def get_embedding(input: list[str] | list[TText]) -> list[Embedding]:
 
 def get_embedding(
     input: str | TText | list[str] | list[TText],
+    use_cache: bool = True,
 ) -> Embedding | list[Embedding]:
     """Get an embedding from the ada model.
 
+    Embeddings are served from the ResponseCache if the same input was embedded
+    before. Of multiple inputs, only the ones that aren't cached are sent to the API,
+    through the EmbeddingBatcher so they share API calls with other agents' requests.
+    This blocks while the batch is collected, so call it from the command threads
+    (see `autogpt.app.run_blocking`) rather than from the event loop.
+
     Args:
         input: Input text to get embeddings for, encoded as a string or array of tokens.
             Multiple inputs may be given as a list of strings or token arrays.
+        use_cache: Whether to use the response cache. Defaults to True.
 
     Returns:
         List[float]: The embedding.
     """
     cfg = Config()
+    multiple, inputs = _embedding_inputs(input)
+    cache_keys = _embedding_cache_keys(inputs, use_cache)
+    results = _get_cached_embeddings(inputs, cache_keys)
+
+    missing = [i for i, embedding in enumerate(results) if embedding is None]
+    if missing:
+        missing_inputs = [inputs[i] for i in missing]
+        if cfg.embedding_batch_window > 0:
+            embeddings = EmbeddingBatcher().embed(missing_inputs)
+        else:
+            embeddings = create_embeddings(missing_inputs)
+        _store_embeddings(results, missing, embeddings, cache_keys)
+
+    return results if multiple else results[0]
+
+
+def _embedding_inputs(
+    input: str | TText | list[str] | list[TText],
+) -> tuple[bool, list[str] | list[TText]]:
+    """Returns whether multiple inputs were given, and the list of inputs"""
     multiple = isinstance(input, list) and all(not isinstance(i, int) for i in input)
 
     if isinstance(input, str):
@@ -41,6 +77,49 @@ def get_embedding(
     elif multiple and isinstance(input[0], str):
         input = [text.replace("\n", " ") for text in input]
 
+    return multiple, input if multiple else [input]
+
+
+def _embedding_cache_keys(inputs: list, use_cache: bool) -> list[str] | None:
+    cfg = Config()
+    if not use_cache or not cfg.llm_response_cache:
+        return None
+    model = cfg.embedding_model
+    return [ResponseCache.make_key("embedding", model=model, input=i) for i in inputs]
+
+
+def _get_cached_embeddings(
+    inputs: list, cache_keys: list[str] | None
+) -> list[Embedding | None]:
+    if cache_keys is None:
+        return [None] * len(inputs)
+    cache = ResponseCache()
+    return [cache.get(key) for key in cache_keys]
+
+
+def _store_embeddings(
+    results: list[Embedding | None],
+    missing: list[int],
+    embeddings: list[Embedding],
+    cache_keys: list[str] | None,
+) -> None:
+    """Puts the embeddings of the missing inputs in results and the cache"""
+    for i, embedding in zip(missing, embeddings):
+        results[i] = embedding
+        if cache_keys is not None:
+            ResponseCache().put(cache_keys[i], embedding)
+
+
+def create_embeddings(inputs: list[str] | list[TText]) -> list[Embedding]:
+    """Gets the embeddings of the inputs with a single API call.
+
+    Args:
+        inputs: Texts or token arrays to get embeddings for.
+
+    Returns:
+        list[Embedding]: The embedding of each input, in order.
+    """
+    cfg = Config()
     model = cfg.embedding_model
     if cfg.use_azure:
         kwargs = {"engine": cfg.get_azure_deployment_id_for_model(model)}
@@ -48,19 +127,136 @@ def get_embedding(
         kwargs = {"model": model}
 
     logger.debug(
-        f"Getting embedding{f's for {len(input)} inputs' if multiple else ''}"
-        f" with model '{model}'"
+        f"Getting embeddings for {len(inputs)} inputs with model '{model}'"
         + (f" via Azure deployment '{kwargs['engine']}'" if cfg.use_azure else "")
     )
 
     embeddings = iopenai.create_embedding(
-        input,
+        inputs,
         **kwargs,
         api_key=cfg.openai_api_key,
     ).data
 
-    if not multiple:
-        return embeddings[0]["embedding"]
-
     embeddings = sorted(embeddings, key=lambda x: x["index"])
     return [d["embedding"] for d in embeddings]
+
+
+# Max number of inputs in one embedding API call
+MAX_BATCH_INPUTS = 2048
+# Max tokens of the inputs in one embedding API call
+MAX_BATCH_TOKENS = 100_000
+
+
+def _count_tokens(input: str | TText, model: str) -> int:
+    return count_string_tokens(input, model) if isinstance(input, str) else len(input)
+
+
+@dataclass
+class _EmbeddingRequest:
+    inputs: list
+    future: Future
+    results: list
+    remaining: int
+
+
+class EmbeddingBatcher(metaclass=Singleton):
+    """Packs the embedding requests of all agents into as few API calls as possible.
+
+    Requests are collected for `window` seconds after the first one comes in,
+    then their inputs are sent in batches of up to MAX_BATCH_INPUTS inputs and
+    MAX_BATCH_TOKENS tokens. The embeddings are handed back to each caller's
+    future. Inputs of one request may be split over several batches.
+    """
+
+    def __init__(self, window: float | None = None):
+        """
+        Args:
+            window: Seconds to wait for more requests before sending a batch.
+                Defaults to the EMBEDDING_BATCH_WINDOW config.
+        """
+        self.window = Config().embedding_batch_window if window is None else window
+        self._pending: deque[_EmbeddingRequest] = deque()
+        self._condition = threading.Condition()
+        self._worker: threading.Thread | None = None
+
+    def submit(self, inputs: list[str] | list[TText]) -> Future:
+        """Queues inputs to be embedded.
+
+        Returns:
+            Future: Resolves with the embedding of each input, in order.
+        """
+        request = _EmbeddingRequest(
+            list(inputs), Future(), [None] * len(inputs), len(inputs)
+        )
+        if not inputs:
+            request.future.set_result([])
+            return request.future
+
+        with self._condition:
+            self._pending.append(request)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+            self._condition.notify()
+        return request.future
+
+    def embed(self, inputs: list[str] | list[TText]) -> list[Embedding]:
+        """Embeds the inputs together with the inputs of other callers."""
+        return self.submit(inputs).result()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            # Give the other agents a moment to add their requests to the batch
+            time.sleep(self.window)
+            with self._condition:
+                requests = list(self._pending)
+                self._pending.clear()
+
+            try:
+                for batch in self._pack(requests):
+                    self._send(batch)
+            except Exception as e:
+                # Don't leave the callers of the requests that weren't sent waiting
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    @staticmethod
+    def _pack(requests: list[_EmbeddingRequest]) -> Iterator[list[tuple]]:
+        """Yields batches of (request, input index, input)"""
+        model = Config().embedding_model
+        batch, batch_tokens = [], 0
+        for request in requests:
+            for i, input in enumerate(request.inputs):
+                tokens = _count_tokens(input, model)
+                if batch and (
+                    len(batch) >= MAX_BATCH_INPUTS
+                    or batch_tokens + tokens > MAX_BATCH_TOKENS
+                ):
+                    yield batch
+                    batch, batch_tokens = [], 0
+                batch.append((request, i, input))
+                batch_tokens += tokens
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _send(batch: list[tuple]) -> None:
+        try:
+            embeddings = create_embeddings([input for _, _, input in batch])
+        except Exception as e:
+            for request, _, _ in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        for (request, i, _), embedding in zip(batch, embeddings):
+            request.results[i] = embedding
+            request.remaining -= 1
+            if request.remaining == 0 and not request.future.done():
+                request.future.set_result(request.results)
@@ -1,12 +1,11 @@
 import glob
 import os
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
-import aiofiles
-import yaml
-
-from autogpt.config.config import Singleton
+from autogpt.config.config import Config, Singleton
+from autogpt.organization.message_log import MessageLog
 
 INBOX_TEMPLATE = """
     YOUR INBOX (priority messages first):
@@ -19,15 +18,25 @@ INBOX_TEMPLATE = """
 """
 
 
-def update_yaml_after_async(func):
-    async def wrapper(self, *args, **kwargs):
-        res = await func(self, *args, **kwargs)
-        # Make sure to call a_save of MessageCenter to update the YAML file.
-        await self.a_save()
-        return res
-    return wrapper
-
 class Message:
+    # Messages are kept in memory for the lifetime of the organization, so they use
+    # slots instead of a per-instance __dict__, pack their boolean flags in an int
+    # and store the timestamp as epoch seconds.
+    __slots__ = (
+        "message",
+        "message_id",
+        "sender_id",
+        "receiver_id",
+        "response_to_id",
+        "response_id",
+        "_timestamp",
+        "_flags",
+    )
+
+    _FROM_SUPERVISOR = 1
+    _RESPONDED = 2
+    _READ = 4
+
     def __init__(
             self,
             message: str,
@@ -46,15 +55,88 @@ class Message:
         self.message_id = message_id
         self.sender_id = sender_id
         self.receiver_id = receiver_id
-        self.from_supervisor = from_supervisor
 
         self.response_to_id = response_to_id # If this is a response to a message, store the id of the message here.
         self.response_id = response_id # store the response of this message here.
  
-        self.read = read
-        self.responded = responded
         self.timestamp = timestamp # Include the timestamp the message was sent at.
 
+        self._flags = (
+            (self._FROM_SUPERVISOR if from_supervisor else 0)
+            | (self._RESPONDED if responded else 0)
+            | (self._READ if read else 0)
+        )
+
+    def _set_flag(self, flag: int, value: bool) -> None:
+        if value:
+            self._flags |= flag
+        else:
+            self._flags &= ~flag
+
+    @property
+    def timestamp(self) -> Optional[datetime]:
+        if self._timestamp is None:
+            return None
+        return datetime.fromtimestamp(self._timestamp)
+
+    @timestamp.setter
+    def timestamp(self, value: Optional[datetime]) -> None:
+        self._timestamp = None if value is None else value.timestamp()
+
+    @property
+    def from_supervisor(self) -> bool:
+        return bool(self._flags & self._FROM_SUPERVISOR)
+
+    @from_supervisor.setter
+    def from_supervisor(self, value: bool) -> None:
+        self._set_flag(self._FROM_SUPERVISOR, value)
+
+    @property
+    def responded(self) -> bool:
+        return bool(self._flags & self._RESPONDED)
+
+    @responded.setter
+    def responded(self, value: bool) -> None:
+        self._set_flag(self._RESPONDED, value)
+
+    @property
+    def read(self) -> bool:
+        return bool(self._flags & self._READ)
+
+    @read.setter
+    def read(self, value: bool) -> None:
+        self._set_flag(self._READ, value)
+
+    # Fields that are persisted by the message log
+    FIELDS = (
+        "message",
+        "message_id",
+        "sender_id",
+        "receiver_id",
+        "from_supervisor",
+        "response_to_id",
+        "response_id",
+        "timestamp",
+        "responded",
+        "read",
+    )
+
+    def to_dict(self) -> dict:
+        """
+            Returns the persisted fields of the message
+        """
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Message":
+        """
+            Creates a message from the output of `to_dict`
+        """
+        data = {field: data[field] for field in cls.FIELDS if field in data}
+        if isinstance(data.get("timestamp"), str):
+            data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+        return cls(**data)
+
     def set_read(self) -> None:
         """
             Set the read flag to true
@@ -79,13 +161,6 @@ class Message:
         """
         self.response_id = response_id
 
-    def set_response(self, response: str) -> None:
-        """ 
-            Set the response for a given message
-        """
-        self.response = response
-        self.set_responded()
-
     def construct_message_prompt(self) -> str:
         """ 
             Construct the actual message string here. Might do some more interesting stuff later like:
@@ -108,47 +183,84 @@ class MessageCenter(metaclass=Singleton):
         self.message_yaml_path = organization.org_dir_path + "/" + f"{organization.name}_messages.yaml"
         print("message_yaml_path: ", self.message_yaml_path)
 
-    @update_yaml_after_async
+        # Secondary indexes of message ids, kept up to date by store_message and mark_responded
+        self.by_receiver: Dict[int, List[int]] = defaultdict(list)
+        self.by_sender: Dict[int, List[int]] = defaultdict(list)
+        self.by_pair: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        # receiver_id -> (unresponded ids from supervisors, unresponded ids from staff).
+        # Dicts are used as insertion ordered sets.
+        self.unresponded: Dict[int, Tuple[Dict[int, None], Dict[int, None]]] = defaultdict(lambda: ({}, {}))
+
+        # New messages and changes are appended to a journal, the YAML file is a periodic snapshot
+        self.message_log = MessageLog(
+            self.message_yaml_path,
+            self.to_dict,
+            compact_every=Config().org_message_log_compact_every,
+        )
+
     async def add_message(self, message: Message):
         # Logic to add a new message
-        self.messages[message.message_id] = message
+        await self.store_message(message)
 
-    async def a_save(self):
-        data = {
+    def to_dict(self) -> dict:
+        """
+            Returns a snapshot of all messages
+        """
+        return {
             'max_id': self.max_id,
-            'messages': {message_id: vars(message) for message_id, message in self.messages.items()}
+            'messages': {message_id: message.to_dict() for message_id, message in self.messages.items()}
         }
-        
-        if not os.path.exists(self.message_yaml_path):
-            os.makedirs(os.path.dirname(self.message_yaml_path), exist_ok=True)
-            
-        async with aiofiles.open(self.message_yaml_path, mode='w') as outfile:
-            await outfile.write(yaml.dump(data))
+
+    async def a_save(self):
+        """
+            Compacts the message log into the YAML snapshot
+        """
+        await self.message_log.compact()
 
     def save(self):
-        data = {
-            'max_id': self.max_id,
-            'messages': {message_id: vars(message) for message_id, message in self.messages.items()}
-        }
-        
-        if not os.path.exists(self.message_yaml_path):
-            os.makedirs(os.path.dirname(self.message_yaml_path), exist_ok=True)
-        
-        with open(self.message_yaml_path, mode='w') as outfile:
-            yaml.dump(data, outfile)
+        """
+            Compacts the message log into the YAML snapshot
+        """
+        self.message_log.compact_sync()
 
     def load_messages(self):
-        if not os.path.exists(self.message_yaml_path):
-            return
+        self.max_id, messages = self.message_log.load()
+        self.messages = {}
+        self.by_receiver.clear()
+        self.by_sender.clear()
+        self.by_pair.clear()
+        self.unresponded.clear()
+        for message_id in sorted(messages):
+            self.index_message(Message.from_dict(messages[message_id]))
 
-        with open(self.message_yaml_path, mode='r') as infile:
-            data = yaml.safe_load(infile.read())
-            self.max_id = data.get('max_id', 0)
-            self.messages = {message_id: Message(**message_data) for message_id, message_data in data.get('messages', {}).items()}
+
+    def index_message(self, message: Message) -> None:
+        """
+            Adds a message to self.messages and to the secondary indexes
+        """
+        self.messages[message.message_id] = message
+        self.by_receiver[message.receiver_id].append(message.message_id)
+        self.by_sender[message.sender_id].append(message.message_id)
+        self.by_pair[(message.sender_id, message.receiver_id)].append(message.message_id)
+        if not message.responded:
+            self.unresponded[message.receiver_id][0 if message.from_supervisor else 1][message.message_id] = None
+
+
+    def mark_responded(self, message: Message, response_id: Optional[int] = None) -> None:
+        """
+            Sets the responded flag of a message and removes it from the unresponded index
+        """
+        message.responded = True
+        if response_id is not None:
+            message.response_id = response_id
+        supervisor_ids, staff_ids = self.unresponded[message.receiver_id]
+        supervisor_ids.pop(message.message_id, None)
+        staff_ids.pop(message.message_id, None)
 
 
     async def store_message(self, message: Message) -> None:
-        self.messages[message.message_id] = message
+        self.index_message(message)
+        self.message_log.add(message.to_dict())
 
 
     def fetch_message_by_id(self, message_id: int) -> Optional[Message]:
@@ -167,14 +279,14 @@ class MessageCenter(metaclass=Singleton):
         """ 
             Get all messages for a given receiver_id
         """
-        return [message for message in self.messages.values() if message.receiver_id == receiver_id]
+        return [self.messages[message_id] for message_id in self.by_receiver.get(receiver_id, ())]
 
 
     def fetch_messages_by_sender(self, sender_id: int) -> List[Message]:
         """ 
             Get all messages for a given sender_id
         """
-        return [message for message in self.messages.values() if message.sender_id == sender_id]
+        return [self.messages[message_id] for message_id in self.by_sender.get(sender_id, ())]
 
 
     @staticmethod
@@ -206,8 +318,22 @@ class MessageCenter(metaclass=Singleton):
         """ 
             Get all unresponded messages for a given receiver_id
         """
-        receiver_messages = self.fetch_messages_by_receiver(receiver_id)
-        return self.filter_unresponded_messages(receiver_messages)
+        supervisor_messages, staff_messages = self.get_unresponded_messages_by_priority(receiver_id)
+        return supervisor_messages + staff_messages
+
+
+    def get_unresponded_messages_by_priority(self, receiver_id: int) -> Tuple[List[Message], List[Message]]:
+        """
+            Get the unresponded messages for a given receiver_id, split into messages
+            from supervisors and messages from staff
+        """
+        if receiver_id not in self.unresponded:
+            return [], []
+        supervisor_ids, staff_ids = self.unresponded[receiver_id]
+        return (
+            [self.messages[message_id] for message_id in supervisor_ids],
+            [self.messages[message_id] for message_id in staff_ids],
+        )
 
 
     def get_message_prompt(self, message: Message) -> str:
@@ -221,18 +347,15 @@ class MessageCenter(metaclass=Singleton):
         """ 
         Return a list of last_n messages between the sender and receiver. 
         """
-        sender_messages = self.fetch_messages_by_sender(sender_id)
-        receiver_messages = self.fetch_messages_by_receiver(receiver_id)
+        if last_n <= 0:
+            return []
 
-        # Filter messages that are between the sender and receiver.
-        conversation = [msg for msg in sender_messages if msg.receiver_id == receiver_id]
-        conversation += [msg for msg in receiver_messages if msg.sender_id == sender_id]
+        # Take the last n ids of both directions, the newest n of those are the conversation
+        sent = self.by_pair.get((sender_id, receiver_id), [])[-last_n:]
+        received = self.by_pair.get((receiver_id, sender_id), [])[-last_n:]
+        conversation_ids = sorted(set(sent) | set(received), reverse=True)[:last_n]
 
-        # Sort the messages by message_id to maintain the order of conversation
-        conversation.sort(key=lambda msg: msg.message_id, reverse=True)
-
-        # Return only the last 'n' messages
-        return conversation[:last_n]
+        return [self.messages[message_id] for message_id in conversation_ids]
     
 
     async def generate_conversation_prompt(self, sender_id: int, receiver_id: int) -> str:
@@ -277,7 +400,6 @@ class MessageCenter(metaclass=Singleton):
             datetime
         )
 
-    @update_yaml_after_async
     async def add_new_message(
             self,
             message: str,
@@ -314,16 +436,15 @@ class MessageCenter(metaclass=Singleton):
             Checks pending messages and returnes the prioritized message to the prompt. 
             Unresponded messages from supervisor are prioritized and showed first. 
         """
-        agent_messages = self.get_unresponded_messages_by_receiver(agent_id)
-
-        # Filter messages from supervisor
-        messages_from_supervisor = self.filter_from_supervisor(agent_messages)
+        # Unresponded messages from supervisor
+        messages_from_supervisor, _ = self.get_unresponded_messages_by_priority(agent_id)
 
 
         if len(messages_from_supervisor) > 0:
             prompt = "You have a pending message from your supervisor: \n"
             message = messages_from_supervisor[0]
             message.read = True
+            self.message_log.update(message.message_id, read=True)
             return self.get_message_prompt(message)
         
 
@@ -331,10 +452,10 @@ class MessageCenter(metaclass=Singleton):
         """
             Return a list of message_ids for all messages in the inbox (unresponded messages)
         """
-        agent_messages = self.get_unresponded_messages_by_receiver(agent_id)
-        inbox_message_ids = [msg.message_id for msg in agent_messages]
-
-        return inbox_message_ids
+        if agent_id not in self.unresponded:
+            return []
+        supervisor_ids, staff_ids = self.unresponded[agent_id]
+        return [*supervisor_ids, *staff_ids]
     
 
     async def get_inbox_messages(self, agent_id: int) -> Tuple[List[Message], List[Message]]:
@@ -350,23 +471,22 @@ class MessageCenter(metaclass=Singleton):
             Returns:
                 2 Lists of messages, empty list if no messages
         """
-        # Get all unresponded messages
-        unresponded_messages = self.get_unresponded_messages_by_receiver(agent_id)
-
+        # Get all unresponded messages, already split by supervisor priority
+        unresponded_supervisor, unresponded_agent = self.get_unresponded_messages_by_priority(agent_id)
 
         supervisor_messages, supervisor_responses, agent_messages, agent_responses = [], [], [], []
 
-        for msg in unresponded_messages:
-            if msg.from_supervisor:
-                if msg.response_to_id is not None:
-                    supervisor_responses.append(msg)
-                else:
-                    supervisor_messages.append(msg)
+        for msg in unresponded_supervisor:
+            if msg.response_to_id is not None:
+                supervisor_responses.append(msg)
+            else:
+                supervisor_messages.append(msg)
+
+        for msg in unresponded_agent:
+            if msg.response_to_id is not None:
+                agent_responses.append(msg)
             else:
-                if msg.response_to_id is not None:
-                    agent_responses.append(msg)
-                else:
-                    agent_messages.append(msg)
+                agent_messages.append(msg)
 
 
         # Sort the messages and responses by timestamp (older first)
@@ -448,7 +568,6 @@ class MessageCenter(metaclass=Singleton):
             return message.receiver_id == receiver_id
         return False
 
-    @update_yaml_after_async
     async def respond_to_message(self, message_id: int, response: str, sender_id: int) -> str:
         """
             Respond to a message. 
@@ -490,8 +609,8 @@ class MessageCenter(metaclass=Singleton):
         )
 
         # Set the response_id of the original message to the new message id
-        initial_message.response_id = message_id
-        initial_message.responded = True
+        self.mark_responded(initial_message, message_id)
+        self.message_log.update(initial_message.message_id, response_id=message_id, responded=True)
 
         await self.store_message(message)
         return f"Successfully responded to message {message_id}"
\ No newline at end of file
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Callable, Dict, Tuple
+
+import yaml
+
+from autogpt.logs import logger
+from autogpt.organization.org_persistence import write_file_atomic
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class MessageLog:
+    """
+    Append-only journal of message center changes with periodic compaction.
+
+    Every new message and every change to a message is appended as one JSON
+    line to `{name}_messages.jsonl`, so storing a message costs O(1) I/O.
+    After `compact_every` records the full message set is written to the
+    YAML snapshot (`{name}_messages.yaml`) and the journal starts over.
+    Loading replays the journal on top of the snapshot.
+
+    Records:
+        {"op": "add", "message": {<message fields>}}
+        {"op": "update", "message_id": <id>, "fields": {<changed fields>}}
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str,
+        snapshot: Callable[[], dict],
+        compact_every: int = 10000,
+    ):
+        """
+        Args:
+            snapshot_path (str): Path of the YAML snapshot, the journal lives next to it
+            snapshot (Callable): Returns a copy of the data to write to the snapshot
+            compact_every (int): Number of journal records that triggers a compaction
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = os.path.splitext(snapshot_path)[0] + ".jsonl"
+        # The journal is moved here while its contents are being compacted
+        self.compacting_path = self.journal_path + ".compacting"
+        self.snapshot = snapshot
+        self.compact_every = compact_every
+
+        self.records_since_compaction = 0
+        self._journal = None
+        self._compaction = None
+
+    def _open_journal(self):
+        if self._journal is None:
+            os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+            self._journal = open(self.journal_path, "a")
+        return self._journal
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def append(self, record: dict) -> None:
+        """
+        Appends a record to the journal and schedules a compaction if the
+        journal has grown past `compact_every` records.
+        """
+        journal = self._open_journal()
+        journal.write(json.dumps(record, default=_json_default) + "\n")
+        journal.flush()
+
+        self.records_since_compaction += 1
+        if self.records_since_compaction >= self.compact_every and (
+            self._compaction is None or self._compaction.done()
+        ):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._compaction = loop.create_task(self.compact())
+
+    def add(self, message_data: dict) -> None:
+        self.append({"op": "add", "message": message_data})
+
+    def update(self, message_id: int, **fields) -> None:
+        self.append({"op": "update", "message_id": message_id, "fields": fields})
+
+    def _rotate(self) -> dict:
+        """
+        Takes a snapshot and moves the journal aside, so new records go to a
+        fresh journal while the snapshot is written.
+        """
+        data = self.snapshot()
+        self._close_journal()
+        if os.path.exists(self.journal_path) and not os.path.exists(
+            self.compacting_path
+        ):
+            os.replace(self.journal_path, self.compacting_path)
+        self.records_since_compaction = 0
+        return data
+
+    def _write_snapshot(self, data: dict) -> None:
+        write_file_atomic(self.snapshot_path, yaml.dump(data))
+        # Everything in the old journal is part of the snapshot now
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    async def compact(self) -> None:
+        """
+        Writes all messages to the snapshot and truncates the journal. The
+        snapshot is written in a thread so the event loop is not blocked.
+        """
+        data = self._rotate()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write_snapshot, data)
+        except Exception as e:
+            # The journal moved aside is kept, so nothing is lost
+            logger.error(f"Failed to compact message log {self.snapshot_path}: {e}")
+
+    def compact_sync(self) -> None:
+        """
+        Synchronous version of `compact`
+        """
+        self._write_snapshot(self._rotate())
+
+    def load(self) -> Tuple[int, Dict[int, dict]]:
+        """
+        Replays the snapshot and the journal.
+
+        Returns:
+            The max message id and a dict of message id to message fields
+        """
+        max_id = 0
+        messages: Dict[int, dict] = {}
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, mode="r") as infile:
+                data = yaml.safe_load(infile.read()) or {}
+            max_id = data.get("max_id", 0)
+            messages = dict(data.get("messages", None) or {})
+
+        for path in (self.compacting_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, mode="r") as infile:
+                for line in infile:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn write at the end of the journal after a crash
+                        logger.warn(f"Skipping corrupt record in {path}")
+                        continue
+                    if record["op"] == "add":
+                        message = record["message"]
+                        messages[message["message_id"]] = message
+                        max_id = max(max_id, message["message_id"])
+                    elif record["op"] == "update" and record["message_id"] in messages:
+                        messages[record["message_id"]].update(record["fields"])
+
+        return max_id, messages
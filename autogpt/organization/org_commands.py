@@ -30,8 +30,8 @@ async def message_agent(receiver_id: str, message: str, agent: Agent) -> str:
         Returns:
             str: Send confirmation or error
     """
-    event_id = await agent.send_event("message_agent", agent.ai_id, receiver_id, message)
-    response = await agent.organization.get_event_result(event_id)
+    future = await agent.send_event("message_agent", agent.ai_id, receiver_id, message)
+    response = await agent.organization.get_event_result(future)
     return response
 
 
@@ -49,8 +49,8 @@ async def get_conversation_history(agent_id: str, agent: Agent) -> str:
         Returns:
             str: The conversation history
     """
-    event_id = await agent.send_event("get_conversation_history", agent.ai_id, agent_id)
-    response = await agent.organization.get_event_result(event_id)
+    future = await agent.send_event("get_conversation_history", agent.ai_id, agent_id)
+    response = await agent.organization.get_event_result(future)
     return response
 
 
@@ -70,8 +70,8 @@ async def respond_to_message(message_id: str, response: str, agent: Agent) -> st
         Returns: 
             str: confirmation or error
     """
-    event_id = await agent.send_event("respond_to_message", message_id, response, agent.ai_id)
-    response = await agent.organization.get_event_result(event_id)
+    future = await agent.send_event("respond_to_message", message_id, response, agent.ai_id)
+    response = await agent.organization.get_event_result(future)
     return response
 
 
@@ -94,8 +94,8 @@ async def hire_staff(staff_name: str, role: str, goals: str, budget: str, agent:
         Returns:
             str: confirmation or error
     """
-    event_id = await agent.send_event("hire_staff", staff_name, role, goals, budget, agent.ai_id)
-    response = await agent.organization.get_event_result(event_id)
+    future = await agent.send_event("hire_staff", staff_name, role, goals, budget, agent.ai_id)
+    response = await agent.organization.get_event_result(future)
     return response
 
 
@@ -114,8 +114,8 @@ async def fire_staff(agent_id: str, agent: Agent) -> str:
         Returns:
             str: confirmation or error
     """
-    event_id = await agent.send_event("fire_staff", agent_id)
-    response = await agent.organization.get_event_result(event_id)
+    future = await agent.send_event("fire_staff", agent_id)
+    response = await agent.organization.get_event_result(future)
     return response
 
 
@@ -135,8 +135,8 @@ async def message_supervisor( message: str,  agent: Agent) -> str:
         Returns:
             str: Send confirmation or error
     """
-    event_id = await agent.send_event("message_supervisor",agent.ai_id, message)
-    response = await agent.organization.get_event_result(event_id)
+    future = await agent.send_event("message_supervisor",agent.ai_id, message)
+    response = await agent.organization.get_event_result(future)
     return response
 
 
@@ -157,6 +157,6 @@ async def message_staff(receiver_id: str, message: str, agent: Agent) -> str:
         Returns:
             str: Send confirmation or error
     """
-    event_id = await agent.send_event("message_staff", agent.ai_id, receiver_id, message)
-    response = await agent.organization.get_event_result(event_id)
+    future = await agent.send_event("message_staff", agent.ai_id, receiver_id, message)
+    response = await agent.organization.get_event_result(future)
     return response
\ No newline at end of file
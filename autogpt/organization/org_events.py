@@ -1,3 +1,21 @@
+import asyncio
+from dataclasses import dataclass
+
+
+@dataclass
+class CycleTick:
+    """
+        Result of the `cycle_tick` action: the organization context an agent needs
+        at the start of every cycle.
+    """
+
+    operating_cost: float  # LLM cost of the last step of the agent and its staff, for reporting
+    step_cost: float  # LLM spend of the agent since its previous tick, deducted from its budget
+    budget: float  # Budget left after the deduction
+    inbox: str  # Inbox prompt, see MessageCenter.get_inbox
+    status: str  # Staff and budget prompt, see Organization.build_status_update
+
+
 class Event:
     def __init__(self, event_id, agent, action, *args, **kwargs):
         self.event_id = event_id
@@ -7,6 +25,42 @@ class Event:
         self.args = args
         self.kwargs = kwargs
 
+        # Resolved by process(), awaited by whoever sent the event
+        self.future = asyncio.get_running_loop().create_future()
+
+    def cancel(self):
+        """
+            Cancel the event so that it is skipped when processed and anyone
+            awaiting its result is released.
+        """
+        self.future.cancel()
+
     async def process(self):
-        result = await self.agent.organization.perform_action(self.action, self.agent_id, *self.args, **self.kwargs)
-        self.agent.organization.event_results[self.event_id] = result
\ No newline at end of file
+        if self.future.done():
+            # Cancelled or timed out before it reached the front of the queue
+            return
+
+        try:
+            result = await self.agent.organization.perform_action(self.action, self.agent_id, *self.args, **self.kwargs)
+        except Exception as e:
+            if not self.future.done():
+                self.future.set_exception(e)
+        else:
+            if not self.future.done():
+                self.future.set_result(result)
+
+
+async def wait_for_event(future, timeout):
+    """
+        Waits for the result of an event, see `Organization.get_event_result`.
+    """
+    try:
+        # Shield the future so that a timeout is the only way we cancel it ourselves
+        return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+    except asyncio.TimeoutError:
+        future.cancel()
+        raise
+    except asyncio.CancelledError:
+        if not future.cancelled():
+            raise
+        return "Error: This action was cancelled because the agent is no longer part of the organization."
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from typing import Callable
+
+import yaml
+
+from autogpt.logs import logger
+
+
+def write_file_atomic(path: str, content: str) -> None:
+    """
+    Writes content to a temporary file next to path and renames it over path,
+    so readers never see a half-written file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class WriteBehindYaml:
+    """
+    Coalesces writes of a YAML file.
+
+    Callers mark the state dirty after changing it. A background task dumps
+    the latest snapshot once `interval` seconds have passed or as soon as
+    `max_pending` changes have piled up, whichever comes first. The dump and
+    the write run in a thread so the event loop is never blocked by them.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        snapshot: Callable[[], dict],
+        interval: float = 1.0,
+        max_pending: int = 100,
+    ):
+        """
+        Args:
+            path (str): The YAML file to write
+            snapshot (Callable): Returns a copy of the data to dump. Called on the event loop.
+            interval (float): Max seconds a change waits before it is flushed
+            max_pending (int): Number of changes that triggers an immediate flush
+        """
+        self.path = path
+        self.snapshot = snapshot
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self.pending = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    def mark_dirty(self) -> None:
+        """
+        Records a change and makes sure a flush is scheduled. Must be called
+        from a running event loop.
+        """
+        self.pending += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.pending >= self.max_pending:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while self.pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self, force: bool = False) -> None:
+        """
+        Writes the current state to disk if anything changed since the last flush.
+
+        Args:
+            force (bool): Write even if nothing was marked dirty
+        """
+        async with self._flush_lock:
+            if not self.pending and not force:
+                return
+            self.pending = 0
+            data = self.snapshot()
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(
+                    None, lambda: write_file_atomic(self.path, yaml.dump(data))
+                )
+            except Exception as e:
+                # Keep the state dirty so the next flush retries
+                self.pending += 1
+                logger.error(f"Failed to write {self.path}: {e}")
@@ -0,0 +1,128 @@
+from typing import Dict, Iterator, List, Optional
+
+
+class OrgTree:
+    """
+    The supervisor/staff hierarchy of an organization.
+
+    Keeps the supervisor -> staff lists that are persisted to YAML, a staff ->
+    supervisor map, and the size and LLM cost per step of every agent's
+    subtree (the agent plus all staff below it). Hiring, firing and cost
+    updates adjust the subtrees of the ancestors, so supervisor lookups and
+    operating cost queries are O(1).
+    """
+
+    def __init__(self, supervisor_to_staff: Optional[Dict[int, List[int]]] = None):
+        """
+        Args:
+            supervisor_to_staff (dict): Maps supervisor ID to staff IDs
+        """
+        self.children: Dict[int, List[int]] = {}
+        self.parent: Dict[int, int] = {}
+        self.subtree_sizes: Dict[int, int] = {}
+        self.costs: Dict[int, float] = {}
+        self.subtree_costs: Dict[int, float] = {}
+
+        for supervisor_id, staff_ids in (supervisor_to_staff or {}).items():
+            self.children[supervisor_id] = list(staff_ids)
+            for staff_id in staff_ids:
+                self.parent[staff_id] = supervisor_id
+
+        for agent_id in self.roots():
+            self._compute_subtree_size(agent_id)
+
+    def _compute_subtree_size(self, agent_id: int) -> int:
+        # Iterative post-order walk, hierarchies can be deeper than the recursion limit
+        stack = [(agent_id, False)]
+        while stack:
+            node, visited = stack.pop()
+            staff_ids = self.children.get(node, [])
+            if visited:
+                self.subtree_sizes[node] = 1 + sum(
+                    self.subtree_sizes[s] for s in staff_ids
+                )
+            else:
+                stack.append((node, True))
+                stack.extend((staff_id, False) for staff_id in staff_ids)
+        return self.subtree_sizes[agent_id]
+
+    def roots(self) -> List[int]:
+        """
+        Returns the agents that have staff but no supervisor
+        """
+        return [agent_id for agent_id in self.children if agent_id not in self.parent]
+
+    def ancestors(self, agent_id: int) -> Iterator[int]:
+        """
+        Yields the supervisor of the agent, their supervisor and so on
+        """
+        supervisor_id = self.parent.get(agent_id)
+        while supervisor_id is not None:
+            yield supervisor_id
+            supervisor_id = self.parent.get(supervisor_id)
+
+    def add(self, supervisor_id: int, staff_id: int) -> None:
+        """
+        Adds a new staff member under supervisor_id
+        """
+        self.children.setdefault(supervisor_id, []).append(staff_id)
+        self.parent[staff_id] = supervisor_id
+        self.subtree_sizes.setdefault(supervisor_id, 1)
+        size = self.subtree_sizes.setdefault(staff_id, 1)
+
+        cost = self.subtree_costs.get(staff_id, 0.0)
+
+        for ancestor_id in (supervisor_id, *self.ancestors(supervisor_id)):
+            self.subtree_sizes[ancestor_id] += size
+            self.subtree_costs[ancestor_id] = (
+                self.subtree_costs.get(ancestor_id, 0.0) + cost
+            )
+
+    def remove(self, staff_id: int) -> None:
+        """
+        Removes an agent from the hierarchy. The agent is expected to have no staff.
+        """
+        size = self.subtree_sizes.pop(staff_id, 1)
+        cost = self.subtree_costs.pop(staff_id, 0.0)
+        self.costs.pop(staff_id, None)
+        for ancestor_id in self.ancestors(staff_id):
+            self.subtree_sizes[ancestor_id] -= size
+            self.subtree_costs[ancestor_id] = (
+                self.subtree_costs.get(ancestor_id, 0.0) - cost
+            )
+
+        supervisor_id = self.parent.pop(staff_id, None)
+        if supervisor_id is not None and staff_id in self.children.get(
+            supervisor_id, []
+        ):
+            self.children[supervisor_id].remove(staff_id)
+            # Remove the supervisor's entry if they have no more staff
+            if not self.children[supervisor_id]:
+                del self.children[supervisor_id]
+
+    def get_supervisor_id(self, agent_id: int) -> Optional[int]:
+        return self.parent.get(agent_id)
+
+    def get_staff_ids(self, agent_id: int) -> List[int]:
+        return self.children.get(agent_id, [])
+
+    def subtree_size(self, agent_id: int) -> int:
+        """
+        Returns the number of agents in the subtree of agent_id, including itself
+        """
+        return self.subtree_sizes.get(agent_id, 1)
+
+    def set_cost(self, agent_id: int, cost: float) -> None:
+        """
+        Sets the agent's own LLM cost per step
+        """
+        delta = cost - self.costs.get(agent_id, 0.0)
+        self.costs[agent_id] = cost
+        for node in (agent_id, *self.ancestors(agent_id)):
+            self.subtree_costs[node] = self.subtree_costs.get(node, 0.0) + delta
+
+    def subtree_cost(self, agent_id: int) -> float:
+        """
+        Returns the LLM cost per step of agent_id and all staff below it
+        """
+        return self.subtree_costs.get(agent_id, 0.0)
@@ -0,0 +1,445 @@
+"""
+    Runs the agents of an organization in worker processes.
+
+    The Organization stays in the main process and owns the organization state.
+    Each worker process runs the interaction loops of some of the agents on its
+    own event loop, so that a large organization uses all CPU cores. The agents of
+    a worker talk to an OrganizationClient, which sends their events over a pipe
+    to the AgentWorkerPool. The pool puts them on the organization's event queue
+    like the events of any other agent and sends the results back.
+
+    Messages from a worker to the pool:
+        ("event", event_id, agent_id, action, args, kwargs, usage)
+        ("cancel", event_id)
+        ("terminated", agent_id)
+
+    Messages from the pool to a worker:
+        ("result", event_id, result) / ("error", event_id, exception) / ("cancelled", event_id)
+        ("start", agent_id) / ("terminate", agent_id) / ("stop",)
+"""
+import asyncio
+import functools
+import glob
+import multiprocessing
+import os
+import signal
+import threading
+from dataclasses import dataclass, field
+from typing import Any
+
+from autogpt import app
+from autogpt.config import Config
+from autogpt.llm.api_manager import ApiManager, current_agent_id
+from autogpt.llm.providers import openai as iopenai
+from autogpt.llm.response_cache import ResponseCache
+from autogpt.llm.scheduler import LLMScheduler
+from autogpt.logs import logger
+from autogpt.memory.vector.utils import EmbeddingBatcher
+from autogpt.organization.org_events import Event, wait_for_event
+from autogpt.singleton import Singleton
+
+# Seconds a worker gets to exit after it was asked to stop
+WORKER_STOP_TIMEOUT = 10
+
+
+def fork_available() -> bool:
+    """
+        Whether worker processes can be started. The workers are forked so that they
+        start with the agents, configuration and plugins of the main process.
+    """
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def reset_process_state(n_processes: int) -> None:
+    """
+        Drops the state a forked worker inherited from the main process but must not
+        share with it: the open connections, the threads and their queues. The
+        workers split the API rate limits between them.
+
+        Args:
+            n_processes (int): Number of worker processes
+    """
+    for cls in (ResponseCache, EmbeddingBatcher, LLMScheduler):
+        Singleton._instances.pop(cls, None)
+    iopenai.forget_sessions()
+    app._command_executor = None
+
+    cfg = Config()
+    requests_per_minute = cfg.llm_requests_per_minute
+    tokens_per_minute = cfg.llm_tokens_per_minute
+    LLMScheduler(
+        max(1, requests_per_minute // n_processes) if requests_per_minute > 0 else 0,
+        max(1, tokens_per_minute // n_processes) if tokens_per_minute > 0 else 0,
+    )
+
+
+@dataclass
+class _Worker:
+    conn: Any  # The pool's end of the pipe
+    process: Any = None
+    agent_ids: set = field(default_factory=set)  # Agents running in the worker
+
+
+class AgentWorkerPool:
+    """
+        Runs the agents of the organization in worker processes and performs the
+        events they send on the organization. Its methods must be called on the event
+        loop of the organization.
+    """
+
+    def __init__(self, organization, n_processes: int):
+        """
+            Args:
+                organization (Organization): The organization performing the events
+                n_processes (int): Number of worker processes
+        """
+        self.organization = organization
+        self.n_processes = n_processes
+        self.workers: list[_Worker] = []
+        self._events: dict[str, Event] = {}  # Events sent by the workers that are not done
+        self._loop = None
+
+    def start(self) -> None:
+        """
+            Forks the worker processes. Call it before the agents start running, so
+            that no other thread holds a lock while the workers are forked.
+        """
+        self._loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("fork")
+        for i in range(self.n_processes):
+            conn, child_conn = context.Pipe()
+            worker = _Worker(conn)
+            worker.process = context.Process(
+                target=self._run_worker,
+                args=(child_conn, conn),
+                name=f"agent-worker-{i}",
+                daemon=True,
+            )
+            worker.process.start()
+            child_conn.close()
+            self._attach(worker)
+
+    def _attach(self, worker: _Worker) -> None:
+        self.workers.append(worker)
+        threading.Thread(
+            target=self._listen, args=(worker,), name=f"{worker.process.name}-listener", daemon=True
+        ).start()
+
+    async def stop(self) -> None:
+        """
+            Stops the worker processes, terminating those that do not exit in time
+        """
+        for worker in self.workers:
+            self._send(worker, ("stop",))
+        for worker in self.workers:
+            await asyncio.to_thread(worker.process.join, WORKER_STOP_TIMEOUT)
+            if worker.process.is_alive():
+                logger.warn(f"Agent worker {worker.process.name} did not stop, terminating it")
+                worker.process.terminate()
+        self.workers = []
+
+    def start_agent(self, agent_id: int) -> None:
+        """
+            Starts the interaction loop of an agent in the least busy worker
+
+            Args:
+                agent_id (int): An agent of the organization
+        """
+        agent = self.organization.agents[agent_id]
+        if not self.workers:
+            logger.warn(f"No agent worker left, running agent {agent_id} in this process")
+            asyncio.create_task(self.organization.start_agent_loop(agent))
+            return
+
+        worker = min(self.workers, key=lambda w: len(w.agent_ids))
+        worker.agent_ids.add(agent_id)
+        self.organization.running_agents.append(agent)
+        self._send(worker, ("start", agent_id))
+
+    def terminate_agent(self, agent_id: int) -> None:
+        """
+            Stops the interaction loop of an agent after its current cycle
+
+            Args:
+                agent_id (int): An agent started with `start_agent`
+        """
+        for worker in self.workers:
+            if agent_id in worker.agent_ids:
+                self._send(worker, ("terminate", agent_id))
+
+    def terminate_all(self) -> None:
+        """
+            Stops the interaction loops of all the agents after their current cycle
+        """
+        for worker in self.workers:
+            for agent_id in list(worker.agent_ids):
+                self._send(worker, ("terminate", agent_id))
+
+    def _listen(self, worker: _Worker) -> None:
+        # Runs in a thread per worker, hands the messages over to the event loop
+        while True:
+            try:
+                message = worker.conn.recv()
+            except (EOFError, OSError):
+                message = None
+            try:
+                if message is None:
+                    self._loop.call_soon_threadsafe(self._worker_exited, worker)
+                    return
+                self._loop.call_soon_threadsafe(self._handle, worker, message)
+            except RuntimeError:
+                # The event loop is closed
+                return
+
+    def _handle(self, worker: _Worker, message: tuple) -> None:
+        kind = message[0]
+        if kind == "event":
+            _, event_id, agent_id, action, args, kwargs, usage = message
+            # The worker made the API calls, the budgets are charged here
+            ApiManager().set_agent_usage(agent_id, usage)
+            agent = self.organization.agents.get(agent_id)
+            if agent is None:
+                # Fired while the event was on its way
+                self._send(worker, ("cancelled", event_id))
+                return
+            event = Event(event_id, agent, action, *args, **kwargs)
+            self._events[event_id] = event
+            event.future.add_done_callback(functools.partial(self._reply, worker, event_id))
+            self.organization.event_queue.put_nowait(event)
+        elif kind == "cancel":
+            event = self._events.get(message[1])
+            if event is not None:
+                event.cancel()
+        elif kind == "terminated":
+            self._agent_exited(worker, message[1])
+
+    def _reply(self, worker: _Worker, event_id: str, future: asyncio.Future) -> None:
+        self._events.pop(event_id, None)
+        if future.cancelled():
+            self._send(worker, ("cancelled", event_id))
+        elif future.exception() is not None:
+            error = future.exception()
+            if not self._send(worker, ("error", event_id, error)):
+                self._send(worker, ("error", event_id, RuntimeError(str(error))))
+        elif not self._send(worker, ("result", event_id, future.result())):
+            self._send(worker, ("error", event_id, RuntimeError(f"The result of {event_id} can't be sent to the agent")))
+
+    def _send(self, worker: _Worker, message: tuple) -> bool:
+        """
+            Returns False if the message can't be pickled. A message to a worker that
+            exited is dropped, `_worker_exited` cleans up after it.
+        """
+        try:
+            worker.conn.send(message)
+        except (OSError, EOFError):
+            pass
+        except Exception:
+            return False
+        return True
+
+    def _agent_exited(self, worker: _Worker, agent_id: int) -> None:
+        worker.agent_ids.discard(agent_id)
+        running_agents = self.organization.running_agents
+        running_agents[:] = [agent for agent in running_agents if agent.ai_id != agent_id]
+
+    def _worker_exited(self, worker: _Worker) -> None:
+        if worker not in self.workers:
+            return
+        self.workers.remove(worker)
+        if worker.agent_ids:
+            logger.warn(
+                f"Agent worker {worker.process.name} exited, its agents stopped: "
+                + ", ".join(str(agent_id) for agent_id in sorted(worker.agent_ids))
+            )
+        for agent_id in list(worker.agent_ids):
+            self._agent_exited(worker, agent_id)
+
+    def _run_worker(self, conn, parent_conn) -> None:
+        # Entry point of a forked worker process.
+        # Keep Ctrl+C for the main process, which shuts the workers down.
+        os.setpgrp()
+        signal.set_wakeup_fd(-1)
+        asyncio._set_running_loop(None)
+        parent_conn.close()
+        for worker in self.workers:
+            worker.conn.close()
+
+        reset_process_state(self.n_processes)
+        asyncio.run(OrganizationClient(conn, self.organization).run())
+
+
+class _ForwardingQueue:
+    """
+        Takes the place of the organization's event queue in a worker
+    """
+
+    def __init__(self, client: "OrganizationClient"):
+        self.client = client
+
+    async def put(self, event: Event) -> None:
+        self.client.send_event(event)
+
+
+class OrganizationClient:
+    """
+        Takes the place of the Organization for the agents of a worker process: it
+        forwards their events to the AgentWorkerPool and runs the agents it is given.
+    """
+
+    def __init__(self, conn, organization):
+        """
+            Args:
+                conn (multiprocessing.connection.Connection): The worker's end of the pipe
+                organization (Organization): The copy of the organization the worker
+                    was forked with, used to set up the agents
+        """
+        self.conn = conn
+        self.organization = organization
+        self.event_queue = _ForwardingQueue(self)
+        self.agents = {}
+        self.running_agents = []
+        self._pending: dict[str, asyncio.Future] = {}  # Futures of the events sent to the pool
+        self._tasks = set()
+        self._loop = None
+        self._stop_requested = None
+        self.termination_event = None
+
+    async def run(self) -> None:
+        """
+            Runs the agents the pool starts until the pool stops the worker
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop_requested = asyncio.Event()
+        self.termination_event = asyncio.Event()
+        threading.Thread(target=self._listen, name="organization-client", daemon=True).start()
+
+        await self._stop_requested.wait()
+        # Let the agents finish their current cycle
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await iopenai.close_sessions()
+
+    def send_event(self, event: Event) -> None:
+        """
+            Sends an event to the pool, its future is resolved with the reply
+        """
+        self._pending[event.event_id] = event.future
+        event.future.add_done_callback(functools.partial(self._event_done, event.event_id))
+        # The usage so far, for the organization to charge the agent
+        usage = ApiManager().get_agent_usage(event.agent_id)
+        self._send(("event", event.event_id, event.agent_id, event.action, event.args, event.kwargs, usage))
+
+    async def get_event_result(self, future, timeout=None):
+        """
+            See `Organization.get_event_result`
+        """
+        if timeout is None:
+            timeout = Config().org_event_timeout
+        return await wait_for_event(future, timeout)
+
+    async def register_agent(self, agent):
+        self.running_agents.append(agent)
+
+    async def notify_termination(self, agent):
+        if agent in self.running_agents:
+            self.running_agents.remove(agent)
+            self._send(("terminated", agent.ai_id))
+
+    def _event_done(self, event_id: str, future: asyncio.Future) -> None:
+        # Still pending means the agent gave up on the event, the pool can skip it
+        if self._pending.pop(event_id, None) is not None and future.cancelled():
+            self._send(("cancel", event_id))
+
+    def _send(self, message: tuple) -> None:
+        try:
+            self.conn.send(message)
+        except (OSError, EOFError):
+            # The main process is gone, _lost stops the agents
+            pass
+
+    def _listen(self) -> None:
+        # Runs in a thread, hands the messages over to the event loop
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                message = None
+            try:
+                if message is None:
+                    self._loop.call_soon_threadsafe(self._stop)
+                    return
+                self._loop.call_soon_threadsafe(self._handle, message)
+            except RuntimeError:
+                # The event loop is closed
+                return
+
+    def _handle(self, message: tuple) -> None:
+        kind = message[0]
+        if kind in ("result", "error", "cancelled"):
+            future = self._pending.pop(message[1], None)
+            if future is None or future.done():
+                return
+            if kind == "result":
+                future.set_result(message[2])
+            elif kind == "error":
+                future.set_exception(message[2])
+            else:
+                future.cancel()
+        elif kind == "start":
+            task = asyncio.create_task(self._run_agent(message[1]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif kind == "terminate":
+            agent = self.agents.get(message[1])
+            if agent is not None:
+                agent.terminated = True
+        elif kind == "stop":
+            self._stop()
+
+    def _stop(self) -> None:
+        for agent in self.agents.values():
+            agent.terminated = True
+        for future in self._pending.values():
+            future.cancel()
+        self._stop_requested.set()
+
+    async def _run_agent(self, agent_id: int) -> None:
+        current_agent_id.set(agent_id)
+        try:
+            agent = self.organization.agents.get(agent_id) or self._load_agent(agent_id)
+        except Exception as e:
+            logger.error(f"Agent {agent_id} could not be started: ", str(e))
+            self._send(("terminated", agent_id))
+            return
+
+        agent.organization = self
+        self.agents[agent_id] = agent
+        await self.register_agent(agent)
+        try:
+            await agent.start_interaction_loop(self.termination_event)
+        except Exception as e:
+            logger.error(f"Agent {agent_id} stopped: ", str(e))
+        finally:
+            # The interaction loop notifies the termination when it ends normally
+            await self.notify_termination(agent)
+
+    def _load_agent(self, agent_id: int):
+        """
+            Sets up an agent that was hired after the worker was forked
+        """
+        # Imported here, the organization module imports this one
+        from autogpt.config.ai_config import AIConfig
+        from autogpt.organization.organization import build_command_registry
+
+        yaml_paths = glob.glob(
+            os.path.join(self.organization.org_dir_path, "agents", f"{agent_id}_*", "agent.yaml")
+        )
+        if not yaml_paths:
+            raise FileNotFoundError(f"agent.yaml of agent {agent_id} not found")
+
+        command_registry = build_command_registry()
+        agent_config = AIConfig.load(file_path=yaml_paths[0], command_registry=command_registry)
+        if agent_config is None:
+            raise ValueError(f"{yaml_paths[0]} could not be loaded")
+        agent_config.init_memory = False
+        return self.organization.add_agent(agent_config, command_registry)
@@ -8,7 +8,6 @@ import uuid
 from functools import wraps
 from typing import Dict, List, Union
 
-import aiofiles
 import matplotlib.pyplot as plt
 import networkx as nx
 import yaml
@@ -20,9 +19,16 @@ from autogpt.commands.command import CommandRegistry, command
 from autogpt.config import Config
 from autogpt.config.ai_config import AIConfig
 from autogpt.config.config import Singleton
+from autogpt.llm.api_manager import ApiManager, current_agent_id
+from autogpt.llm.providers import openai as iopenai
 from autogpt.logs import logger
 from autogpt.memory.vector import get_memory
 from autogpt.organization.message import Message, MessageCenter
+from autogpt.organization.org_events import CycleTick, wait_for_event
+from autogpt.organization.org_locks import ReadWriteLock
+from autogpt.organization.org_persistence import WriteBehindYaml, write_file_atomic
+from autogpt.organization.org_tree import OrgTree
+from autogpt.organization.org_workers import AgentWorkerPool, fork_available
 from autogpt.prompts.prompt import DEFAULT_TRIGGERING_PROMPT, construct_main_ai_config
 
 COMMAND_CATEGORIES = [
@@ -41,6 +47,35 @@ COMMAND_CATEGORIES = [
     "autogpt.organization.org_commands",
 ]
 
+# Actions that only read organization state and can run concurrently
+READ_ONLY_ACTIONS = {
+    "get_staff",
+    "get_conversation_history",
+    "get_inbox",
+    "calculate_operating_cost_of_agent",
+    "build_status_update",
+}
+
+# Actions that change the shape of the organization and need exclusive access
+STRUCTURAL_ACTIONS = {
+    "hire_staff",
+    "fire_staff",
+}
+
+
+def build_command_registry():
+    """
+        Returns a command registry with the enabled command categories of the agents
+    """
+    command_registry = CommandRegistry()
+    enabled_command_catergories = [
+        x for x in COMMAND_CATEGORIES if x not in cfg.disabled_command_categories
+    ]
+    for command_catergory in enabled_command_catergories:
+        command_registry.import_commands(command_catergory)
+    return command_registry
+
+
 class DebuggableQueue(asyncio.Queue):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -55,12 +90,15 @@ class DebuggableQueue(asyncio.Queue):
         Filters the queue based on the given condition.
         
         :param condition: A callable that takes an event and returns a boolean value. If the condition returns True, the event will be kept in the queue.
+            Events that are dropped from the queue are cancelled.
         """
         temp_queue = []
         while not self.empty():
             event = self.get_nowait()
             if condition(event):
                 temp_queue.append(event)
+            else:
+                event.cancel()
         for event in temp_queue:
             await self.put(event)
 
@@ -90,35 +128,12 @@ async def update_yaml_after(func):
     return wrapper
 
 
-async def async_update_yaml(obj, yaml_path):
-    
-    # Create a dictionary to represent the organization data
-    org_data = {
-        'name': obj.name,
-        'goal': obj.goal,
-        'initial_budget': obj.initial_budget,
-        'agent_budgets': obj.agent_budgets,
-        'agent_running_costs': obj.agent_running_costs,
-        'agent_statuses': obj.agent_statuses,
-        'supervisor_to_staff': obj.supervisor_to_staff,
-        'agent_termination_events': obj.agent_termination_events,
-        'id_count': obj.id_count,
-    }
-
-    async with aiofiles.open(yaml_path, mode='w') as outfile:
-        await outfile.write(yaml.dump(org_data))
-
-
-
 def update_yaml_after_async(func):
+    # Marks the organization dirty, the YAML file is written behind by obj.persistence
     async def wrapper(*args, **kwargs):
         obj = args[0]
-        async with obj.action_lock:
-            res = await func(*args, **kwargs)
-            file_path = obj.org_yaml_path
-
-            async with obj.file_lock:  # Use the file lock here
-                await async_update_yaml(obj, file_path)
+        res = await func(*args, **kwargs)
+        obj.persistence.mark_dirty()
         return res
     return wrapper
 
@@ -139,10 +154,12 @@ class Organization(metaclass=Singleton):
         self.id_count = 0
         self.agent_budgets = {}
         self.agent_running_costs = {}
+        # LLM cost of each agent that has been deducted from its budget so far
+        self.agent_charged_costs = {}
         self.pending_messages = {}
         
         self.agent_statuses = {}
-        self.supervisor_to_staff: Dict[int, List[int]] = {}  # Maps supervisor ID to staff IDs
+        self.org_tree = OrgTree()  # The supervisor/staff hierarchy
         self.agent_termination_events = {}
 
         # File paths
@@ -152,18 +169,42 @@ class Organization(metaclass=Singleton):
         self.message_center = MessageCenter(self) # New message center we should implement soon
         # Organization event queue
         self.event_queue = DebuggableQueue()
-        self.event_results = {}
 
         # Handles termination
         self.termination_event = asyncio.Event()
 
+        # Coalesces organization YAML writes
+        self.persistence = WriteBehindYaml(
+            self.org_yaml_path,
+            self.to_dict,
+            interval=cfg.org_flush_interval,
+            max_pending=cfg.org_flush_max_pending,
+        )
+
         # Some locks
-        self.action_lock = asyncio.Lock()
-        self.file_lock = asyncio.Lock()
-        self.org_lock = asyncio.Lock()
+        self.org_lock = ReadWriteLock()
+        self.agent_locks: Dict[int, asyncio.Lock] = {}
+        self.processed_event_count = 0
+
+        # Runs the agent loops when cfg.org_agent_processes is set
+        self.agent_workers = None
         
 
 
+    @property
+    def supervisor_to_staff(self) -> Dict[int, List[int]]:
+        """
+            Maps supervisor ID to staff IDs. Mutate it through org_tree so the
+            cached supervisors and subtree sizes stay correct.
+        """
+        return self.org_tree.children
+
+
+    @supervisor_to_staff.setter
+    def supervisor_to_staff(self, supervisor_to_staff: Dict[int, List[int]]):
+        self.org_tree = OrgTree(supervisor_to_staff)
+
+
     async def register_agent(self, agent):
         self.running_agents.append(agent)
 
@@ -173,7 +214,13 @@ class Organization(metaclass=Singleton):
 
 
     async def process_events(self):
-        iteration_count = 0
+        # Workers share the event queue, perform_action takes care of locking
+        workers = [self.event_worker() for _ in range(max(1, cfg.org_event_workers))]
+        await asyncio.gather(*workers)
+        print("\nTermination event set. Exited process_events loop.\n")
+
+
+    async def event_worker(self):
         while not self.termination_event.is_set():
             try:
                 # Wait for an event to be available in the queue or for the timeout to be reached
@@ -185,23 +232,35 @@ class Organization(metaclass=Singleton):
             if event.agent.ai_id in self.agents:
                 await event.process()  # Call the process method for each event
             else:
+                event.cancel()
                 print(f"Discarded event from terminated agent {event.agent.ai_id}.")
             self.event_queue.task_done()
 
-            # Print the contents of the queue every other iteration
-            iteration_count += 1
-            if iteration_count % 50 == 0:
+            # Print the contents of the queue every 50 processed events
+            self.processed_event_count += 1
+            if self.processed_event_count % 50 == 0:
                 print("Contents of the event queue:")
                 self.event_queue.print_contents()
-        print("\nTermination event set. Exited process_events loop.\n")
         
 
-    async def get_event_result(self, event_id):
-        while event_id not in self.event_results:
-            await asyncio.sleep(0.1)
-        result = self.event_results[event_id]
-        del self.event_results[event_id]
-        return result
+    async def get_event_result(self, future, timeout=None):
+        """
+            Waits for the result of an event sent with `Agent.send_event`.
+
+            Args:
+                future (asyncio.Future): The future returned by `send_event`
+                timeout (float): Seconds to wait before giving up. Defaults to cfg.org_event_timeout
+
+            Returns:
+                The result of the action, or an error string if the event was cancelled
+
+            Raises:
+                asyncio.TimeoutError: If the event was not processed in time
+                Exception: Any exception raised while performing the action
+        """
+        if timeout is None:
+            timeout = cfg.org_event_timeout
+        return await wait_for_event(future, timeout)
 
 
     def convert_string_to_list(self, comma_separated_string):
@@ -216,87 +275,113 @@ class Organization(metaclass=Singleton):
         return self.id_count
     
 
+    def get_agent_lock(self, agent_id):
+        """
+            Returns the lock that serializes mutations of a single agent's state
+        """
+        return self.agent_locks.setdefault(agent_id, asyncio.Lock())
+
+
     async def perform_action(self, event_type, agent_id, *args, **kwargs):
-        # Determine the action to perform based on the event_typeYou're likely
-        async with self.org_lock:
-            # Do a final check so that fired agents can sneak in an action
-            print(f"\n Agent {agent_id} is about to perform an action {event_type}.")
-            if agent_id in self.agents and self.agents[agent_id].terminated:
-                return f"Agent {self.agents[agent_id].ai_name} is terminated and cannot perform actions."
-
-            if event_type == 'get_staff':
-                return self.get_staff(agent_id)
-
-            elif event_type == 'hire_staff':
-                # Perform the 'hire_staff' action and return the result
-                name, role, goals, budget, supervisor_id = args
-                goals_list = self.convert_string_to_list(goals)
-                res = await self.hire_staff(name, role, goals_list, budget, supervisor_id)
-                return res
-
-            elif event_type == 'fire_staff':
-                # Perform the 'fire_staff' action and return the result
-                ai_id = args[0]
-                res = await self.fire_staff(ai_id)
-                return res
-
-            elif event_type == 'message_agent':
-                # Perform the 'message_staff' action and return the result
-                sender_id, receiver_id, message = args
-                return await self.message_agent(sender_id, receiver_id, message)
-            
-            elif event_type == 'receive_message':
-                # Get pending messages 
-                agent_id = args[0]
-                return await self.receive_message(agent_id)
-            
-            elif event_type == "get_conversation_history":
-                sender_id, receiver_id = args
-                return await self.message_center.generate_conversation_prompt(sender_id, receiver_id)
-            
-            elif event_type == "get_inbox":
-                agent_id = args[0]
-                return await self.message_center.get_inbox(agent_id)
-
-            elif event_type == "respond_to_message":
-                message_id, response, sender_id = args
-                return await self.respond_to_message(sender_id, message_id, response)
-
-            elif event_type == 'calculate_operating_cost_of_agent':
-                # Perform the 'calculate_operating_cost_of_agent' action and return the result
-                ai_id = args[0]
-                res =  await self.calculate_operating_cost_of_agent(ai_id)
-                #print(f" Agent {ai_id} response to calculating operating cost: {res}")
-                return res
-            
-            elif event_type == 'update_agent_running_cost':
-                # Perform the 'calculate_operating_cost_of_agent' action and return the result
-                ai_id, running_cost= args
-                res = await self.update_agent_running_cost(ai_id, running_cost)
-                #print(f" Agent {ai_id} response to updating running cost: {res}")
-                return res
-            
-            elif event_type == 'update_agent_budget':
-                ai_id, running_cost = args
-                res = await self.update_agent_budget(ai_id, running_cost)
-                #print(f" Agent {ai_id} response to updating budget: {res}")
-                return res
-
-            elif event_type == 'update_agent_status':
-                ai_id, status = args
-                res = await self.update_agent_status(ai_id, status)
-                #print(f" Agent {ai_id} response to updating status: {res}")
-                return res
-            
-            elif event_type == 'build_status_update':
-                ai_id = args[0]
-                res = await self.build_status_update(ai_id)
-                return res
+        # Hiring and firing reshape the organization and need exclusive access.
+        if event_type in STRUCTURAL_ACTIONS:
+            async with self.org_lock.write():
+                return await self._perform_action(event_type, agent_id, *args, **kwargs)
+
+        async with self.org_lock.read():
+            # Read-only actions run side by side
+            if event_type in READ_ONLY_ACTIONS:
+                return await self._perform_action(event_type, agent_id, *args, **kwargs)
+
+            # All other actions are serialized per agent
+            async with self.get_agent_lock(agent_id):
+                return await self._perform_action(event_type, agent_id, *args, **kwargs)
+
+
+    async def _perform_action(self, event_type, agent_id, *args, **kwargs):
+        # Determine the action to perform based on the event_type
+        # Do a final check so that fired agents can sneak in an action
+        print(f"\n Agent {agent_id} is about to perform an action {event_type}.")
+        if agent_id in self.agents and self.agents[agent_id].terminated:
+            return f"Agent {self.agents[agent_id].ai_name} is terminated and cannot perform actions."
+
+        if event_type == 'get_staff':
+            return await self.get_staff(agent_id)
+
+        elif event_type == 'hire_staff':
+            # Perform the 'hire_staff' action and return the result
+            name, role, goals, budget, supervisor_id = args
+            goals_list = self.convert_string_to_list(goals)
+            res = await self.hire_staff(name, role, goals_list, budget, supervisor_id)
+            return res
+
+        elif event_type == 'fire_staff':
+            # Perform the 'fire_staff' action and return the result
+            ai_id = args[0]
+            res = await self.fire_staff(ai_id)
+            return res
+
+        elif event_type == 'message_agent':
+            # Perform the 'message_staff' action and return the result
+            sender_id, receiver_id, message = args
+            return await self.message_agent(sender_id, receiver_id, message)
+        
+        elif event_type == 'receive_message':
+            # Get pending messages 
+            agent_id = args[0]
+            return await self.receive_message(agent_id)
+        
+        elif event_type == "get_conversation_history":
+            sender_id, receiver_id = args
+            return await self.message_center.generate_conversation_prompt(sender_id, receiver_id)
+        
+        elif event_type == "get_inbox":
+            agent_id = args[0]
+            return await self.message_center.get_inbox(agent_id)
+
+        elif event_type == "respond_to_message":
+            message_id, response, sender_id = args
+            return await self.respond_to_message(sender_id, message_id, response)
+
+        elif event_type == 'calculate_operating_cost_of_agent':
+            # Perform the 'calculate_operating_cost_of_agent' action and return the result
+            ai_id = args[0]
+            res =  await self.calculate_operating_cost_of_agent(ai_id)
+            #print(f" Agent {ai_id} response to calculating operating cost: {res}")
+            return res
+        
+        elif event_type == 'update_agent_running_cost':
+            # Perform the 'calculate_operating_cost_of_agent' action and return the result
+            ai_id, running_cost= args
+            res = await self.update_agent_running_cost(ai_id, running_cost)
+            #print(f" Agent {ai_id} response to updating running cost: {res}")
+            return res
+        
+        elif event_type == 'update_agent_budget':
+            ai_id, running_cost = args
+            res = await self.update_agent_budget(ai_id, running_cost)
+            #print(f" Agent {ai_id} response to updating budget: {res}")
+            return res
+
+        elif event_type == 'update_agent_status':
+            ai_id, status = args
+            res = await self.update_agent_status(ai_id, status)
+            #print(f" Agent {ai_id} response to updating status: {res}")
+            return res
+        
+        elif event_type == 'build_status_update':
+            ai_id = args[0]
+            res = await self.build_status_update(ai_id)
+            return res
 
-            else:
-                # Raise an error if the event_type is not recognized
-                raise ValueError(f"Unknown event type: {event_type}")
-            
+        elif event_type == 'cycle_tick':
+            ai_id = args[0]
+            return await self.cycle_tick(ai_id)
+
+        else:
+            # Raise an error if the event_type is not recognized
+            raise ValueError(f"Unknown event type: {event_type}")
+        
     
     @classmethod
     def create(cls, name, goal, initial_budget):
@@ -308,6 +393,8 @@ class Organization(metaclass=Singleton):
     async def start_agent_loop(self, agent):
         # Register agent in running agents (handy for cleanup)
         await self.register_agent(agent)
+        # Book the LLM calls of this task on the agent
+        current_agent_id.set(agent.ai_id)
         await agent.start_interaction_loop(self.termination_event)
         # await agent.start_test_loop(self.termination_event)
 
@@ -317,6 +404,12 @@ class Organization(metaclass=Singleton):
 
     
     async def start_all_agent_loops(self):
+        if cfg.org_agent_processes > 0:
+            if fork_available():
+                await self.start_agent_workers(cfg.org_agent_processes)
+                return
+            logger.warn("ORG_AGENT_PROCESSES needs the fork start method, running the agents in this process")
+
         # Create tasks for each agent loop
         tasks = [self.start_agent_loop(agent) for agent in self.agents.values()]
         
@@ -327,6 +420,20 @@ class Organization(metaclass=Singleton):
         await asyncio.gather(*tasks)
 
     
+    async def start_agent_workers(self, n_processes):
+        """
+            Runs the agent loops in worker processes, this process performs their events
+        """
+        self.agent_workers = AgentWorkerPool(self, n_processes)
+        self.agent_workers.start()
+        for agent_id in list(self.agents):
+            self.agent_workers.start_agent(agent_id)
+        try:
+            await self.start_event_processing_loop()
+        finally:
+            await self.agent_workers.stop()
+
+
     async def start(self):
         await self.start_all_agent_loops()
     
@@ -349,7 +456,10 @@ class Organization(metaclass=Singleton):
         new_employee_id = new_employee.ai_id  # Retrieve the ai_id of the new employee
         res = await self.a_add_staff(supervisor_id, new_employee_id, budget)
         # Start the interection loop of the newly hired agent
-        asyncio.create_task(self.start_agent_loop(new_employee))
+        if self.agent_workers is not None:
+            self.agent_workers.start_agent(new_employee_id)
+        else:
+            asyncio.create_task(self.start_agent_loop(new_employee))
         return res
     
 
@@ -371,26 +481,24 @@ class Organization(metaclass=Singleton):
             
             # Terminate the agent loop
             agent.terminated = True
+            if self.agent_workers is not None:
+                self.agent_workers.terminate_agent(agent_id)
             
             # Remove the agent from the supervisor's staff list if applicable
             if not agent.founder:
-                supervisor_id = await self.get_supervisor_id(agent_id)
-                # Check if supervisor_id is in supervisor_to_staff and remove the agent_id from the staff list
-                if supervisor_id in self.supervisor_to_staff and agent_id in self.supervisor_to_staff[supervisor_id]:
-                    self.supervisor_to_staff[supervisor_id].remove(agent_id)
-
-                    # Remove the supervisor's entry from the dictionary if they have no more staff
-                    if not self.supervisor_to_staff[supervisor_id]:
-                        del self.supervisor_to_staff[supervisor_id]
+                self.org_tree.remove(agent_id)
 
             # Remove pending messages, running costs, budgets, and statuses
             if agent_id in self.agent_running_costs:
                 del self.agent_running_costs[agent_id]
+            self.agent_charged_costs.pop(agent_id, None)
             if agent_id in self.agent_budgets:
                 del self.agent_budgets[agent_id]
             if agent_id in self.agent_statuses:
                 del self.agent_statuses[agent_id]
 
+            self.agent_locks.pop(agent_id, None)
+
             # Remove agent events from the event queue
             await self.event_queue.filter_queue(lambda event: event.agent.ai_id != agent_id)
             #self.free_agent_ids.append(agent_id)
@@ -406,11 +514,8 @@ class Organization(metaclass=Singleton):
         if skip_update_yaml:
             return
 
-        if supervisor_id not in self.supervisor_to_staff:
-            self.supervisor_to_staff[supervisor_id] = []
-        
         # Set the supervisor
-        self.supervisor_to_staff[supervisor_id].append(new_employee_id)
+        self.org_tree.add(supervisor_id, new_employee_id)
 
         # Initialize the new agent's status
         self.agent_statuses[new_employee_id] = f"agent is on its way on joining the company"
@@ -419,7 +524,7 @@ class Organization(metaclass=Singleton):
         self.agent_budgets[new_employee_id] = budget
 
         # Initialize the agent running costs
-        self.agent_running_costs[new_employee_id] = 100
+        self.agent_running_costs[new_employee_id] = 0
         
         return f"Successfully added employee with Agent_id: {new_employee_id} to supervisor with Agent_id: {supervisor_id}\n"
     
@@ -428,11 +533,8 @@ class Organization(metaclass=Singleton):
         if skip_update_yaml:
             return
 
-        if supervisor_id not in self.supervisor_to_staff:
-            self.supervisor_to_staff[supervisor_id] = []
-        
         # Set the supervisor
-        self.supervisor_to_staff[supervisor_id].append(new_employee_id)
+        self.org_tree.add(supervisor_id, new_employee_id)
 
         # Initialize the new agent's status 
         self.agent_statuses[new_employee_id] = f"agent is on its way on joining the company"
@@ -441,7 +543,7 @@ class Organization(metaclass=Singleton):
         self.agent_budgets[new_employee_id] = budget
 
         # Initialize the agent running costs
-        self.agent_running_costs[new_employee_id] = 100
+        self.agent_running_costs[new_employee_id] = 0
         
         return f"Successfully added employee with Agent_id: {new_employee_id} to supervisor with Agent_id: {supervisor_id}\n"
 
@@ -510,15 +612,7 @@ class Organization(metaclass=Singleton):
 
         agent_workspace_directory = f"{self.org_dir_path}/agents/{agent_id}_{name}_workspace"
 
-        command_registry = CommandRegistry()
-
-        enabled_command_catergories = [
-            x for x in COMMAND_CATEGORIES if x not in cfg.disabled_command_categories
-        ]
-
-        for command_catergory in enabled_command_catergories:
-            command_registry.import_commands(command_catergory)
-
+        command_registry = build_command_registry()
 
         agent_cfg = AIConfig(
             ai_name=name,
@@ -552,14 +646,7 @@ class Organization(metaclass=Singleton):
 
         agent_workspace_directory = f"{self.org_dir_path}/agents/{agent_id}_{name}_workspace"
 
-        command_registry = CommandRegistry()
-
-        enabled_command_catergories = [
-            x for x in COMMAND_CATEGORIES if x not in cfg.disabled_command_categories
-        ]
-
-        for command_catergory in enabled_command_catergories:
-            command_registry.import_commands(command_catergory)
+        command_registry = build_command_registry()
 
         agent_cfg = AIConfig(
             ai_name=name,
@@ -688,23 +775,11 @@ class Organization(metaclass=Singleton):
         # The YAML file will be updated after this method is completed
 
 
-    @update_yaml_after_async
-    async def calculate_operating_cost_of_agent(self, agent_id, cost_per_step=100):
-        try:
-            return await asyncio.wait_for(self._recursive_calculate_operating_cost(agent_id, cost_per_step=100), timeout=10)
-        except asyncio.TimeoutError:
-            return 'Error: Recursive calculate operating cost timed out'
-
-    async def _recursive_calculate_operating_cost(self, agent_id, cost_per_step=100):
-        # Base cost for the agent
-        agent_running_cost = cost_per_step
-        # Add the operating cost of each employee under this agent
-        for employee_id in self.supervisor_to_staff.get(agent_id, []):
-            try:
-                agent_running_cost += await asyncio.wait_for(self._recursive_calculate_operating_cost(employee_id, cost_per_step), timeout=10)
-            except asyncio.TimeoutError:
-                return 'Error: Recursive calculate operating cost timed out'
-        return agent_running_cost
+    async def calculate_operating_cost_of_agent(self, agent_id):
+        """
+            Returns the LLM cost of the last step of the agent and all staff below it
+        """
+        return self.org_tree.subtree_cost(agent_id)
 
 
     @update_yaml_after_async
@@ -718,6 +793,42 @@ class Organization(metaclass=Singleton):
         self.agent_budgets[agent_id] -= running_cost
 
 
+    @update_yaml_after_async
+    async def cycle_tick(self, agent_id) -> CycleTick:
+        """
+            Charges the agent for one step and collects its inbox and status.
+            A step costs the real LLM spend of the agent since its previous tick.
+            Staff pay for their own steps, so their spend is only included in the
+            reported operating cost of the agent, not charged to it again.
+            Replaces sending calculate_operating_cost_of_agent, update_agent_running_cost,
+            update_agent_budget, get_inbox and build_status_update separately.
+
+            Args:
+                agent_id (int): The agent that starts a new cycle
+
+            Returns:
+                CycleTick: The operating cost, step cost, remaining budget, inbox and status of the agent
+        """
+        # The agent's real LLM spend since its previous tick
+        spent = ApiManager().get_agent_cost(agent_id)
+        step_cost = spent - self.agent_charged_costs.get(agent_id, 0.0)
+        self.agent_charged_costs[agent_id] = spent
+        self.org_tree.set_cost(agent_id, step_cost)
+
+        self.agent_budgets[agent_id] -= step_cost
+
+        operating_cost = await self.calculate_operating_cost_of_agent(agent_id)
+        self.agent_running_costs[agent_id] = operating_cost
+
+        return CycleTick(
+            operating_cost=operating_cost,
+            step_cost=step_cost,
+            budget=self.agent_budgets[agent_id],
+            inbox=await self.message_center.get_inbox(agent_id),
+            status=await self.build_status_update(agent_id),
+        )
+
+
     async def get_agent_status(self, agent_id):
         return self.agent_statuses.get(agent_id, "Unknown")
 
@@ -733,11 +844,12 @@ class Organization(metaclass=Singleton):
         # Build organization info context for agent
         running_costs = await self.calculate_operating_cost_of_agent(agent_id)
         budget = self.agent_budgets[agent_id]
-        runaway_time = self.agent_budgets[agent_id] / running_costs
         status += f"\nYOUR BUDGET:\n"
-        status += f"Your current budget is ${budget}\n"
-        status += f"Your current running costs are ${running_costs} per step\n"
-        status += f"With your current running costs you will run out in {runaway_time} steps.\n"
+        status += f"Your current budget is ${budget:.3f}\n"
+        status += f"Your current running costs are ${running_costs:.3f} per step\n"
+        if running_costs > 0:
+            runaway_time = int(budget / running_costs)
+            status += f"With your current running costs you will run out in {runaway_time} steps.\n"
         status += f"A simple task will typically take 15 steps."
         return status
 
@@ -747,7 +859,7 @@ class Organization(metaclass=Singleton):
     
 
     async def has_staff(self, agent_id):
-        return bool(self.supervisor_to_staff.get(agent_id, []))
+        return bool(self.org_tree.get_staff_ids(agent_id))
 
 
     # Asynchornous function that returns supervisode ID.
@@ -761,10 +873,7 @@ class Organization(metaclass=Singleton):
             Returns:
                 int: The supervisor ID of the agent with the given agent_id
         """
-        for supervisor, staff in self.supervisor_to_staff.items():
-            if agent_id in staff:
-                return supervisor
-        return None
+        return self.org_tree.get_supervisor_id(agent_id)
     
 
     # Check if check_id is a supervisor of agent_id
@@ -800,10 +909,7 @@ class Organization(metaclass=Singleton):
     
 
     def _get_supervisor_id(self, agent_id):
-        for supervisor, staff in self.supervisor_to_staff.items():
-            if agent_id in staff:
-                return supervisor
-        return None
+        return self.org_tree.get_supervisor_id(agent_id)
 
 
     # Asynchronous method to get the supervisor's id and name
@@ -821,7 +927,7 @@ class Organization(metaclass=Singleton):
 
 
     async def get_staff(self, agent_id):
-        staff_ids = self.supervisor_to_staff.get(agent_id, [])
+        staff_ids = self.org_tree.get_staff_ids(agent_id)
         staff_list = [self.agents[staff_id] for staff_id in staff_ids]
         return staff_list
 
@@ -832,7 +938,7 @@ class Organization(metaclass=Singleton):
         if supervisor_id is None:
             agents = self.agents.values()
         else:
-            agents = [self.agents[employee_id] for employee_id in self.supervisor_to_staff.get(supervisor_id, [])]
+            agents = [self.agents[employee_id] for employee_id in self.org_tree.get_staff_ids(supervisor_id)]
         for agent in agents:
             hierarchy += (
                 f"{indent}Agent_Id:{agent.ai_id}. Agent_Name: {agent.ai_name}, Supervisor: {self.agents[supervisor_id].ai_name if supervisor_id is not None else 'None'}\n"
@@ -907,12 +1013,7 @@ class Organization(metaclass=Singleton):
 
         agent_directories = glob.glob(os.path.join(organization_directory, "agents", "*"))
 
-        command_registry = CommandRegistry()
-        enabled_command_catergories = [
-            x for x in COMMAND_CATEGORIES if x not in cfg.disabled_command_categories
-        ]
-        for command_catergory in enabled_command_catergories:
-            command_registry.import_commands(command_catergory)
+        command_registry = build_command_registry()
 
 
         # Create all the agents
@@ -941,61 +1042,42 @@ class Organization(metaclass=Singleton):
         return org
         
 
-    async def a_save(self):
-        # Create a dictionary to store the relevant attributes
-        data = {
+    def to_dict(self):
+        """
+            Returns a snapshot of the organization state that is persisted to YAML
+        """
+        return {
             'name': self.name,
             'goal': self.goal,
             'initial_budget': self.initial_budget,
-            'agent_budgets': self.agent_budgets,
-            'agent_running_costs': self.agent_running_costs,
-            'agent_statuses': self.agent_statuses,
-            'supervisor_to_staff': self.supervisor_to_staff,
+            'agent_budgets': dict(self.agent_budgets),
+            'agent_running_costs': dict(self.agent_running_costs),
+            'agent_statuses': dict(self.agent_statuses),
+            'supervisor_to_staff': {supervisor_id: list(staff_ids) for supervisor_id, staff_ids in self.supervisor_to_staff.items()},
             'id_count': self.id_count,
-            
         }
 
+
+    async def a_save(self):
         await self.message_center.a_save()
 
         print("saving organization at " , self.org_yaml_path)
-        # Ensure the directory exists
-        if not os.path.exists(self.org_dir_path):
-            os.makedirs(self.org_dir_path)
-
-        # Write the data to the YAML file
-        with open(self.org_yaml_path, 'w') as file:
-            yaml.dump(data, file)
+        await self.persistence.flush(force=True)
 
 
     def save(self):
-        # Create a dictionary to store the relevant attributes
-        self.message_center.a_save()
-
-        data = {
-            'name': self.name,
-            'goal': self.goal,
-            'initial_budget': self.initial_budget,
-            'agent_budgets': self.agent_budgets,
-            'agent_running_costs': self.agent_running_costs,
-            'agent_statuses': self.agent_statuses,
-            'supervisor_to_staff': self.supervisor_to_staff,
-            'id_count': self.id_count,
-        }
+        self.message_center.save()
 
         print("saving organization at " , self.org_yaml_path)
-        # Ensure the directory exists
-        if not os.path.exists(self.org_dir_path):
-            os.makedirs(self.org_dir_path)
-
-        # Write the data to the YAML file
-        with open(self.org_yaml_path, 'w') as file:
-            yaml.dump(data, file)
+        write_file_atomic(self.org_yaml_path, yaml.dump(self.to_dict()))
 
 
     async def shutdown(self):
             # Signal all agents to stop generating new events
             for agent in self.agents.values():
                 agent.terminated = True
+            if self.agent_workers is not None:
+                self.agent_workers.terminate_all()
             print("Signaled all agents to stop generating new events.")
 
             # Wait until all agents have succesfully terminated 
@@ -1012,6 +1094,11 @@ class Organization(metaclass=Singleton):
                 await event.process()
 
             print("all remaining events have been processed")
+
+            await self.persistence.flush()
+            await self.message_center.a_save()
+            print("flushed organization state to disk")
+            await iopenai.close_sessions()
          
             # Now it is safe to stop the event processing loop
             print("setting termination event")
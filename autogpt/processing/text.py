@@ -3,12 +3,16 @@ from math import ceil
 from typing import Optional
 
 import spacy
-import tiktoken
 
 from autogpt.config import Config
 from autogpt.llm.base import ChatSequence
 from autogpt.llm.providers.openai import OPEN_AI_MODELS
-from autogpt.llm.utils import count_string_tokens, create_chat_completion
+from autogpt.llm.utils import (
+    count_string_tokens,
+    count_string_tokens_batch,
+    create_chat_completion,
+    get_encoding,
+)
 from autogpt.logs import logger
 from autogpt.utils import batch
 
@@ -46,7 +50,7 @@ def chunk_content(
 
     max_chunk_length = max_chunk_length or _max_chunk_length(for_model)
 
-    tokenizer = tiktoken.encoding_for_model(for_model)
+    tokenizer = get_encoding(for_model)
 
     tokenized_text = tokenizer.encode(content)
     total_length = len(tokenized_text)
@@ -172,6 +176,8 @@ def split_text(
     nlp.add_pipe("sentencizer")
     doc = nlp(text)
     sentences = [sentence.text.strip() for sentence in doc.sents]
+    # Count all sentences in one go instead of encoding them one by one
+    sentence_lengths = count_string_tokens_batch(sentences, for_model)
 
     current_chunk: list[str] = []
     current_chunk_length = 0
@@ -181,7 +187,7 @@ def split_text(
     i = 0
     while i < len(sentences):
         sentence = sentences[i]
-        sentence_length = count_string_tokens(sentence, for_model)
+        sentence_length = sentence_lengths[i]
         expected_chunk_length = current_chunk_length + 1 + sentence_length
 
         if (
@@ -220,10 +226,9 @@ def split_text(
             current_chunk_length += sentence_length
 
         else:  # sentence longer than maximum length -> chop up and try again
-            sentences[i : i + 1] = [
-                chunk
-                for chunk, _ in chunk_content(sentence, for_model, target_chunk_length)
-            ]
+            chunks = list(chunk_content(sentence, for_model, target_chunk_length))
+            sentences[i : i + 1] = [chunk for chunk, _ in chunks]
+            sentence_lengths[i : i + 1] = [chunk_length for _, chunk_length in chunks]
             continue
 
         i += 1
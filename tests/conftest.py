@@ -11,6 +11,7 @@ from autogpt.commands.command import CommandRegistry
 from autogpt.config.ai_config import AIConfig
 from autogpt.config.config import Config
 from autogpt.llm.api_manager import ApiManager
+from autogpt.llm.response_cache import ResponseCache
 from autogpt.logs import TypingConsoleHandler
 from autogpt.memory.vector import get_memory
 from autogpt.prompts.prompt import DEFAULT_TRIGGERING_PROMPT
@@ -70,6 +71,17 @@ def api_manager() -> ApiManager:
     return ApiManager()
 
 
+@pytest.fixture(autouse=True)
+def response_cache(tmp_path: Path):
+    # Give every test an empty response cache, so responses aren't reused across tests
+    if ResponseCache in ResponseCache._instances:
+        del ResponseCache._instances[ResponseCache]
+    cache = ResponseCache(str(tmp_path / "llm_response_cache.sqlite3"), 1000)
+    yield cache
+    cache.close()
+    del ResponseCache._instances[ResponseCache]
+
+
 @pytest.fixture(autouse=True)
 def patch_emit(monkeypatch):
     # convert plain_output to a boolean
@@ -21,7 +21,7 @@ def test_json_memory_init_without_backing_file(config: Config, workspace: Worksp
     assert not index_file.exists()
     JSONFileMemory(config)
     assert index_file.exists()
-    assert index_file.read_text() == "[]"
+    assert index_file.read_text() == ""
 
 
 def test_json_memory_init_with_backing_empty_file(config: Config, workspace: Workspace):
@@ -31,7 +31,7 @@ def test_json_memory_init_with_backing_empty_file(config: Config, workspace: Wor
     assert index_file.exists()
     JSONFileMemory(config)
     assert index_file.exists()
-    assert index_file.read_text() == "[]"
+    assert index_file.read_text() == ""
 
 
 def test_json_memory_init_with_backing_file(config: Config, workspace: Workspace):
@@ -46,7 +46,7 @@ def test_json_memory_init_with_backing_file(config: Config, workspace: Workspace
     assert index_file.exists()
     JSONFileMemory(config)
     assert index_file.exists()
-    assert index_file.read_text() == "[]"
+    assert index_file.read_text() == ""
 
 
 def test_json_memory_add(config: Config, memory_item: MemoryItem):
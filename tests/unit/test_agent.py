@@ -1,3 +1,4 @@
+import asyncio
 from unittest.mock import MagicMock
 
 import pytest
@@ -43,5 +44,34 @@ def test_agent_initialization(agent: Agent):
     assert agent.triggering_prompt == "Triggering prompt"
 
 
+def test_a_new_prefetch_cancels_the_previous_one(mocker):
+    async def prefetch(*args):
+        await asyncio.sleep(10)
+
+    mocker.patch("autogpt.agent.agent.prefetch_command", side_effect=prefetch)
+    # Bypass __init__, streaming only needs the name and the command registry
+    agent = Agent.__new__(Agent)
+    agent.ai_name = "Test AI"
+    agent.command_registry = MagicMock()
+    agent.prefetch_task = None
+    reply = '{"command": {"name": "read_file", "args": {"filename": "a.txt"}}}'
+
+    async def run():
+        on_delta, _ = agent._make_stream_handler()
+        on_delta(reply)
+        first = agent.prefetch_task
+        on_delta, _ = agent._make_stream_handler()
+        on_delta(reply)
+        second = agent.prefetch_task
+        agent._cancel_prefetch()
+        await asyncio.wait([first, second])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is not second
+    assert first.cancelled() and second.cancelled()
+    assert agent.prefetch_task is None
+
+
 # More test methods can be added for specific agent interactions
 # For example, mocking chat_with_ai and testing the agent's interaction loop
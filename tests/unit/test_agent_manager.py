@@ -1,7 +1,8 @@
+import asyncio
+
 import pytest
 
 from autogpt.agent.agent_manager import AgentManager
-from autogpt.llm.chat import create_chat_completion
 
 
 @pytest.fixture
@@ -28,37 +29,35 @@ def model():
 
 @pytest.fixture(autouse=True)
 def mock_create_chat_completion(mocker):
-    mock_create_chat_completion = mocker.patch(
-        "autogpt.agent.agent_manager.create_chat_completion",
-        wraps=create_chat_completion,
+    return mocker.patch(
+        "autogpt.agent.agent_manager.acreate_chat_completion",
+        return_value="irrelevant",
     )
-    mock_create_chat_completion.return_value = "irrelevant"
-    return mock_create_chat_completion
 
 
 def test_create_agent(agent_manager: AgentManager, task, prompt, model):
-    key, agent_reply = agent_manager.create_agent(task, prompt, model)
+    key, agent_reply = asyncio.run(agent_manager.create_agent(task, prompt, model))
     assert isinstance(key, int)
     assert isinstance(agent_reply, str)
     assert key in agent_manager.agents
 
 
 def test_message_agent(agent_manager: AgentManager, task, prompt, model):
-    key, _ = agent_manager.create_agent(task, prompt, model)
+    key, _ = asyncio.run(agent_manager.create_agent(task, prompt, model))
     user_message = "Please translate 'Good morning' to French."
-    agent_reply = agent_manager.message_agent(key, user_message)
+    agent_reply = asyncio.run(agent_manager.message_agent(key, user_message))
     assert isinstance(agent_reply, str)
 
 
 def test_list_agents(agent_manager: AgentManager, task, prompt, model):
-    key, _ = agent_manager.create_agent(task, prompt, model)
+    key, _ = asyncio.run(agent_manager.create_agent(task, prompt, model))
     agents_list = agent_manager.list_agents()
     assert isinstance(agents_list, list)
     assert (key, task) in agents_list
 
 
 def test_delete_agent(agent_manager: AgentManager, task, prompt, model):
-    key, _ = agent_manager.create_agent(task, prompt, model)
+    key, _ = asyncio.run(agent_manager.create_agent(task, prompt, model))
     success = agent_manager.delete_agent(key)
     assert success
     assert key not in agent_manager.agents
@@ -1,3 +1,5 @@
+import yaml
+
 from autogpt.config.ai_config import AIConfig
 
 """
@@ -72,3 +74,58 @@ def test_ai_config_file_is_empty(workspace):
     assert ai_config.api_budget == 0.0
     assert ai_config.prompt_generator is None
     assert ai_config.command_registry is None
+
+
+def test_full_prompt_is_cached(tmp_path, mocker):
+    """Test that the prompt is only rebuilt when one of its inputs changes."""
+    from autogpt.prompts import prompt
+
+    build = mocker.spy(prompt, "build_default_prompt_generator")
+    ai_config = AIConfig(
+        ai_name="McFamished",
+        ai_role="A hungry AI",
+        ai_goals=["Make a sandwich"],
+        file_path=str(tmp_path),
+    )
+
+    first = ai_config.construct_full_prompt()
+    assert ai_config.construct_full_prompt() is first
+    assert build.call_count == 1
+
+    ai_config.ai_goals.append("Eat the sandwich")
+    second = ai_config.construct_full_prompt()
+    assert "2. Eat the sandwich" in second
+    assert ai_config.cached_prompt == second
+    assert build.call_count == 2
+    assert ai_config.construct_full_prompt() is second
+    assert build.call_count == 2
+
+    ai_config.save()
+    saved = yaml.safe_load((tmp_path / "agent.yaml").read_text())
+    assert not [key for key in saved if key.startswith("_")]
+
+
+def test_post_prompt_hooks_see_the_agent(tmp_path, mocker):
+    """Test that plugins' post_prompt hooks run after the generator is filled in."""
+    from autogpt.config import Config
+
+    seen = {}
+
+    def post_prompt(prompt_generator):
+        seen["goals"] = list(prompt_generator.goals)
+        seen["name"] = prompt_generator.name
+        return prompt_generator
+
+    plugin = mocker.Mock()
+    plugin.can_handle_post_prompt.return_value = True
+    plugin.post_prompt.side_effect = post_prompt
+    mocker.patch.object(Config(), "plugins", [plugin])
+
+    ai_config = AIConfig(
+        ai_name="McFamished",
+        ai_role="A hungry AI",
+        ai_goals=["Make a sandwich"],
+        file_path=str(tmp_path),
+    )
+    ai_config.construct_full_prompt()
+    assert seen == {"goals": ["Make a sandwich"], "name": "McFamished"}
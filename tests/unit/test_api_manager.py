@@ -1,8 +1,11 @@
+import asyncio
 from unittest.mock import patch
 
 import pytest
+from openai.openai_object import OpenAIObject
 
-from autogpt.llm.api_manager import COSTS, ApiManager
+from autogpt.llm.api_manager import COSTS, ApiManager, current_agent_id
+from autogpt.llm.providers.openai import meter_api
 
 api_manager = ApiManager()
 
@@ -66,3 +69,44 @@ class TestApiManager:
 
             assert result[0]["id"] == "gpt-3.5-turbo"
             assert api_manager.models[0]["id"] == "gpt-3.5-turbo"
+
+    @staticmethod
+    def test_usage_is_booked_per_agent_and_model():
+        """Test if costs are split by the agent making the call and by model."""
+
+        async def agent_loop(agent_id):
+            current_agent_id.set(agent_id)
+            await asyncio.sleep(0)
+            api_manager.update_cost(10, 20, "gpt-3.5-turbo")
+
+        async def run():
+            await asyncio.gather(agent_loop(1), agent_loop(2), agent_loop(1))
+
+        asyncio.run(run())
+        api_manager.update_cost(5, 0, "text-embedding-ada-002-v2")
+
+        assert api_manager.get_agent_usage(1).prompt_tokens == 20
+        assert api_manager.get_agent_cost(2) == (10 * 0.002 + 20 * 0.002) / 1000
+        assert api_manager.get_agent_usage(None).prompt_tokens == 5
+        assert api_manager.get_model_usage("gpt-3.5-turbo").completion_tokens == 60
+        assert api_manager.get_model_usage("text-embedding-ada-002").prompt_tokens == 5
+        assert api_manager.get_total_prompt_tokens() == 35
+
+    @staticmethod
+    def test_async_calls_are_metered():
+        """Test if the usage of async API calls is recorded."""
+        response = OpenAIObject.construct_from(
+            {
+                "model": "gpt-3.5-turbo",
+                "usage": {"prompt_tokens": 7, "completion_tokens": 3},
+            }
+        )
+
+        @meter_api
+        async def call():
+            return response
+
+        current_agent_id.set(None)
+        assert asyncio.run(call()) is response
+        assert api_manager.get_total_prompt_tokens() == 7
+        assert api_manager.get_total_completion_tokens() == 3
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from autogpt.llm.providers import openai as iopenai
+from autogpt.memory.vector import utils
+from autogpt.memory.vector.utils import EmbeddingBatcher, get_embedding
+
+
+class FakeResponse:
+    def __init__(self, inputs, **kwargs):
+        self.data = [
+            {"index": i, "embedding": [float(len(text))]}
+            for i, text in reversed(list(enumerate(inputs)))
+        ]
+
+
+@pytest.fixture
+def batcher(mocker):
+    mocker.patch.object(
+        utils, "count_string_tokens", side_effect=lambda text, model: len(text)
+    )
+    batcher = EmbeddingBatcher.__new__(EmbeddingBatcher)
+    EmbeddingBatcher.__init__(batcher, window=0.1)
+    EmbeddingBatcher._instances[EmbeddingBatcher] = batcher
+    yield batcher
+    del EmbeddingBatcher._instances[EmbeddingBatcher]
+
+
+def test_concurrent_requests_share_one_call(config, batcher, mocker):
+    mocker.patch.object(config, "embedding_batch_window", 0.1)
+    create_embedding = mocker.patch.object(
+        iopenai, "create_embedding", side_effect=FakeResponse
+    )
+
+    texts = [["a", "bb"], ["ccc"], ["dddd", "eeeee", "ffffff"]]
+    results = [None] * len(texts)
+
+    def embed(i):
+        results[i] = get_embedding(texts[i], use_cache=False)
+
+    threads = [threading.Thread(target=embed, args=(i,)) for i in range(len(texts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert create_embedding.call_count == 1
+    for inputs, embeddings in zip(texts, results):
+        assert embeddings == [[float(len(text))] for text in inputs]
+
+
+def test_batches_are_packed_within_limits(batcher, mocker):
+    mocker.patch.object(utils, "MAX_BATCH_INPUTS", 2)
+    create_embedding = mocker.patch.object(
+        iopenai, "create_embedding", side_effect=FakeResponse
+    )
+
+    assert batcher.embed(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert [c.args[0] for c in create_embedding.call_args_list] == [
+        ["a", "bb"],
+        ["ccc"],
+    ]
+
+
+def test_batches_are_sized_by_token_count(batcher, mocker):
+    mocker.patch.object(utils, "MAX_BATCH_TOKENS", 4)
+    # CJK text has far more tokens than a character based estimate allows for
+    utils.count_string_tokens.side_effect = lambda text, model: 2 * len(text)
+    create_embedding = mocker.patch.object(
+        iopenai, "create_embedding", side_effect=FakeResponse
+    )
+
+    batcher.embed(["日本", "語"])
+    assert [c.args[0] for c in create_embedding.call_args_list] == [
+        ["日本"],
+        ["語"],
+    ]
+
+
+def test_errors_reach_every_caller(batcher, mocker):
+    mocker.patch.object(
+        iopenai, "create_embedding", side_effect=RuntimeError("API down")
+    )
+    with pytest.raises(RuntimeError, match="API down"):
+        batcher.embed(["a"])
+
+
+def test_packing_errors_reach_every_caller(batcher, mocker):
+    utils.count_string_tokens.side_effect = ValueError("unknown model")
+    create_embedding = mocker.patch.object(
+        iopenai, "create_embedding", side_effect=FakeResponse
+    )
+    with pytest.raises(ValueError, match="unknown model"):
+        batcher.submit(["a"]).result(timeout=5)
+    create_embedding.assert_not_called()
+
+    # The batcher keeps serving requests
+    utils.count_string_tokens.side_effect = lambda text, model: len(text)
+    assert batcher.embed(["bb"]) == [[2.0]]
@@ -0,0 +1,60 @@
+import numpy as np
+
+from autogpt.memory.vector.embedding_matrix import EmbeddingMatrix
+from autogpt.memory.vector.memory_item import MemoryItem
+
+
+def make_memory(name, e_summary, e_chunks):
+    return MemoryItem(
+        raw_content=name,
+        summary=name,
+        chunks=[f"{name} {i}" for i in range(len(e_chunks))],
+        chunk_summaries=[f"{name} {i}" for i in range(len(e_chunks))],
+        e_summary=np.array(e_summary, np.float32),
+        e_chunks=[np.array(e, np.float32) for e in e_chunks],
+        metadata={},
+    )
+
+
+def test_top_k_ranks_memories_by_best_row():
+    a = make_memory("a", [1, 0, 0], [[0, 1, 0], [0.2, 0, 0.9]])
+    b = make_memory("b", [0, 0, 1], [[0.5, 0.5, 0]])
+    c = make_memory("c", [0.1, 0.9, 0], [[0, 0, 1]])
+    matrix = EmbeddingMatrix([a, b, c])
+
+    assert matrix.n_rows == 7
+    assert matrix.row_memory[: matrix.n_rows].tolist() == [0, 0, 0, 1, 1, 2, 2]
+    assert matrix.row_chunk[: matrix.n_rows].tolist() == [-1, 0, 1, -1, 0, -1, 0]
+
+    top = matrix.top_k("query", [0, 0, 1], 2)
+    assert [r.memory_item for r in top] == [b, c]
+    assert top[0].summary_relevance_score == 1.0
+    assert top[1].chunk_relevance_scores == [1.0]
+
+    # The result matches scoring every memory one by one
+    relevances = matrix.score_all("query", [0, 1, 0])
+    assert [r.score for r in relevances] == [
+        r.score for r in (m.relevance_for("query", [0, 1, 0]) for m in (a, b, c))
+    ]
+
+
+def test_remove_keeps_rows_of_other_memories():
+    memories = [make_memory(str(i), [i, 0], [[0, i]] * i) for i in range(1, 4)]
+    matrix = EmbeddingMatrix(memories)
+
+    matrix.remove(memories[1])
+    assert matrix.items == [memories[0], memories[2]]
+    assert matrix.rows.tolist() == [[1, 0], [0, 1], [3, 0], [0, 3], [0, 3], [0, 3]]
+    assert matrix.row_memory[: matrix.n_rows].tolist() == [0, 0, 1, 1, 1, 1]
+    assert [r.memory_item for r in matrix.top_k("query", [0, 1], 2)] == [
+        memories[2],
+        memories[0],
+    ]
+
+
+def test_matrix_grows_past_initial_capacity():
+    matrix = EmbeddingMatrix()
+    for i in range(300):
+        matrix.add(make_memory(str(i), [i, 1], [[1, i]]))
+    assert matrix.n_rows == 600
+    assert matrix.top_k("query", [1, 0], 1)[0].memory_item is matrix.items[-1]
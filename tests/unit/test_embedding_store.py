@@ -0,0 +1,142 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from autogpt.memory.vector import JSONFileMemory
+from autogpt.memory.vector.embedding_matrix import EmbeddingMatrix
+from autogpt.memory.vector.embedding_store import (
+    EmbeddingStore,
+    QuantizedEmbeddingStore,
+)
+
+from .test_json_file_memory import make_memory
+
+
+def test_rows_are_memory_mapped(tmp_path):
+    store = EmbeddingStore(tmp_path / "embeddings.f32")
+    assert len(store) == 0
+    assert store.append(np.ones((2, 4))) == 0
+    assert store.append(np.full((3, 4), 2.0)) == 2
+
+    rows = store.rows
+    assert isinstance(rows, np.memmap)
+    assert rows.dtype == np.float32
+    assert rows.tolist() == [[1.0] * 4] * 2 + [[2.0] * 4] * 3
+
+    with pytest.raises(ValueError):
+        store.append(np.ones((1, 3)))
+
+
+def test_rewrite_keeps_mapped_rows_valid(tmp_path):
+    store = EmbeddingStore(tmp_path / "embeddings.f16", "float16", dimensions=2)
+    store.append(np.arange(8).reshape(4, 2))
+    old_rows = store.rows
+
+    store.rewrite(store.rows[:1])
+    assert len(store) == 1
+    assert old_rows.tolist() == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert store.rows.tolist() == [[0, 1]]
+
+
+def test_appends_reuse_the_mapping(tmp_path, mocker):
+    store = EmbeddingStore(tmp_path / "embeddings.f32")
+    matrix = EmbeddingMatrix(store=store)
+    items = [make_memory(i, n_chunks=1, dimensions=4) for i in range(2000)]
+    for item in items:
+        matrix.add(item)
+
+    # The file is only mapped anew when it doubles in size, and the embeddings
+    # are moved to the new mapping so the old ones are released
+    assert store.generation <= 6
+    rows = store.rows
+    assert len(rows) == 4000
+    assert all(np.shares_memory(item.e_summary, rows) for item in items)
+
+    stat = mocker.spy(Path, "stat")
+    assert len(store) == 4000 and len(matrix.rows) == 4000
+    assert stat.call_count == 0
+
+
+def test_memories_are_loaded_without_copying(config, tmp_path):
+    path = tmp_path / "agent_memory.json"
+    memory = JSONFileMemory(config, path)
+    items = [make_memory(i) for i in range(3)]
+    for item in items:
+        memory.add(item)
+
+    loaded = JSONFileMemory(config, path)
+    rows = loaded.store.rows
+    assert isinstance(rows, np.memmap)
+    for i, item in enumerate(loaded):
+        assert np.shares_memory(item.e_summary, rows)
+        np.testing.assert_array_equal(item.e_chunks, items[i].e_chunks)
+
+    # The embeddings of the remaining memories follow the rewritten store
+    loaded.discard(loaded.memories[0])
+    assert np.shares_memory(loaded.memories[0].e_summary, loaded.store.rows)
+    np.testing.assert_array_equal(loaded.memories[1].e_summary, items[2].e_summary)
+
+
+def test_float16_store(config, tmp_path, mocker):
+    mocker.patch.object(config, "memory_embedding_dtype", "float16")
+    path = tmp_path / "agent_memory.json"
+    memory = JSONFileMemory(config, path)
+    item = make_memory(0)
+    memory.add(item)
+    assert memory.embeddings_path.name == "agent_memory.embeddings.f16"
+
+    # A memory saved as float16 is loaded as float16, whatever the config says
+    mocker.patch.object(config, "memory_embedding_dtype", "float32")
+    loaded = JSONFileMemory(config, path)
+    assert loaded.store.dtype == np.float16
+    np.testing.assert_allclose(loaded.memories[0].e_summary, item.e_summary, atol=1e-2)
+
+
+def test_quantized_scores_approximate_dot_products(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = rng.standard_normal((100, 64)).astype(np.float32)
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    query = rows[0]
+
+    quantized = QuantizedEmbeddingStore(tmp_path / "embeddings.i8")
+    quantized.append(rows[:60])
+    quantized.append(rows[60:])
+    assert quantized.codes.rows.dtype == np.int8
+    np.testing.assert_allclose(quantized.scores(query), rows @ query, atol=0.01)
+
+    quantized.delete(10, 20)
+    assert len(quantized) == 90
+    np.testing.assert_allclose(
+        quantized.scores(query), np.delete(rows, np.s_[10:20], 0) @ query, atol=0.01
+    )
+
+
+def test_quantized_search_reranks_with_full_precision(config, tmp_path, mocker):
+    mocker.patch.multiple(
+        config, memory_embedding_quantization="int8", memory_rerank_factor=3
+    )
+    path = tmp_path / "agent_memory.json"
+    memory = JSONFileMemory(config, path)
+    items = [make_memory(i, dimensions=32) for i in range(40)]
+    for item in items:
+        memory.add(item)
+
+    exact = EmbeddingMatrix(items)
+    query = items[7].e_chunks[1]
+    expected = exact.top_k("query", query, 5)
+    found = memory.embedding_matrix.top_k("query", query, 5)
+    assert [r.memory_item.raw_content for r in found] == [
+        r.memory_item.raw_content for r in expected
+    ]
+    # Scores of the results are exact
+    assert [r.score for r in found] == pytest.approx([r.score for r in expected])
+
+    # Codes are saved with the memory, and rebuilt when they are missing
+    assert len(JSONFileMemory(config, path).quantized) == 120
+    memory.quantized.clear()
+    loaded = JSONFileMemory(config, path)
+    assert len(loaded.quantized) == 120
+    assert loaded.embedding_matrix.top_k("query", query, 1)[
+        0
+    ].memory_item.raw_content == ("memory 7")
@@ -0,0 +1,38 @@
+import asyncio
+import threading
+
+from autogpt.app import execute_command
+from autogpt.commands.command import Command, CommandRegistry
+
+
+def test_sync_commands_run_off_the_event_loop():
+    registry = CommandRegistry()
+    registry.register(
+        Command(
+            name="whoami",
+            description="Returns the thread the command ran in",
+            method=lambda agent: threading.current_thread().name,
+        )
+    )
+
+    result = asyncio.run(execute_command(registry, "whoami", {}, agent=None))
+    assert result.startswith("command")
+
+
+def test_async_commands_are_awaited():
+    async def greet(name, agent):
+        return f"hello {name}"
+
+    registry = CommandRegistry()
+    registry.register(Command(name="greet", description="Greets", method=greet))
+    disabled = Command(name="off", description="Off", method=greet, enabled=False)
+    registry.register(disabled)
+
+    assert (
+        asyncio.run(execute_command(registry, "greet", {"name": "bob"}, agent=None))
+        == "hello bob"
+    )
+    assert (
+        asyncio.run(execute_command(registry, "off", {"name": "bob"}, agent=None))
+        == "Command 'off' is disabled"
+    )
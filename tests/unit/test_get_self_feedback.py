@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 
 from pytest_mock import MockerFixture
@@ -5,7 +6,6 @@ from pytest_mock import MockerFixture
 from autogpt.agent.agent import Agent
 from autogpt.config import AIConfig
 from autogpt.config.config import Config
-from autogpt.llm.chat import create_chat_completion
 from autogpt.log_cycle.log_cycle import LogCycleHandler
 
 
@@ -17,7 +17,7 @@ def test_get_self_feedback(config: Config, mocker: MockerFixture):
         "thoughts": "Sample thoughts.",
     }
 
-    # Define a fake response for the create_chat_completion function
+    # Define a fake response for the acreate_chat_completion function
     fake_response = (
         "The AI Agent has demonstrated a reasonable thought process, but there is room for improvement. "
         "For example, the reasoning could be elaborated to better justify the plan, and the plan itself "
@@ -25,11 +25,10 @@ def test_get_self_feedback(config: Config, mocker: MockerFixture):
         "on its core role and prioritize thoughts that align with that role."
     )
 
-    # Mock the create_chat_completion function
-    mock_create_chat_completion = mocker.patch(
-        "autogpt.agent.agent.create_chat_completion", wraps=create_chat_completion
+    # Mock the acreate_chat_completion function
+    mocker.patch(
+        "autogpt.agent.agent.acreate_chat_completion", return_value=fake_response
     )
-    mock_create_chat_completion.return_value = fake_response
 
     # Create a MagicMock object to replace the Agent instance
     agent_mock = mocker.MagicMock(spec=Agent)
@@ -48,10 +47,12 @@ def test_get_self_feedback(config: Config, mocker: MockerFixture):
     agent_mock.cycle_count = 0
 
     # Call the get_self_feedback method
-    feedback = Agent.get_self_feedback(
-        agent_mock,
-        thoughts,
-        "gpt-3.5-turbo",
+    feedback = asyncio.run(
+        Agent.get_self_feedback(
+            agent_mock,
+            thoughts,
+            "gpt-3.5-turbo",
+        )
     )
 
     # Check if the response is a non-empty string
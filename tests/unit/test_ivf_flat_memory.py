@@ -0,0 +1,186 @@
+import numpy as np
+import pytest
+
+from autogpt.memory.vector import MemoryItem
+from autogpt.memory.vector.embedding_matrix import EmbeddingMatrix
+from autogpt.memory.vector.providers import ivf_flat
+from autogpt.memory.vector.providers.ivf_flat import IVFFlatMemory
+
+DIMENSIONS = 32
+
+
+def make_memory(i, embeddings):
+    return MemoryItem(
+        raw_content=f"memory {i}",
+        summary=f"memory {i}",
+        chunks=[f"memory {i}"],
+        chunk_summaries=[f"memory {i}"],
+        e_summary=embeddings[0],
+        e_chunks=[embeddings[1]],
+        metadata={},
+    )
+
+
+@pytest.fixture
+def memories():
+    rng = np.random.default_rng(1)
+    centers = rng.standard_normal((20, DIMENSIONS))
+    embeddings = centers[rng.integers(0, 20, (1000, 2))] + 0.3 * rng.standard_normal(
+        (1000, 2, DIMENSIONS)
+    )
+    embeddings /= np.linalg.norm(embeddings, axis=2, keepdims=True)
+    return [make_memory(i, e.astype(np.float32)) for i, e in enumerate(embeddings)]
+
+
+@pytest.fixture
+def memory(config, tmp_path, mocker):
+    mocker.patch.object(ivf_flat, "MIN_TRAIN_ROWS", 256)
+    mocker.patch.multiple(config, memory_ivf_lists=0, memory_ivf_nprobe=4)
+    return IVFFlatMemory(config, tmp_path / "agent_memory.json")
+
+
+def search(memory, mocker, e_query, k):
+    mocker.patch.object(ivf_flat, "get_embedding", return_value=e_query)
+    return [r.memory_item for r in memory.get_relevant("query", k)]
+
+
+def test_search_recall(memory, memories, mocker):
+    for m in memories:
+        memory.add(m)
+    assert memory.centroids is not None
+    assert memory.get_stats() == (1000, 1000)
+
+    exact = EmbeddingMatrix(memories)
+    recalled = 0
+    for query in memories[:50]:
+        e_query = query.e_chunks[0]
+        expected = [r.memory_item for r in exact.top_k("query", e_query, 5)]
+        found = search(memory, mocker, e_query, 5)
+        assert found[0] is expected[0]
+        recalled += len(set(map(id, found)) & set(map(id, expected)))
+    assert recalled / 250 > 0.9
+
+
+def test_deleted_memories_are_not_found(memory, memories, mocker):
+    for m in memories[:400]:
+        memory.add(m)
+    memory.discard(memories[0])
+    assert memories[0] not in memory
+    assert len(memory) == 399
+    assert memories[0] not in search(memory, mocker, memories[0].e_summary, 5)
+
+    # Removing most memories compacts the index
+    for m in memories[1:300]:
+        memory.discard(m)
+    assert len(memory) == 100
+    assert memory.n_rows < 800
+    assert memory.n_rows - memory.n_dead_rows == 200
+    assert search(memory, mocker, memories[350].e_summary, 1) == [memories[350]]
+
+
+def test_index_is_persisted(memory, memories, config, mocker):
+    for m in memories[:300]:
+        memory.add(m)
+    memory.discard(memories[5])
+
+    loaded = IVFFlatMemory(config, memory.index_path.with_name("agent_memory.json"))
+    assert len(loaded) == 299
+    assert loaded.n_dead_rows == 2
+    assert [m.raw_content for m in loaded] == [m.raw_content for m in memory]
+    np.testing.assert_array_equal(loaded.centroids, memory.centroids)
+
+    found = search(loaded, mocker, memories[42].e_summary, 1)
+    assert found[0].raw_content == "memory 42"
+    np.testing.assert_allclose(found[0].e_chunks[0], memories[42].e_chunks[0])
+
+
+def test_state_is_saved_only_when_the_index_changes(memory, memories, config, mocker):
+    savez = mocker.spy(ivf_flat.np, "savez")
+    for m in memories[:100]:
+        memory.add(m)
+    memory.discard(memories[3])
+    # Only the first memory, which sets the dimensions, rewrites the .npz file
+    assert savez.call_count == 1
+
+    loaded = IVFFlatMemory(config, memory.index_path.with_name("agent_memory.json"))
+    assert len(loaded) == 99
+    assert [m.raw_content for m in loaded] == [m.raw_content for m in memory]
+
+    for m in memories[100:200]:
+        memory.add(m)
+    assert memory.centroids is not None and savez.call_count == 2
+    loaded = IVFFlatMemory(config, memory.index_path.with_name("agent_memory.json"))
+    assert len(loaded) == 199
+    np.testing.assert_array_equal(loaded.row_list, memory.row_list[: memory.n_rows])
+
+
+def test_incomplete_memory_is_dropped(memory, memories, config):
+    for m in memories[:3]:
+        memory.add(m)
+    # A memory whose embeddings and rows were written, but not all of its data
+    with memory.vectors_path.open("ab") as f:
+        memories[3].e_summary.tofile(f)
+    with memory.rows_path.open("ab") as f:
+        np.array([6, 3, -1], np.int32).tofile(f)
+    with memory.file_path.open("ab") as f:
+        f.write(b'{"raw_content": "mem')
+
+    path = memory.index_path.with_name("agent_memory.json")
+    loaded = IVFFlatMemory(config, path)
+    assert [m.raw_content for m in loaded] == ["memory 0", "memory 1", "memory 2"]
+    loaded.add(memories[4])
+    assert [m.raw_content for m in IVFFlatMemory(config, path)][-1] == "memory 4"
+
+
+def test_unreadable_index_is_rebuilt(memory, memories, config):
+    for m in memories[:3]:
+        memory.add(m)
+    memory.index_path.write_bytes(b"not an index")
+
+    path = memory.index_path.with_name("agent_memory.json")
+    loaded = IVFFlatMemory(config, path)
+    assert [m.raw_content for m in loaded] == ["memory 0", "memory 1", "memory 2"]
+    backup = memory.index_path.with_name(memory.index_path.name + ".bak")
+    assert backup.read_bytes() == b"not an index"
+    # New memories are not appended to the damaged files
+    loaded.add(memories[4])
+    assert len(IVFFlatMemory(config, path)) == 4
+
+
+def test_missing_index_is_rebuilt(memory, memories, config, mocker):
+    for m in memories[:300]:
+        memory.add(m)
+    memory.discard(memories[5])
+    memory.index_path.unlink()
+
+    loaded = IVFFlatMemory(config, memory.index_path.with_name("agent_memory.json"))
+    assert len(loaded) == 299
+    assert [m.raw_content for m in loaded] == [m.raw_content for m in memory]
+    assert loaded.centroids is not None
+
+    found = search(loaded, mocker, memories[42].e_summary, 1)
+    assert found[0].raw_content == "memory 42"
+    np.testing.assert_allclose(found[0].e_chunks[0], memories[42].e_chunks[0])
+
+
+def test_truncated_memory_file_is_recovered(memory, memories, config):
+    for m in memories[:5]:
+        memory.add(m)
+    # The .npz file holds more memories than are left in the memory file
+    memory.save_index()
+    data = memory.file_path.read_bytes()
+    memory.file_path.write_bytes(data[: data.index(b"memory 3")])
+
+    path = memory.index_path.with_name("agent_memory.json")
+    loaded = IVFFlatMemory(config, path)
+    assert [m.raw_content for m in loaded] == ["memory 0", "memory 1", "memory 2"]
+    np.testing.assert_allclose(
+        list(loaded)[2].e_summary, memories[2].e_summary, rtol=1e-6
+    )
+    backup = memory.file_path.with_name(memory.file_path.name + ".bak")
+    assert backup.read_bytes() == data[: data.index(b"memory 3")]
+
+    loaded.add(memories[5])
+    reloaded = IVFFlatMemory(config, path)
+    assert [m.raw_content for m in reloaded][-1] == "memory 5"
+    assert len(reloaded) == 4
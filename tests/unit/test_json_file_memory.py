@@ -0,0 +1,91 @@
+import numpy as np
+import orjson
+
+from autogpt.memory.vector import JSONFileMemory, MemoryItem
+
+
+def make_memory(i, n_chunks=2, dimensions=8):
+    rng = np.random.default_rng(i)
+    return MemoryItem(
+        raw_content=f"memory {i}",
+        summary=f"summary {i}",
+        chunks=[f"chunk {i}.{c}" for c in range(n_chunks)],
+        chunk_summaries=[f"chunk summary {i}.{c}" for c in range(n_chunks)],
+        e_summary=rng.standard_normal(dimensions).astype(np.float32),
+        e_chunks=list(rng.standard_normal((n_chunks, dimensions)).astype(np.float32)),
+        metadata={"source_type": "text_file"},
+    )
+
+
+def assert_same_memory(loaded, memory):
+    assert loaded.raw_content == memory.raw_content
+    assert loaded.chunks == memory.chunks
+    assert loaded.metadata == memory.metadata
+    np.testing.assert_allclose(loaded.e_summary, memory.e_summary, rtol=1e-6)
+    np.testing.assert_allclose(loaded.e_chunks, memory.e_chunks, rtol=1e-6)
+
+
+def test_memories_are_appended_and_loaded(config, tmp_path):
+    path = tmp_path / "agent_memory.json"
+    memory = JSONFileMemory(config, path)
+    items = [make_memory(i, n_chunks=i + 1) for i in range(3)]
+    for item in items[:2]:
+        memory.add(item)
+    size = path.stat().st_size
+    memory.add(items[2])
+
+    # Adding a memory only appends it to the files
+    assert path.read_bytes().count(b"\n") == 3
+    assert path.stat().st_size > size
+    assert len(memory.store) == 9
+
+    loaded = JSONFileMemory(config, path)
+    assert len(loaded) == 3
+    # The capacity the file grew ahead of the memories is dropped
+    assert (tmp_path / "agent_memory.embeddings.f32").stat().st_size == 4 * 8 * 9
+    for loaded_item, item in zip(loaded, items):
+        assert_same_memory(loaded_item, item)
+    assert loaded.get_stats() == (3, 6)
+
+
+def test_discard_and_clear_rewrite_the_files(config, tmp_path):
+    path = tmp_path / "agent_memory.json"
+    memory = JSONFileMemory(config, path)
+    items = [make_memory(i) for i in range(3)]
+    for item in items:
+        memory.add(item)
+
+    memory.discard(items[1])
+    loaded = JSONFileMemory(config, path)
+    assert [m.raw_content for m in loaded] == ["memory 0", "memory 2"]
+    assert_same_memory(loaded.memories[1], items[2])
+
+    loaded.clear()
+    assert len(JSONFileMemory(config, path)) == 0
+
+
+def test_torn_append_is_dropped(config, tmp_path):
+    path = tmp_path / "agent_memory.json"
+    memory = JSONFileMemory(config, path)
+    memory.add(make_memory(0))
+    with path.open("ab") as f:
+        f.write(b'{"raw_content": "memory 1", "embeddings": [24, 3')
+
+    loaded = JSONFileMemory(config, path)
+    assert [m.raw_content for m in loaded] == ["memory 0"]
+    loaded.add(make_memory(1))
+    assert [m.raw_content for m in JSONFileMemory(config, path)] == [
+        "memory 0",
+        "memory 1",
+    ]
+
+
+def test_legacy_memory_file_is_converted(config, tmp_path):
+    path = tmp_path / "agent_memory.json"
+    item = make_memory(0)
+    path.write_bytes(orjson.dumps([item], option=JSONFileMemory.SAVE_OPTIONS))
+
+    loaded = JSONFileMemory(config, path)
+    assert_same_memory(loaded.memories[0], item)
+    assert not path.read_bytes().startswith(b"[")
+    assert len(JSONFileMemory(config, path)) == 1
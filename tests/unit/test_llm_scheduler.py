@@ -0,0 +1,85 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, PropertyMock
+
+from autogpt.llm.base import ChatSequence, Message
+from autogpt.llm.scheduler import LLMScheduler, RequestPriority
+from autogpt.llm.utils import acreate_chat_completion
+
+
+def make_scheduler(requests_per_minute=0, tokens_per_minute=0):
+    scheduler = LLMScheduler.__new__(LLMScheduler)
+    LLMScheduler.__init__(scheduler, requests_per_minute, tokens_per_minute)
+    return scheduler
+
+
+def test_requests_are_dispatched_by_priority():
+    scheduler = make_scheduler(requests_per_minute=600)
+    dispatched = []
+
+    async def request(priority):
+        await scheduler.acquire("gpt-3.5-turbo", 10, priority)
+        dispatched.append(priority)
+
+    async def run():
+        # Use up the burst so every request has to queue
+        scheduler._get_queue("gpt-3.5-turbo").requests.tokens = 0
+        await asyncio.gather(
+            request(RequestPriority.BACKGROUND),
+            request(RequestPriority.EMPLOYEE),
+            request(RequestPriority.FOUNDER),
+            request(RequestPriority.SUPERVISOR),
+        )
+
+    asyncio.run(run())
+    assert dispatched == sorted(RequestPriority)
+
+
+def test_tokens_per_minute_limit():
+    scheduler = make_scheduler(tokens_per_minute=6000)
+
+    async def run():
+        await scheduler.acquire("gpt-4", 6000)
+        start = time.monotonic()
+        await scheduler.acquire("gpt-4", 30)
+        # Other models have their own budget
+        await asyncio.wait_for(scheduler.acquire("gpt-3.5-turbo", 6000), 0.05)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.25
+
+
+def test_pause_holds_back_requests():
+    scheduler = make_scheduler()
+
+    async def run():
+        scheduler.pause("gpt-4", 0.2)
+        start = time.monotonic()
+        await scheduler.acquire("gpt-4", 10)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.15
+
+
+def test_chat_completion_uses_the_callers_token_count(config, mocker):
+    token_length = mocker.patch.object(
+        ChatSequence, "token_length", new_callable=PropertyMock, return_value=5
+    )
+    acquire = mocker.patch.object(LLMScheduler, "acquire", AsyncMock())
+    mocker.patch(
+        "autogpt.llm.utils.iopenai.acreate_chat_completion",
+        return_value=SimpleNamespace(
+            choices=[SimpleNamespace(message={"content": "hello"})]
+        ),
+    )
+    prompt = ChatSequence.for_model("gpt-3.5-turbo", [Message("user", "hi")])
+
+    asyncio.run(
+        acreate_chat_completion(
+            prompt, temperature=0.5, max_tokens=100, prompt_tokens=42
+        )
+    )
+
+    acquire.assert_awaited_once_with("gpt-3.5-turbo", 142, RequestPriority.EMPLOYEE)
+    token_length.assert_not_called()
@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from autogpt.organization.message import MessageCenter
+
+
+@pytest.fixture
+def message_center(tmp_path):
+    if MessageCenter in MessageCenter._instances:
+        del MessageCenter._instances[MessageCenter]
+    organization = SimpleNamespace(
+        org_dir_path=str(tmp_path),
+        name="Org",
+        # Agent 1 supervises agents 2 and 3
+        is_supervisor=lambda supervisor_id, staff_id: asyncio.sleep(
+            0, supervisor_id == 1
+        ),
+    )
+    yield MessageCenter(organization)
+    del MessageCenter._instances[MessageCenter]
+
+
+def send(message_center, *args, **kwargs):
+    asyncio.run(message_center.add_new_message(*args, **kwargs))
+
+
+def test_inbox_is_split_by_priority(message_center):
+    send(message_center, "from staff", 3, 2, False)
+    send(message_center, "from supervisor", 1, 2, True)
+    send(message_center, "to someone else", 1, 3, True)
+
+    supervisor, staff = message_center.get_unresponded_messages_by_priority(2)
+    assert [m.message_id for m in supervisor] == [2]
+    assert [m.message_id for m in staff] == [1]
+    assert asyncio.run(message_center.get_inbox_message_ids(2)) == [2, 1]
+    assert "from supervisor" in message_center.receive_message(2)
+
+    asyncio.run(message_center.respond_to_message(2, "done", 2))
+    new_messages, new_responses = asyncio.run(message_center.get_inbox_messages(2))
+    assert [m.message_id for m in new_messages] == [1]
+    assert new_responses == []
+    assert [
+        m.message_id for m in message_center.get_unresponded_messages_by_receiver(1)
+    ] == [4]
+
+
+def test_fetch_by_sender_and_receiver(message_center):
+    send(message_center, "a", 1, 2, True)
+    send(message_center, "b", 2, 1, False)
+    send(message_center, "c", 1, 3, True)
+
+    assert [m.message_id for m in message_center.fetch_messages_by_sender(1)] == [1, 3]
+    assert [m.message_id for m in message_center.fetch_messages_by_receiver(1)] == [2]
+    assert message_center.fetch_messages_by_receiver(42) == []
+
+
+def test_fetch_conversation_covers_both_directions(message_center):
+    for i in range(5):
+        send(message_center, f"down {i}", 1, 2, True)
+        send(message_center, f"up {i}", 2, 1, False)
+    send(message_center, "unrelated", 1, 3, True)
+
+    conversation = message_center.fetch_conversation(1, 2, last_n=3)
+    assert [m.message_id for m in conversation] == [10, 9, 8]
+    assert message_center.fetch_conversation(1, 2, last_n=0) == []
+
+
+def test_indexes_are_rebuilt_on_load(message_center):
+    send(message_center, "a", 1, 2, True)
+    send(message_center, "b", 3, 2, False)
+    asyncio.run(message_center.respond_to_message(1, "ok", 2))
+
+    fresh = MessageCenter.__new__(MessageCenter)
+    MessageCenter.__init__(fresh, message_center.organization)
+    fresh.load_messages()
+
+    assert asyncio.run(fresh.get_inbox_message_ids(2)) == [2]
+    assert asyncio.run(fresh.get_inbox_message_ids(1)) == [3]
+    assert [m.message_id for m in fresh.fetch_conversation(1, 2, last_n=8)] == [3, 1]
@@ -1,3 +1,5 @@
+import asyncio
+import json
 import math
 import time
 from unittest.mock import MagicMock
@@ -10,6 +12,7 @@ from autogpt.config.config import Config
 from autogpt.llm.base import ChatSequence, Message
 from autogpt.llm.providers.openai import OPEN_AI_CHAT_MODELS
 from autogpt.llm.utils import count_string_tokens
+from autogpt.memory import message_history
 from autogpt.memory.message_history import MessageHistory
 
 
@@ -143,3 +146,122 @@ def test_message_history_batch_summary(mocker, agent):
         + mock_summary_text,
         type=None,
     )
+
+
+def make_cycle(i: int) -> list[Message]:
+    thoughts = dict.fromkeys(
+        ["text", "reasoning", "plan", "criticism", "speak", "status"], f"thought {i}"
+    )
+    reply = json.dumps({"thoughts": thoughts, "command": {"name": "noop", "args": {}}})
+    return [
+        Message("user", f"input {i}"),
+        Message("assistant", reply, "ai_response"),
+        Message("system", f"result {i}", "action_result"),
+    ]
+
+
+def test_recent_cycles_are_scanned_incrementally(mocker):
+    validate = mocker.spy(message_history, "is_string_valid_json")
+    mocker.patch.object(
+        message_history, "count_message_tokens", side_effect=lambda msgs, model: 10
+    )
+    history = MessageHistory(MagicMock())
+    cycles = [make_cycle(i) for i in range(3)]
+    for cycle in cycles:
+        for msg in cycle:
+            history.append(msg)
+
+    assert len(history.cycles()) == 3
+    messages, tokens = history.recent_cycles(25, "gpt-3.5-turbo")
+    assert messages == cycles[1] + cycles[2]
+    assert tokens == 20
+
+    # An AI response without a result yet is not a cycle
+    next_cycle = make_cycle(3)
+    history.append(next_cycle[0])
+    history.append(next_cycle[1])
+    assert len(history.cycles()) == 3
+    history.append(next_cycle[2])
+    assert len(history.cycles()) == 4
+    assert [cycle for cycle in history.per_cycle()][-1][2].content == "result 3"
+
+    # Every AI response is validated once, token lengths are cached
+    assert validate.call_count == 4
+    history.recent_cycles(1000, "gpt-3.5-turbo")
+    assert message_history.count_message_tokens.call_count == 4
+
+
+def test_summary_is_produced_in_the_background(mocker):
+    mocker.patch.object(message_history, "count_string_tokens", return_value=10)
+    summarize = mocker.patch.object(
+        message_history, "acreate_chat_completion", return_value="I did things"
+    )
+    history = MessageHistory(MagicMock())
+    cycles = [make_cycle(i) for i in range(3)]
+    for cycle in cycles:
+        for msg in cycle:
+            history.append(msg)
+
+    async def run():
+        summary_message, trimmed = history.trim_messages(cycles[2])
+        # The agent does not wait for the new summary
+        assert summary_message.content.endswith("I was created")
+        assert trimmed == cycles[0][1:] + cycles[1]
+        await history._summary_task
+
+        # Nothing new was trimmed, the last completed summary is returned
+        summary_message, trimmed = history.trim_messages(cycles[2])
+        assert trimmed == []
+        return summary_message
+
+    summary_message = asyncio.run(run())
+    assert summary_message.content.endswith("I did things")
+    assert summarize.call_count == 1
+    # User messages are not summarized, assistant messages lose their thoughts
+    prompt = summarize.call_args.args[0][0].content
+    assert "input 1" not in prompt and "thought 1" not in prompt
+    assert "result 0" in prompt and "result 1" in prompt
+
+
+def test_failed_summary_keeps_only_unsummarized_events(mocker):
+    # Every event fills a batch on its own
+    mocker.patch.object(
+        message_history,
+        "count_string_tokens",
+        side_effect=lambda text, model: 2000 if text.startswith("Message") else 10,
+    )
+    mocker.patch.object(message_history, "SUMMARY_RETRY_DELAY", 0)
+    summarize = mocker.patch.object(
+        message_history,
+        "acreate_chat_completion",
+        side_effect=["I did things"] + [Exception("API error")] * 3,
+    )
+    history = MessageHistory(MagicMock())
+    events = make_cycle(0)
+    history._pending_summary_events = list(events)
+
+    asyncio.run(history._summarize_pending())
+
+    # The failed batch is retried before giving up
+    assert summarize.call_count == 1 + message_history.SUMMARY_ATTEMPTS
+    assert history.summary == "I did things"
+    # The batch already in the summary is not queued again
+    assert history._pending_summary_events == events[2:]
+
+
+def test_failed_summary_is_retried(mocker):
+    mocker.patch.object(message_history, "count_string_tokens", return_value=10)
+    mocker.patch.object(message_history, "SUMMARY_RETRY_DELAY", 0)
+    summarize = mocker.patch.object(
+        message_history,
+        "acreate_chat_completion",
+        side_effect=[Exception("API error"), "I did things"],
+    )
+    history = MessageHistory(MagicMock())
+    history._pending_summary_events = make_cycle(0)
+
+    asyncio.run(history._summarize_pending())
+
+    assert summarize.call_count == 2
+    assert history.summary == "I did things"
+    assert history._pending_summary_events == []
@@ -0,0 +1,125 @@
+import asyncio
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from autogpt.organization.message import Message, MessageCenter
+from autogpt.organization.message_log import MessageLog
+
+
+def make_message(message_id, **kwargs):
+    fields = dict(
+        message=f"message {message_id}",
+        message_id=message_id,
+        sender_id=1,
+        receiver_id=2,
+        from_supervisor=True,
+        timestamp=datetime(2023, 6, 15, 19, 22, message_id),
+    )
+    fields.update(kwargs)
+    return Message(**fields)
+
+
+@pytest.fixture
+def message_center(tmp_path):
+    if MessageCenter in MessageCenter._instances:
+        del MessageCenter._instances[MessageCenter]
+    organization = SimpleNamespace(org_dir_path=str(tmp_path), name="Org")
+    yield MessageCenter(organization)
+    del MessageCenter._instances[MessageCenter]
+
+
+def reload(message_center):
+    fresh = MessageCenter.__new__(MessageCenter)
+    MessageCenter.__init__(fresh, message_center.organization)
+    fresh.load_messages()
+    return fresh
+
+
+def test_messages_are_journaled(message_center):
+    asyncio.run(message_center.add_new_message("hello", 1, 2, True))
+    asyncio.run(message_center.add_new_message("hi", 3, 2, False))
+
+    journal = message_center.message_log.journal_path
+    with open(journal) as f:
+        assert len(f.readlines()) == 2
+    assert not os.path.exists(message_center.message_yaml_path)
+
+    loaded = reload(message_center)
+    assert loaded.max_id == 2
+    assert loaded.messages[1].to_dict() == message_center.messages[1].to_dict()
+    assert isinstance(loaded.messages[1].timestamp, datetime)
+
+
+def test_responses_replay_on_top_of_snapshot(message_center):
+    asyncio.run(message_center.add_new_message("hello", 1, 2, True))
+    message_center.save()
+    assert os.path.exists(message_center.message_yaml_path)
+    assert not os.path.exists(message_center.message_log.journal_path)
+
+    message_center.organization.is_supervisor = lambda *_: asyncio.sleep(0, True)
+    asyncio.run(message_center.respond_to_message(1, "hi back", 2))
+
+    loaded = reload(message_center)
+    assert loaded.max_id == 2
+    assert loaded.messages[1].responded
+    assert loaded.messages[1].response_id == 2
+    assert loaded.messages[2].response_to_id == 1
+
+
+def test_compaction_is_triggered(tmp_path):
+    messages = {}
+    log = MessageLog(
+        str(tmp_path / "Org_messages.yaml"),
+        lambda: {"max_id": len(messages), "messages": dict(messages)},
+        compact_every=3,
+    )
+
+    async def run():
+        for i in range(1, 5):
+            messages[i] = make_message(i).to_dict()
+            log.add(messages[i])
+        await log._compaction
+
+    asyncio.run(run())
+    assert log.records_since_compaction == 0
+    assert not os.path.exists(log.compacting_path)
+    assert not os.path.exists(log.journal_path)
+    max_id, loaded = log.load()
+    assert max_id == 4
+    assert loaded == messages
+
+
+def test_interrupted_compaction_is_replayed(tmp_path):
+    log = MessageLog(str(tmp_path / "Org_messages.yaml"), lambda: {})
+    log.add(make_message(1).to_dict())
+    log.update(1, read=True)
+    log._close_journal()
+    os.replace(log.journal_path, log.compacting_path)
+    log.add(make_message(2).to_dict())
+
+    max_id, loaded = log.load()
+    assert max_id == 2
+    assert loaded[1]["read"]
+    assert not loaded[2]["read"]
+
+
+def test_message_flags_are_packed():
+    message = make_message(1, from_supervisor=False, read=True)
+    assert not hasattr(message, "__dict__")
+    assert (message.from_supervisor, message.responded, message.read) == (
+        False,
+        False,
+        True,
+    )
+
+    message.responded = True
+    message.read = False
+    assert (message.from_supervisor, message.responded, message.read) == (
+        False,
+        True,
+        False,
+    )
+    assert Message.from_dict(message.to_dict()).to_dict() == message.to_dict()
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+import pytest
+
+from autogpt.llm.providers import openai as iopenai
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "model": "gpt-3.5-turbo",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "hi"},
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """A minimal OpenAI-compatible chat completions endpoint"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.client_ports.append(self.client_address[1])
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.client_ports = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(openai, "api_base", f"http://127.0.0.1:{server.server_port}/v1")
+    asyncio.run(iopenai.close_sessions())
+    yield server
+    asyncio.run(iopenai.close_sessions())
+    server.shutdown()
+    server.server_close()
+
+
+def test_sync_calls_reuse_connections(stand_in_server):
+    messages = [{"role": "user", "content": "hello"}]
+    for _ in range(3):
+        response = iopenai.create_chat_completion(
+            messages, model="gpt-3.5-turbo", api_key="sk-test"
+        )
+        assert response.choices[0].message["content"] == "hi"
+
+    # Calls from other threads share the same pool
+    thread = threading.Thread(
+        target=iopenai.create_chat_completion,
+        args=(messages,),
+        kwargs={"model": "gpt-3.5-turbo", "api_key": "sk-test"},
+    )
+    thread.start()
+    thread.join()
+
+    assert len(stand_in_server.client_ports) == 4
+    assert len(set(stand_in_server.client_ports)) == 1
+
+
+def test_async_calls_reuse_connections(stand_in_server):
+    async def run():
+        for _ in range(3):
+            response = await iopenai.acreate_chat_completion(
+                [{"role": "user", "content": "hello"}],
+                model="gpt-3.5-turbo",
+                api_key="sk-test",
+            )
+            assert response.choices[0].message["content"] == "hi"
+        session = iopenai.get_async_session()
+        await iopenai.close_sessions()
+        return session
+
+    session = asyncio.run(run())
+    assert session.closed
+    assert len(stand_in_server.client_ports) == 3
+    assert len(set(stand_in_server.client_ports)) == 1
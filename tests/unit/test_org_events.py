@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from autogpt.organization.org_events import Event
+
+
+class FakeOrganization:
+    def __init__(self):
+        self.performed = []
+
+    async def perform_action(self, event_type, agent_id, *args, **kwargs):
+        self.performed.append(event_type)
+        if event_type == "explode":
+            raise ValueError("boom")
+        return f"{event_type} by {agent_id}: {args}"
+
+
+def make_agent():
+    return SimpleNamespace(ai_id=1, organization=FakeOrganization())
+
+
+def test_event_resolves_future_with_result():
+    async def run():
+        event = Event("id", make_agent(), "get_inbox", 1)
+        await event.process()
+        return await event.future
+
+    assert asyncio.run(run()) == "get_inbox by 1: (1,)"
+
+
+def test_event_propagates_exception():
+    async def run():
+        event = Event("id", make_agent(), "explode")
+        await event.process()
+        return await event.future
+
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(run())
+
+
+def test_cancelled_event_is_not_performed():
+    async def run():
+        agent = make_agent()
+        event = Event("id", agent, "fire_staff", 2)
+        event.cancel()
+        await event.process()
+        return agent.organization.performed, event.future.cancelled()
+
+    performed, cancelled = asyncio.run(run())
+    assert performed == []
+    assert cancelled
@@ -0,0 +1,48 @@
+import asyncio
+
+from autogpt.organization.org_locks import ReadWriteLock
+
+
+def test_readers_share_the_lock():
+    async def run():
+        lock = ReadWriteLock()
+        active, peak = 0, 0
+
+        async def reader():
+            nonlocal active, peak
+            async with lock.read():
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(reader() for _ in range(5)))
+        return peak
+
+    assert asyncio.run(run()) == 5
+
+
+def test_writer_is_exclusive_and_not_starved():
+    async def run():
+        lock = ReadWriteLock()
+        log = []
+
+        async def reader(i, delay):
+            await asyncio.sleep(delay)
+            async with lock.read():
+                log.append(f"r{i}+")
+                await asyncio.sleep(0.02)
+                log.append(f"r{i}-")
+
+        async def writer():
+            await asyncio.sleep(0.005)
+            async with lock.write():
+                log.append("w+")
+                await asyncio.sleep(0.01)
+                log.append("w-")
+
+        # r1 arrives after the writer started waiting, so it has to wait for it
+        await asyncio.gather(reader(0, 0), writer(), reader(1, 0.01))
+        return log
+
+    assert asyncio.run(run()) == ["r0+", "r0-", "w+", "w-", "r1+", "r1-"]
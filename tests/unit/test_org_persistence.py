@@ -0,0 +1,64 @@
+import asyncio
+
+import yaml
+
+from autogpt.organization.org_persistence import WriteBehindYaml, write_file_atomic
+
+
+def test_write_file_atomic(tmp_path):
+    path = tmp_path / "org" / "state.yaml"
+    write_file_atomic(str(path), "a: 1\n")
+    write_file_atomic(str(path), "a: 2\n")
+
+    assert path.read_text() == "a: 2\n"
+    assert [p.name for p in path.parent.iterdir()] == ["state.yaml"]
+
+
+def test_changes_are_coalesced(tmp_path):
+    path = tmp_path / "state.yaml"
+    state = {"count": 0}
+    snapshots = []
+
+    def snapshot():
+        snapshots.append(dict(state))
+        return dict(state)
+
+    async def run():
+        writer = WriteBehindYaml(str(path), snapshot, interval=0.05)
+        for _ in range(10):
+            state["count"] += 1
+            writer.mark_dirty()
+        assert not path.exists()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert snapshots == [{"count": 10}]
+    assert yaml.safe_load(path.read_text()) == {"count": 10}
+
+
+def test_max_pending_flushes_early(tmp_path):
+    path = tmp_path / "state.yaml"
+
+    async def run():
+        writer = WriteBehindYaml(
+            str(path), lambda: {"a": 1}, interval=60, max_pending=3
+        )
+        for _ in range(3):
+            writer.mark_dirty()
+        await asyncio.sleep(0.1)
+        return path.exists()
+
+    assert asyncio.run(run())
+
+
+def test_explicit_flush(tmp_path):
+    path = tmp_path / "state.yaml"
+
+    async def run():
+        writer = WriteBehindYaml(str(path), lambda: {"a": 1}, interval=60)
+        writer.mark_dirty()
+        await writer.flush()
+        return writer.pending
+
+    assert asyncio.run(run()) == 0
+    assert yaml.safe_load(path.read_text()) == {"a": 1}
@@ -0,0 +1,47 @@
+from autogpt.organization.org_tree import OrgTree
+
+
+def test_tree_is_built_from_supervisor_to_staff():
+    tree = OrgTree({1: [2, 3], 2: [4]})
+
+    assert tree.get_supervisor_id(4) == 2
+    assert tree.get_supervisor_id(1) is None
+    assert list(tree.ancestors(4)) == [2, 1]
+    assert [tree.subtree_size(i) for i in (1, 2, 3, 4)] == [4, 2, 1, 1]
+    # Agents that are not part of the hierarchy only count themselves
+    assert tree.subtree_size(42) == 1
+
+
+def test_hiring_and_firing_update_subtree_sizes():
+    tree = OrgTree()
+    tree.add(1, 2)
+    tree.add(2, 3)
+    tree.add(2, 4)
+    assert tree.children == {1: [2], 2: [3, 4]}
+    assert tree.subtree_size(1) == 4
+
+    tree.remove(3)
+    tree.remove(4)
+    assert tree.children == {1: [2]}
+    assert tree.get_supervisor_id(3) is None
+    assert tree.subtree_size(1) == 2
+    assert tree.subtree_size(2) == 1
+
+    # Sizes after incremental updates match a tree built from scratch
+    tree.add(2, 5)
+    assert tree.subtree_sizes == OrgTree(tree.children).subtree_sizes
+
+
+def test_costs_roll_up_to_supervisors():
+    tree = OrgTree({1: [2], 2: [3]})
+    tree.set_cost(3, 0.25)
+    tree.set_cost(2, 0.5)
+    tree.set_cost(3, 0.125)
+    assert [tree.subtree_cost(i) for i in (1, 2, 3)] == [0.625, 0.625, 0.125]
+
+    tree.remove(3)
+    assert tree.subtree_cost(1) == 0.5
+    tree.add(1, 4)
+    tree.set_cost(4, 1.0)
+    assert tree.subtree_cost(1) == 1.5
+    assert tree.subtree_cost(2) == 0.5
@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from autogpt.agent.agent import Agent
+from autogpt.organization.org_workers import (
+    AgentWorkerPool,
+    _Worker,
+    fork_available,
+)
+
+
+class FakeAgent:
+    """Sends its actions one by one and reports the results in a last action"""
+
+    send_event = Agent.send_event
+
+    def __init__(self, ai_id, organization, actions):
+        self.ai_id = ai_id
+        self.ai_name = f"Agent {ai_id}"
+        self.organization = organization
+        self.actions = actions
+        self.terminated = False
+
+    async def start_interaction_loop(self, termination_event):
+        results = []
+        for action in self.actions:
+            future = await self.send_event(action, self.ai_id)
+            try:
+                results.append(await self.organization.get_event_result(future))
+            except ValueError as e:
+                results.append(f"error: {e}")
+        future = await self.send_event("report", results, os.getpid())
+        await self.organization.get_event_result(future)
+        await self.organization.notify_termination(self)
+
+
+class FakeOrganization:
+    def __init__(self):
+        self.agents = {}
+        self.running_agents = []
+        self.event_queue = asyncio.Queue()
+        self.reports = []
+
+    async def perform_action(self, action, agent_id, *args):
+        if action == "fail":
+            raise ValueError(f"agent {agent_id} failed")
+        if action == "report":
+            self.reports.append((agent_id, *args))
+        return f"{action} by {agent_id}"
+
+    async def process_events(self):
+        while True:
+            event = await self.event_queue.get()
+            await event.process()
+
+
+async def wait_until(condition, timeout=20):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.mark.skipif(not fork_available(), reason="worker processes need fork")
+def test_agents_run_in_worker_processes():
+    async def run():
+        organization = FakeOrganization()
+        for agent_id in (1, 2, 3):
+            organization.agents[agent_id] = FakeAgent(agent_id, organization, ["echo", "fail"])
+        processing = asyncio.create_task(organization.process_events())
+
+        pool = AgentWorkerPool(organization, 2)
+        pool.start()
+        try:
+            for agent_id in organization.agents:
+                pool.start_agent(agent_id)
+            assert len(organization.running_agents) == 3
+            await wait_until(lambda: not organization.running_agents)
+        finally:
+            await pool.stop()
+            processing.cancel()
+        return organization.reports
+
+    reports = asyncio.run(run())
+
+    assert sorted(agent_id for agent_id, _, _ in reports) == [1, 2, 3]
+    for agent_id, results, pid in reports:
+        assert results == [f"echo by {agent_id}", f"error: agent {agent_id} failed"]
+        # The agents ran in the workers, two of them in the same one
+        assert pid != os.getpid()
+    assert len({pid for _, _, pid in reports}) == 2
+
+
+def test_agents_of_an_exited_worker_are_stopped():
+    async def run():
+        organization = FakeOrganization()
+        organization.agents[1] = FakeAgent(1, organization, [])
+        pool = AgentWorkerPool(organization, 1)
+        pool._loop = asyncio.get_running_loop()
+        conn, worker_conn = multiprocessing.Pipe()
+        pool._attach(_Worker(conn, SimpleNamespace(name="agent-worker-0")))
+
+        pool.start_agent(1)
+        assert worker_conn.recv() == ("start", 1)
+        worker_conn.close()
+        await wait_until(lambda: not pool.workers)
+        return organization
+
+    organization = asyncio.run(run())
+
+    assert organization.running_agents == []
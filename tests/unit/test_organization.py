@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from autogpt.agent.agent import Agent
+from autogpt.organization.org_events import CycleTick
+from autogpt.organization.org_tree import OrgTree
+from autogpt.organization.organization import DebuggableQueue, Organization
+
+
+@pytest.fixture
+def organization():
+    # Bypass __init__, which sets up the workspace and the message center
+    org = Organization.__new__(Organization)
+    org.org_tree = OrgTree({1: [2]})
+    org.agents = {
+        1: SimpleNamespace(ai_id=1, ai_name="Founder", role="CEO"),
+        2: SimpleNamespace(ai_id=2, ai_name="Staff", role="Engineer"),
+    }
+    org.agent_budgets = {1: 1000, 2: 500}
+    org.agent_running_costs = {1: 0, 2: 0}
+    org.agent_charged_costs = {}
+    org.agent_statuses = {1: "working", 2: "working"}
+    org.message_center = SimpleNamespace(
+        get_inbox=lambda agent_id: asyncio.sleep(0, f"inbox of {agent_id}")
+    )
+    org.persistence = MagicMock()
+    org.agent_workers = None
+    return org
+
+
+def test_cycle_tick_charges_the_agent(organization, mocker):
+    agent_costs = {1: 0.25, 2: 0.5}
+    mocker.patch(
+        "autogpt.organization.organization.ApiManager.get_agent_cost",
+        side_effect=lambda agent_id: agent_costs[agent_id],
+    )
+    asyncio.run(organization.cycle_tick(2))
+    assert organization.agent_budgets[2] == 499.5
+    organization.persistence.reset_mock()
+
+    tick = asyncio.run(organization.cycle_tick(1))
+
+    assert isinstance(tick, CycleTick)
+    # The staff's step is reported, but only the agent's own spend is charged
+    assert tick.operating_cost == 0.75
+    assert tick.step_cost == 0.25
+    assert tick.budget == 999.75
+    assert tick.inbox == "inbox of 1"
+    assert "Agent_Id:2. Agent_Name: Staff" in tick.status
+    assert "Your current budget is $999.750" in tick.status
+    assert organization.agent_running_costs[1] == 0.75
+    organization.persistence.mark_dirty.assert_called_once()
+
+    # Only the spend since the previous tick is charged
+    agent_costs[1] = 0.5
+    tick = asyncio.run(organization.cycle_tick(1))
+    assert tick.operating_cost == 0.75
+    assert tick.step_cost == 0.25
+    assert tick.budget == 999.5
+    assert organization.agent_budgets[2] == 499.5
+
+
+def test_agent_fired_while_its_cycle_tick_is_queued_stops(organization):
+    async def run():
+        organization.event_queue = DebuggableQueue()
+        organization.agent_locks = {}
+        # Bypass __init__, which sets up memory, history and the workspace
+        agent = Agent.__new__(Agent)
+        agent.ai_id = 2
+        agent.ai_name = "Staff"
+        agent.founder = False
+        agent.terminated = False
+        agent.ai_config = MagicMock()
+        agent.organization = organization
+        organization.agents[2] = agent
+
+        tick_task = asyncio.create_task(agent.cycle_tick())
+        while organization.event_queue.empty():
+            await asyncio.sleep(0)
+        await organization.fire_staff("2")
+        return await tick_task, agent.terminated
+
+    tick, terminated = asyncio.run(run())
+    assert tick is None
+    assert terminated
+    assert 2 not in organization.agents
@@ -0,0 +1,92 @@
+import asyncio
+from types import SimpleNamespace
+
+from autogpt.llm.base import ChatSequence, Message
+from autogpt.llm.response_cache import ResponseCache
+from autogpt.llm.utils import create_chat_completion
+from autogpt.memory.vector.utils import get_embedding
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message={"content": content})])
+
+
+def test_cache_persists_and_evicts(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache.__new__(ResponseCache)
+    ResponseCache.__init__(cache, path, 10)
+    keys = [ResponseCache.make_key("chat_completion", n=n) for n in range(11)]
+    for key in keys[:10]:
+        cache.put(key, key.upper())
+    assert cache.get(keys[0]) == keys[0].upper()
+    cache.put(keys[10], "new")
+    cache.close()
+
+    reopened = ResponseCache.__new__(ResponseCache)
+    ResponseCache.__init__(reopened, path, 10)
+    assert reopened.get(keys[10]) == "new"
+    # keys[0] was used most recently of the old entries, keys[1] was evicted
+    assert reopened.get(keys[0]) == keys[0].upper()
+    assert reopened.get(keys[1]) is None
+    reopened.close()
+
+
+def test_entries_are_counted_without_scanning_the_table(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache.__new__(ResponseCache)
+    ResponseCache.__init__(cache, path, 10)
+    key = ResponseCache.make_key("chat_completion", n=0)
+
+    async def run():
+        await cache.aput(key, "first")
+        await cache.aput(key, "second")
+        return await cache.aget(key)
+
+    # Replacing an entry doesn't add a row
+    assert asyncio.run(run()) == "second"
+    assert cache._count == 1
+    cache.close()
+
+    reopened = ResponseCache.__new__(ResponseCache)
+    ResponseCache.__init__(reopened, path, 10)
+    reopened.put(ResponseCache.make_key("chat_completion", n=1), "other")
+    assert reopened._count == 2
+    reopened.clear()
+    assert reopened._count == 0
+    reopened.close()
+
+
+def test_chat_completions_are_cached(config, mocker):
+    mock_create = mocker.patch(
+        "autogpt.llm.utils.iopenai.create_chat_completion",
+        return_value=completion("cached"),
+    )
+    prompt = ChatSequence.for_model("gpt-3.5-turbo", [Message("user", "hello")])
+
+    assert create_chat_completion(prompt, temperature=0) == "cached"
+    assert create_chat_completion(prompt, temperature=0) == "cached"
+    assert mock_create.call_count == 1
+
+    create_chat_completion(prompt, temperature=0, use_cache=False)
+    create_chat_completion(prompt, temperature=0.7)
+    create_chat_completion(prompt, temperature=0, max_tokens=10)
+    assert mock_create.call_count == 4
+
+
+def test_only_uncached_embeddings_are_requested(config, mocker):
+    def create_embedding(input, **kwargs):
+        return SimpleNamespace(
+            data=[
+                {"index": i, "embedding": [len(text)]} for i, text in enumerate(input)
+            ]
+        )
+
+    mocker.patch("autogpt.memory.vector.utils.count_string_tokens", return_value=1)
+    mock_create = mocker.patch(
+        "autogpt.memory.vector.utils.iopenai.create_embedding",
+        side_effect=create_embedding,
+    )
+
+    assert get_embedding(["a", "bb"]) == [[1], [2]]
+    assert get_embedding(["bb", "ccc", "a"]) == [[2], [3], [1]]
+    assert mock_create.call_args_list[1].args[0] == ["ccc"]
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from openai.error import APIError, RateLimitError
 
@@ -108,3 +110,77 @@ def test_retry_openapi_other_api_error(capsys):
 
     output = capsys.readouterr()
     assert output.out == ""
+
+
+def async_error_factory(errors, **retry_kwargs):
+    """Creates an async function that raises the given errors before succeeding"""
+    calls = []
+
+    @openai.retry_api(backoff_base=0.001, **retry_kwargs)
+    async def f():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return len(calls)
+
+    return f, calls
+
+
+def test_retry_async_does_not_block_the_loop():
+    """Tests that async functions are retried without blocking other coroutines"""
+    f, calls = async_error_factory(
+        [
+            RateLimitError("Error", headers={"Retry-After": "0.1"}),
+            APIError("Error", http_status=502, headers={"Retry-After": "0.1"}),
+        ]
+    )
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        result = await f()
+        ticker_task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+    assert result == 3
+    assert len(calls) == 3
+    assert ticks > 5
+
+
+def test_retry_honours_retry_after():
+    errors = [
+        RateLimitError("Error", headers={"Retry-After": "7"}),
+        RateLimitError("Error", headers={"retry-after-ms": "1500"}),
+        RateLimitError("Error", headers={"Retry-After": "soon"}),
+    ]
+    backoffs = [openai.compute_backoff(1, e, 2.0, 60.0) for e in errors]
+    assert backoffs[:2] == [7.0, 1.5]
+    # Unparseable values fall back to exponential backoff
+    assert 4 <= backoffs[2] <= 8
+
+
+def test_retry_backoff_has_jitter_and_cap():
+    backoffs = [
+        openai.compute_backoff(10, RateLimitError("Error"), 2.0, 60.0)
+        for _ in range(20)
+    ]
+    assert all(30 <= backoff <= 60 for backoff in backoffs)
+    assert len(set(backoffs)) > 1
+
+
+def test_retry_respects_deadline():
+    f, calls = async_error_factory(
+        [RateLimitError("Error", headers={"Retry-After": "30"})] * 3
+    )
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(f(retry_deadline=10))
+    assert len(calls) == 1
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import PropertyMock
+
+from autogpt.json_utils.stream_parser import CommandStreamParser
+from autogpt.llm.base import ChatSequence, Message
+from autogpt.llm.utils import acreate_chat_completion
+
+RESPONSE = (
+    '```json\n{"thoughts": {"text": "use {braces} and \\"quotes\\"", "plan": ["a", "b"]},\n'
+    ' "command": {"name": "read_file", "args": {"filename": "notes.txt"}},\n'
+    ' "status": "reading the notes"}\n```'
+)
+
+
+def test_command_is_found_before_the_response_ends():
+    found = []
+    parser = CommandStreamParser(on_command=found.append)
+
+    command_end = RESPONSE.index("}},") + 2
+    for i in range(0, len(RESPONSE), 3):
+        parser.feed(RESPONSE[i : i + 3])
+        if found:
+            break
+
+    assert found == [{"name": "read_file", "args": {"filename": "notes.txt"}}]
+    assert len(parser.text) < command_end + 3
+    # Feeding the rest doesn't report the command again
+    parser.feed(RESPONSE[len(parser.text) :])
+    assert len(found) == 1 and parser.text == RESPONSE
+
+
+def test_nested_command_key_is_ignored():
+    parser = CommandStreamParser()
+    parser.feed('{"thoughts": {"command": {"name": "nope"}}, "command": ')
+    assert parser.command is None
+    assert parser.feed('{"name": "yes", "args": {}}}') == {"name": "yes", "args": {}}
+
+
+def test_streamed_chat_completion(config, mocker):
+    mocker.patch.object(
+        ChatSequence, "token_length", new_callable=PropertyMock, return_value=5
+    )
+    mocker.patch("autogpt.llm.utils.count_string_tokens", return_value=3)
+    update_cost = mocker.patch("autogpt.llm.utils.ApiManager.update_cost")
+
+    async def chunks():
+        for content in [None, "Hel", "lo", None]:
+            delta = {"content": content} if content else {}
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    mock_stream = mocker.patch(
+        "autogpt.llm.utils.iopenai.astream_chat_completion", return_value=chunks()
+    )
+    deltas = []
+    prompt = ChatSequence.for_model("gpt-3.5-turbo", [Message("user", "hi")])
+
+    reply = asyncio.run(
+        acreate_chat_completion(prompt, temperature=0.5, on_delta=deltas.append)
+    )
+
+    assert reply == "Hello"
+    assert deltas == ["Hel", "lo"]
+    mock_stream.assert_called_once()
+    update_cost.assert_called_once_with(5, 3, "gpt-3.5-turbo")
@@ -1,7 +1,13 @@
 import pytest
 
 from autogpt.llm.base import Message
-from autogpt.llm.utils import count_message_tokens, count_string_tokens
+from autogpt.llm.utils import (
+    count_message_tokens,
+    count_string_tokens,
+    count_string_tokens_batch,
+    get_encoding,
+    token_count_cache,
+)
 
 
 def test_count_message_tokens():
@@ -53,3 +59,47 @@ def test_count_string_tokens_gpt_4():
 
     string = "Hello, world!"
     assert count_string_tokens(string, model_name="gpt-4-0314") == 4
+
+
+class FakeEncoding:
+    """Encodes every character as a token, counts the calls"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return list(text)
+
+    def encode_batch(self, texts):
+        self.encoded.append(sorted(texts))
+        return [list(text) for text in texts]
+
+
+@pytest.fixture
+def fake_encoding(mocker):
+    encoding = FakeEncoding()
+    get_encoding.cache_clear()
+    token_count_cache.clear()
+    mocker.patch("tiktoken.encoding_for_model", return_value=encoding)
+    yield encoding
+    get_encoding.cache_clear()
+    token_count_cache.clear()
+
+
+def test_token_counts_are_cached(fake_encoding):
+    assert count_string_tokens("Hello", model_name="gpt-4-0314") == 5
+    assert count_string_tokens("Hello", model_name="gpt-4-0314") == 5
+    assert fake_encoding.encoded == ["Hello"]
+
+    messages = [Message("user", "Hello"), Message("assistant", "Hi there!")]
+    # 3 per message + the cached "Hello" and "user", "assistant" and "Hi there!" + 3
+    assert count_message_tokens(messages, model="gpt-4") == 3 * 2 + 5 + 4 + 9 + 9 + 3
+    assert fake_encoding.encoded[1] == ["Hi there!", "assistant", "user"]
+
+
+def test_count_string_tokens_batch(fake_encoding):
+    assert count_string_tokens_batch(["a", "bb", "a", ""], "gpt-4-0314") == [1, 2, 1, 0]
+    assert fake_encoding.encoded == [["", "a", "bb"]]